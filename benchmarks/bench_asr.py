@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Benchmark: speech recognition backends, real-time factor, memory and accuracy
+
+Runs each backend configuration in its own process over the fixture audio
+and reports model load time, real-time factor (processing time / audio
+duration), CPU time, peak RSS and character error rate against reference
+transcripts.
+
+Fixture audio: every audio file in --audio-dir with a same-named .txt
+reference transcript (any format ffmpeg reads; converted to 16 kHz mono
+once). Without fixtures, synthetic speech-like audio is used and only
+speed and memory are reported.
+
+Configurations: "vosk" or "faster_whisper[:MODEL[:COMPUTE_TYPE[:BEAM]]]".
+
+Usage:
+  python benchmarks/bench_asr.py --configs vosk faster_whisper:small:int8 faster_whisper:base:int8
+  python benchmarks/bench_asr.py --audio-dir ~/asr_fixtures --threads 4
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import resource
+import subprocess
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bilivagent.config import Config
+from fixtures import FIXTURE_DIR, speech_like_audio, write_wav
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".opus", ".aac")
+
+
+def normalize(text: str) -> str:
+    """Characters compared for CER: no whitespace or punctuation, lowercase"""
+    return "".join(
+        ch for ch in unicodedata.normalize("NFKC", text).lower()
+        if not unicodedata.category(ch).startswith(("P", "Z", "C"))
+    )
+
+
+def edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def prepare_fixtures(audio_dir: str, seconds: int) -> list:
+    """(wav_path, reference or None) pairs, converting inputs to 16 kHz mono WAV"""
+    from bilivagent.utils.ffmpeg import extract_audio
+
+    converted_dir = os.path.join(FIXTURE_DIR, "asr_converted")
+    os.makedirs(converted_dir, exist_ok=True)
+    pairs = []
+    for path in sorted(glob.glob(os.path.join(audio_dir, "*"))):
+        stem, ext = os.path.splitext(path)
+        if ext.lower() not in AUDIO_EXTENSIONS or not os.path.exists(stem + ".txt"):
+            continue
+        wav_path = os.path.join(converted_dir, os.path.basename(stem) + ".wav")
+        if not os.path.exists(wav_path):
+            extract_audio(path, wav_path)
+        with open(stem + ".txt", encoding="utf-8") as f:
+            pairs.append((wav_path, f.read()))
+
+    if not pairs:
+        print(f"No fixtures with reference transcripts in {audio_dir}; "
+              f"using {seconds}s of synthetic speech-like audio (no CER)")
+        wav_path = os.path.join(converted_dir, f"synthetic_{seconds}s.wav")
+        if not os.path.exists(wav_path):
+            write_wav(wav_path, speech_like_audio(seconds))
+        pairs.append((wav_path, None))
+    return pairs
+
+
+def create(config: str, threads: int):
+    from bilivagent.utils.audio import FasterWhisperRecognizer, VoskRecognizer
+
+    name, *options = config.split(":")
+    if name == "vosk":
+        return VoskRecognizer(Config.VOSK_MODEL_PATH)
+    if name in ("faster_whisper", "faster-whisper"):
+        model = options[0] if len(options) > 0 else None
+        compute_type = options[1] if len(options) > 1 else None
+        beam_size = int(options[2]) if len(options) > 2 else None
+        return FasterWhisperRecognizer(model, compute_type, threads, beam_size)
+    raise ValueError(f"Unknown configuration: {config}")
+
+
+def worker(config: str, paths: list, threads: int, vad: bool):
+    """Runs in a child process; prints one JSON result"""
+    Config.DEBUG = False
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    recognizer = create(config, threads)
+    load_seconds = time.perf_counter() - start
+
+    files = []
+    for path in paths:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_start = usage.ru_utime + usage.ru_stime
+        start = time.perf_counter()
+        segments = recognizer.transcribe_segments(path, vad=vad)
+        wall = time.perf_counter() - start
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        files.append({
+            "path": path,
+            "wall": wall,
+            "cpu": usage.ru_utime + usage.ru_stime - cpu_start,
+            "text": "".join(segment["text"] for segment in segments),
+        })
+
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        # ru_maxrss is in KiB on Linux
+        "baseline_mib": rss_before / 1024,
+        "peak_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "files": files,
+    }, ensure_ascii=False))
+
+
+def audio_seconds(path: str) -> float:
+    import wave
+    with wave.open(path) as f:
+        return f.getnframes() / f.getframerate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASR backend benchmark")
+    parser.add_argument("--configs", nargs="+", default=["vosk", "faster_whisper:small:int8"])
+    parser.add_argument("--audio-dir", default=os.path.join(FIXTURE_DIR, "asr"),
+                        help="audio files with same-named .txt reference transcripts")
+    parser.add_argument("--seconds", type=int, default=120, help="synthetic audio length without fixtures")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads for faster-whisper (0 = all cores)")
+    parser.add_argument("--no-vad", action="store_true", help="decode the whole audio")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--paths", nargs="*", default=[], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.paths, args.threads, not args.no_vad)
+        return
+
+    pairs = prepare_fixtures(args.audio_dir, args.seconds)
+    total_audio = sum(audio_seconds(path) for path, _ in pairs)
+    print(f"{len(pairs)} files, {total_audio / 60:.1f} min of audio\n")
+    print(f"{'configuration':<32} {'load':>6} {'RTF':>7} {'cpu RTF':>8} {'peak RSS':>9} {'CER':>7}")
+
+    for config in args.configs:
+        command = [sys.executable, os.path.abspath(__file__), "--worker", config, "--threads", str(args.threads),
+                   "--paths", *[path for path, _ in pairs]]
+        if args.no_vad:
+            command.append("--no-vad")
+        process = subprocess.run(command, capture_output=True, text=True)
+        if process.returncode != 0:
+            error = (process.stderr.strip().splitlines() or ["failed"])[-1]
+            print(f"{config:<32} error: {error}")
+            continue
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+
+        wall = sum(f["wall"] for f in result["files"])
+        cpu = sum(f["cpu"] for f in result["files"])
+        errors = chars = 0
+        for f, (_, reference) in zip(result["files"], pairs):
+            if reference is not None:
+                reference = normalize(reference)
+                errors += edit_distance(reference, normalize(f["text"]))
+                chars += len(reference)
+        cer = f"{errors / chars:7.1%}" if chars else "    n/a"
+        print(f"{config:<32} {result['load_seconds']:5.1f}s {wall / total_audio:7.3f} {cpu / total_audio:8.3f} "
+              f"{result['peak_mib']:6.0f} MiB {cer}")
+
+
+if __name__ == "__main__":
+    main()
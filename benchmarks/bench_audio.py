@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark: audio extraction, direct ffmpeg vs moviepy
+
+Extracts 16 kHz mono PCM from fixture videos of increasing length with both
+backends and reports wall time, CPU time, speed relative to real time and
+peak memory of the Python process. The outputs must hold the same number
+of samples.
+
+Usage:
+  python benchmarks/bench_audio.py --seconds 300 1800 3600
+  python benchmarks/bench_audio.py --backends ffmpeg
+"""
+import os
+import sys
+import time
+import wave
+import shutil
+import argparse
+import resource
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bilivagent.config import Config
+from bilivagent.utils.video import VideoProcessor
+from fixtures import fixture_video
+
+
+def cpu_seconds() -> float:
+    """CPU time of this process and its finished children (ffmpeg)"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def run(video_path: str, backend: str, workdir: str) -> dict:
+    output_path = os.path.join(workdir, f"{backend}.wav")
+    processor = VideoProcessor()
+    Config.AUDIO_BACKEND = backend
+
+    cpu_start = cpu_seconds()
+    start = time.perf_counter()
+    processor.extract_audio(video_path, output_path)
+    elapsed = time.perf_counter() - start
+    cpu = cpu_seconds() - cpu_start
+
+    with wave.open(output_path) as f:
+        samples = f.getnframes()
+        assert f.getnchannels() == 1 and f.getframerate() == 16000 and f.getsampwidth() == 2
+    os.remove(output_path)
+    return {"wall": elapsed, "cpu": cpu, "samples": samples}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audio extraction benchmark")
+    parser.add_argument("--seconds", type=int, nargs="+", default=[300, 1800])
+    parser.add_argument("--backends", nargs="+", default=["ffmpeg", "moviepy"], choices=["ffmpeg", "moviepy"])
+    args = parser.parse_args()
+
+    Config.DEBUG = False
+    workdir = tempfile.mkdtemp(prefix="bilivagent_audio_bench_")
+    try:
+        for seconds in args.seconds:
+            video_path = fixture_video(seconds)
+            print(f"{seconds}s video ({os.path.getsize(video_path) / 2**20:.0f} MiB)")
+            results = {}
+            for backend in args.backends:
+                result = results[backend] = run(video_path, backend, workdir)
+                print(f"  {backend:<8} {result['wall']:7.2f}s wall  {result['cpu']:7.2f}s cpu  "
+                      f"{seconds / result['wall']:7.0f}x realtime  {result['samples']:,} samples")
+            if len(results) == 2:
+                ffmpeg, moviepy = results["ffmpeg"], results["moviepy"]
+                print(f"  speedup  {moviepy['wall'] / ffmpeg['wall']:.1f}x wall, "
+                      f"{moviepy['cpu'] / max(ffmpeg['cpu'], 1e-9):.1f}x cpu, "
+                      f"sample count difference {abs(moviepy['samples'] - ffmpeg['samples'])}")
+        # ru_maxrss is in KiB on Linux
+        print(f"Peak RSS of the benchmark process: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Benchmark: near-duplicate collapsing and prompt packing at scale
+
+Checks that collapsing stays linear in the number of lines.
+
+Usage:
+  python benchmarks/bench_dedup.py --sizes 10000 100000 1000000
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bilivagent.utils.dedup import collapse_near_duplicates, pack_by_value
+from fixtures import generate_danmaku
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Danmaku dedup benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--token-budget", type=int, default=3000)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        lines = generate_danmaku(size)
+        start = time.perf_counter()
+        groups = collapse_near_duplicates(lines)
+        collapse_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        packed = pack_by_value(groups, args.token_budget)
+        pack_time = time.perf_counter() - start
+
+        print(f"{size:>9,} lines -> {len(groups):>7,} groups  "
+              f"collapse {collapse_time:6.2f}s ({collapse_time / size * 1e6:.2f} us/line)  "
+              f"pack {pack_time:.2f}s  prompt {len(packed):,} chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark: batch desensitization vs the legacy per-text re.sub chain
+
+Usage:
+  python benchmarks/bench_desensitize.py --lines 1000000
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bilivagent.utils.desensitize import Desensitizer
+
+
+def legacy_desensitize(text: str) -> str:
+    """The original three-pass implementation"""
+    text = re.sub(r'1[3-9]\d{9}', '***', text)
+    text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '***@***.***', text)
+    text = re.sub(r'\b\d{17}[\dXx]\b', '***', text)
+    return text
+
+
+def generate_lines(count: int, seed: int = 42) -> list:
+    """Generate danmaku-like lines with occasional sensitive content"""
+    rng = random.Random(seed)
+    plain = ["哈哈哈哈哈", "前方高能", "awsl", "这个视频太棒了", "up主辛苦了", "来了来了", "下次一定", "好家伙"]
+    sensitive = [
+        "加我微信13812345678",
+        "联系邮箱 someone@example.com",
+        "身份证110101199003071234",
+        "QQ：12345678 进群",
+        "详情看 https://example.com/a?b=1",
+    ]
+    return [rng.choice(sensitive) if rng.random() < 0.05 else rng.choice(plain) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Desensitization benchmark")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    lines = generate_lines(args.lines)
+    print(f"Lines: {len(lines):,}")
+
+    start = time.perf_counter()
+    legacy = [legacy_desensitize(t) for t in lines]
+    legacy_time = time.perf_counter() - start
+    print(f"legacy per-text:  {legacy_time:.3f}s")
+
+    desensitizer = Desensitizer()
+    start = time.perf_counter()
+    batch, counts = desensitizer.desensitize_batch(lines)
+    batch_time = time.perf_counter() - start
+    print(f"batch single-pass: {batch_time:.3f}s  ({legacy_time / batch_time:.1f}x)  {counts}")
+
+    extended = Desensitizer(["qq", "url", "bank_card"])
+    start = time.perf_counter()
+    _, counts = extended.desensitize_batch(lines)
+    extended_time = time.perf_counter() - start
+    print(f"batch + extras:    {extended_time:.3f}s  {counts}")
+
+    mismatches = sum(1 for a, b in zip(legacy, batch) if a != b)
+    # Non-zero is expected: the legacy chain only half-redacts ID card numbers
+    print(f"Output differences vs legacy: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark: peak memory against video length, in memory vs streaming mode
+
+For each length a long speech-like WAV and a danmaku corpus proportional
+to the length are generated, then each mode runs in a fresh process:
+speech recognition over the whole audio (one continuous region, the worst
+case) followed by the text stage. The recognizer is a stand-in that
+converts its input to float32 and computes frame features the way
+faster-whisper does, so no model is needed; the discussion summary is not
+sent anywhere.
+
+Reported per run: RSS after start-up (models, jieba), peak RSS and their
+difference, the memory that grows with the video. With MEMORY_LIMIT_MB
+set the growth should stay flat and below the limit.
+
+Usage:
+  python benchmarks/bench_memory.py
+  python benchmarks/bench_memory.py --minutes 30 180 --limit 128 --danmaku-per-minute 2000
+"""
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import resource
+import tempfile
+import subprocess
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import generate_comments, generate_danmaku, speech_like_audio
+
+SAMPLE_RATE = 16000
+# Minutes of audio generated at a time, so the fixture itself never sits in memory
+BLOCK_MINUTES = 5
+
+
+def write_long_wav(path: str, minutes: float) -> str:
+    """Speech-like WAV of any length, written block by block"""
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        remaining, seed = minutes * 60, 0
+        while remaining > 0:
+            seconds = min(remaining, BLOCK_MINUTES * 60)
+            f.writeframes(speech_like_audio(seconds, SAMPLE_RATE, seed=seed).tobytes())
+            remaining -= seconds
+            seed += 1
+    return path
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(args):
+    """One measured run; MEMORY_LIMIT_MB comes from the environment"""
+    from bilivagent.config import Config
+    from bilivagent.utils import jieba_cache, streaming
+    from bilivagent.utils.audio import SpeechRecognizer
+    from bilivagent.utils.streaming import LineSpill
+    from bilivagent.processors.text_content import TextContentProcessor
+
+    class FeatureRecognizer(SpeechRecognizer):
+        """Decodes like faster-whisper memory-wise: whole input as float32 plus frame features"""
+
+        name = "bench"
+
+        def transcribe_pcm(self, samples, sample_rate):
+            audio = np.asarray(samples, dtype=np.float32) / 32768.0
+            frames = audio[:len(audio) // 160 * 160].reshape(-1, 160)
+            energy = np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+            return [
+                {"start": start / 100, "end": min(start + 3000, len(energy)) / 100,
+                 "text": f"片段{start // 3000}能量{energy[start:start + 3000].mean():.2f}", "words": []}
+                for start in range(0, len(energy), 3000)
+            ]
+
+    class OfflineTextProcessor(TextContentProcessor):
+        def _generate_discussion_summary(self, text):
+            return text[:150]
+
+    Config.DEBUG = False
+    Config.SILICONFLOW_API_KEY = "offline-benchmark"
+    jieba_cache.ensure_loaded()
+    text_processor = OfflineTextProcessor()
+    text_processor.text_processor.sentiment_scorer
+    recognizer = FeatureRecognizer()
+    comments = generate_comments(100)
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    transcript = recognizer.transcribe(args.wav, vad=False)
+    asr_peak = peak_rss_mb()
+
+    with open(args.danmaku, encoding="utf-8") as f:
+        lines = (line[:-1] for line in f)
+        if streaming.enabled():
+            danmaku = LineSpill.write(streaming.batches(lines), tempfile.gettempdir(), prefix="bench_memory.")
+        else:
+            danmaku = list(lines)
+    try:
+        result = text_processor.process(comments, danmaku)
+    finally:
+        if isinstance(danmaku, LineSpill):
+            danmaku.remove()
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "baseline_mb": round(baseline, 1),
+        "asr_peak_mb": round(asr_peak, 1),
+        "peak_mb": round(peak_rss_mb(), 1),
+        "seconds": round(elapsed, 1),
+        "transcript_chars": len(transcript),
+        "keywords": result["comment_keywords"][:3],
+    }, ensure_ascii=False))
+
+
+def run(wav: str, danmaku: str, limit: int) -> dict:
+    env = dict(os.environ, MEMORY_LIMIT_MB=str(limit))
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--wav", wav, "--danmaku", danmaku],
+        env=env, stdout=subprocess.PIPE, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory vs video length benchmark")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10, 30, 60, 180])
+    parser.add_argument("--limit", type=int, default=256, help="MEMORY_LIMIT_MB of the streaming runs")
+    parser.add_argument("--danmaku-per-minute", type=int, default=1000)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--wav", help=argparse.SUPPRESS)
+    parser.add_argument("--danmaku", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="bilivagent_memory_bench_")
+    try:
+        print(f"{'minutes':>7} {'mode':<16} {'start MB':>9} {'peak MB':>8} {'growth MB':>10} {'ASR MB':>7} {'time s':>7}")
+        for minutes in args.minutes:
+            wav = write_long_wav(os.path.join(work_dir, f"audio_{minutes:g}min.wav"), minutes)
+            danmaku = os.path.join(work_dir, f"danmaku_{minutes:g}min.txt")
+            with open(danmaku, "w", encoding="utf-8") as f:
+                f.writelines(line + "\n" for line in generate_danmaku(int(minutes * args.danmaku_per_minute)))
+
+            for limit in (0, args.limit):
+                mode = f"limit {limit} MB" if limit else "in memory"
+                result = run(wav, danmaku, limit)
+                result["growth_mb"] = round(result["peak_mb"] - result["baseline_mb"], 1)
+                results[f"{minutes:g}min/{mode}"] = result
+                print(f"{minutes:>7g} {mode:<16} {result['baseline_mb']:>9.0f} {result['peak_mb']:>8.0f} "
+                      f"{result['growth_mb']:>10.0f} {result['asr_peak_mb'] - result['baseline_mb']:>7.0f} "
+                      f"{result['seconds']:>7.1f}")
+            os.remove(wav)
+            os.remove(danmaku)
+    finally:
+        for name in os.listdir(work_dir):
+            os.remove(os.path.join(work_dir, name))
+        os.rmdir(work_dir)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Benchmark: end-to-end BiliVagent.analyze_video, fully offline
+
+SiliconFlow is replaced by a local fake server (configurable latency,
+generation speed, streaming and 429 injection), Bilibili by in-memory
+metadata/comments/danmaku and a generated fixture video. Transcription
+and frame extraction run for real on CPU, so the Vosk model must be
+available at VOSK_MODEL_PATH unless --video-seconds 0 is given.
+
+Per-stage times come from the tracer. Results can be saved as a baseline
+and later runs compared against it; the exit code is 1 on regressions.
+
+Usage:
+  python benchmarks/bench_pipeline.py --save-baseline
+  python benchmarks/bench_pipeline.py --danmaku-sizes 1000 100000 --rate-limit 0.1
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import contextlib
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bilivagent.config import Config
+from bilivagent.utils.tracing import tracer
+from fakes import FakeSiliconFlowServer, FakeBilibiliParser, FakeBilibiliDownloader
+from fixtures import fixture_video, generate_comments, generate_danmaku
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "pipeline.json")
+# Stages shorter than this are too noisy to compare
+MIN_COMPARABLE_SECONDS = 0.02
+
+
+def run_once(video_path, comments, danmaku, duration, page_latency, verbose) -> Dict:
+    """Run analyze_video once and return end-to-end time plus traced stage totals"""
+    from bilivagent.agents.bilivagent import BiliVagent
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        agent = BiliVagent()
+        agent.parser = FakeBilibiliParser(comments, danmaku, duration=duration, page_latency=page_latency)
+        agent.downloader = FakeBilibiliDownloader(video_path)
+
+        tracer.enable()
+        start = time.perf_counter()
+        agent.analyze_video("BV1bench00000")
+    elapsed = time.perf_counter() - start
+    tracer.disable()
+
+    return {"end_to_end": elapsed, "spans": {row["name"]: row for row in tracer.summary()}}
+
+
+def measure(args, video_path, size: int) -> Dict:
+    """Median of --repeat runs for one danmaku corpus size"""
+    comments = generate_comments(args.comments)
+    danmaku = generate_danmaku(size)
+    runs = [
+        run_once(video_path, comments, danmaku, args.video_seconds, args.page_latency, args.verbose)
+        for _ in range(args.repeat)
+    ]
+
+    stage_names = sorted({name for run in runs for name in run["spans"]})
+    stages = {
+        name: statistics.median(run["spans"][name]["total"] if name in run["spans"] else 0.0 for run in runs)
+        for name in stage_names
+    }
+    last = runs[-1]["spans"]
+    throughput = {}
+    if stages.get("stage.text_content"):
+        throughput["text_lines_per_s"] = (size + len(comments)) / stages["stage.text_content"]
+    audio_seconds = last.get("vosk.transcribe", {}).get("attrs", {}).get("audio_seconds")
+    if audio_seconds and stages.get("vosk.transcribe"):
+        throughput["asr_real_time_factor"] = stages["vosk.transcribe"] / audio_seconds
+
+    return {
+        "end_to_end": statistics.median(run["end_to_end"] for run in runs),
+        "stages": stages,
+        "throughput": throughput,
+    }
+
+
+def measure_streaming(requests: int = 5) -> Dict:
+    """Time to first delta and total time of streamed completions against the fake server"""
+    from bilivagent.utils.siliconflow import SiliconFlowClient
+
+    client = SiliconFlowClient()
+    messages = [{"role": "user", "content": "请总结这个视频"}]
+    first, total = [], []
+    for _ in range(requests):
+        start = time.perf_counter()
+        first_delta = None
+        for _ in client.stream_chat_completion(messages, max_tokens=200):
+            if first_delta is None:
+                first_delta = time.perf_counter() - start
+        total.append(time.perf_counter() - start)
+        first.append(first_delta if first_delta is not None else total[-1])
+    return {"time_to_first_delta": statistics.median(first), "total": statistics.median(total)}
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> int:
+    """Print current vs baseline times and return the number of regressions"""
+    regressions = 0
+    print(f"\n{'run':<16}{'metric':<30}{'baseline s':>12}{'current s':>12}{'change':>9}")
+    for key, run in results["runs"].items():
+        base_run = baseline.get("runs", {}).get(key)
+        if not base_run:
+            print(f"{key:<16}(no baseline)")
+            continue
+        metrics = {"end_to_end": (base_run["end_to_end"], run["end_to_end"])}
+        for name, value in run["stages"].items():
+            if name in base_run["stages"]:
+                metrics[name] = (base_run["stages"][name], value)
+        for name, (before, after) in metrics.items():
+            if before < MIN_COMPARABLE_SECONDS:
+                continue
+            change = after / before - 1
+            flag = ""
+            if change > tolerance:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{key:<16}{name[:29]:<30}{before:>12.3f}{after:>12.3f}{change:>+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark")
+    parser.add_argument("--danmaku-sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--comments", type=int, default=100)
+    parser.add_argument("--video-seconds", type=int, default=60, help="fixture video length, 0 to skip video analysis")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake server latency per request (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="fake generation speed, 0 = instant")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--page-latency", type=float, default=0.02, help="fake Bilibili API latency per page (s)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write results to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline output")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bilivagent_bench_")
+    Config.OUTPUT_DIR = os.path.join(workdir, "output")
+    Config.TEMP_DIR = os.path.join(workdir, "temp")
+    Config.SILICONFLOW_API_KEY = "offline-benchmark"
+    Config.DEBUG = args.verbose
+
+    video_path = fixture_video(args.video_seconds) if args.video_seconds > 0 else None
+
+    with FakeSiliconFlowServer(latency=args.llm_latency, tokens_per_second=args.tokens_per_second,
+                               rate_limit_ratio=args.rate_limit) as server:
+        Config.SILICONFLOW_BASE_URL = server.url
+
+        results = {
+            "config": {k: v for k, v in vars(args).items() if k not in ("baseline", "save_baseline", "verbose")},
+            "runs": {},
+        }
+        for size in args.danmaku_sizes:
+            key = f"danmaku={size}"
+            print(f"Running {key} ({args.repeat}x)...")
+            results["runs"][key] = measure(args, video_path, size)
+        results["streaming"] = measure_streaming()
+        results["server"] = dict(server.stats)
+
+    print(f"\n{'run':<16}{'end-to-end s':>14}  throughput")
+    for key, run in results["runs"].items():
+        throughput = ", ".join(f"{k}={v:,.2f}" for k, v in run["throughput"].items())
+        print(f"{key:<16}{run['end_to_end']:>14.3f}  {throughput}")
+    stages = results["runs"][f"danmaku={args.danmaku_sizes[-1]}"]["stages"]
+    print(f"\nStages (danmaku={args.danmaku_sizes[-1]}):")
+    for name, seconds in sorted(stages.items(), key=lambda item: item[1], reverse=True):
+        print(f"  {name:<32}{seconds:>9.3f}s")
+    print(f"\nStreaming: first delta {results['streaming']['time_to_first_delta']:.3f}s, "
+          f"total {results['streaming']['total']:.3f}s")
+    print(f"Fake server: {results['server']}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nBaseline saved to: {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("\nWarning: baseline was recorded with different options")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{regressions} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+    else:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark: report store bulk insert and query latency
+
+Fills a fresh store with synthetic reports spread over categories,
+uploaders, sentiments, keywords and the last 90 days, then times the
+typical filtered queries.
+
+Usage:
+  python benchmarks/bench_report_store.py --reports 1000000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bilivagent.utils.report_store import ReportStore
+
+CATEGORIES = ["知识", "科技", "游戏", "生活", "音乐", "影视", "动画", "美食", "运动", "时尚"]
+SENTIMENTS = ["正面", "负面", "中性"]
+
+
+def generate_reports(count: int, seed: int = 42):
+    """(report, analyzed) pairs"""
+    rng = random.Random(seed)
+    vocabulary = [f"词{i}" for i in range(20_000)]
+    now = time.time()
+    for i in range(count):
+        yield {
+            "BV号": f"BV1{i:09d}",
+            "视频标题": f"测试视频 {i}",
+            "概述": "这是一段用于基准测试的视频概述。" * 4,
+            "关键词（前十）": rng.sample(vocabulary, 10),
+            "视频风格": "画面明亮，节奏轻快",
+            "讨论情感": rng.choice(SENTIMENTS),
+            "讨论关键词": rng.sample(vocabulary, 10),
+            "相关讨论": "观众主要讨论了视频中的观点。" * 4,
+            "元数据": {
+                "分区": rng.choice(CATEGORIES),
+                "标签": rng.sample(vocabulary, 3),
+                "UP主": f"up{rng.randrange(count // 50 + 1)}",
+                "时长": rng.randrange(30, 3600),
+                "发布时间": int(now - rng.uniform(0, 120 * 86400)),
+                "评论数": rng.randrange(100),
+                "弹幕数": rng.randrange(5000),
+            },
+        }, now - rng.uniform(0, 90 * 86400)
+
+
+def timed(fn, repeat: int):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report store benchmark")
+    parser.add_argument("--reports", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--db", default=None, help="reuse this database instead of a fresh temporary one")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="bilivagent_store_bench_"), "reports.db")
+    store = ReportStore(path)
+    existing = store.count()
+    if existing < args.reports:
+        start = time.perf_counter()
+        store._put_pairs(generate_reports(args.reports))
+        elapsed = time.perf_counter() - start
+        print(f"Inserted {args.reports:,} reports in {elapsed:.1f}s ({args.reports / elapsed:,.0f}/s), "
+              f"database {os.path.getsize(path) / 2**20:,.0f} MiB")
+    store.db.execute("ANALYZE")
+
+    week = time.time() - 7 * 86400
+    queries = {
+        "get by BV": lambda: store.get(f"BV1{args.reports // 2:09d}"),
+        "知识 + 负面, last week": lambda: store.query(category="知识", sentiment="负面", since=week),
+        "负面, last week, count": lambda: store.count(sentiment="负面", since=week),
+        "uploader": lambda: store.query(uploader="up7"),
+        "keyword": lambda: store.query(keywords=["词1234"]),
+        "2 keywords + category": lambda: store.query(keywords=["词1234", "词42"], category="知识"),
+        "keyword, full reports": lambda: store.query(keywords=["词1234"], full=True),
+        "top keywords, 知识 last week": lambda: store.keyword_counts(10, category="知识", since=week),
+    }
+    for name, fn in queries.items():
+        ms, result = timed(fn, args.repeat)
+        size = len(result) if isinstance(result, list) else result if isinstance(result, int) else 1
+        print(f"  {name:<30} {ms:9.2f} ms  ({size:,} rows)")
+
+
+if __name__ == "__main__":
+    main()
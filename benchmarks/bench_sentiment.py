@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Aho-Corasick sentiment scoring vs jieba segmentation + set lookups
+
+Usage:
+  python benchmarks/bench_sentiment.py --lines 100000 --lexicon-size 50000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jieba
+from bilivagent.utils.sentiment import SentimentScorer, DEFAULT_LEXICON
+
+
+def legacy_sentiment(text: str) -> dict:
+    """The original whole-corpus jieba implementation"""
+    positive = {w for w, s in DEFAULT_LEXICON.items() if s > 0}
+    negative = {w for w, s in DEFAULT_LEXICON.items() if s < 0}
+    neutral = {w for w, s in DEFAULT_LEXICON.items() if s == 0}
+    counts = {'positive': 0, 'negative': 0, 'neutral': 0}
+    for word in jieba.cut(text):
+        if word in positive:
+            counts['positive'] += 1
+        elif word in negative:
+            counts['negative'] += 1
+        elif word in neutral:
+            counts['neutral'] += 1
+    return counts
+
+
+def generate_comments(count: int, seed: int = 42) -> list:
+    """Generate comment-like lines"""
+    rng = random.Random(seed)
+    fragments = ["这个视频", "真的", "太棒了", "不好看", "无聊", "up主", "好像", "还行吧", "一点都不精彩", "支持",
+                 "哈哈哈", "讲得很清楚", "垃圾", "感动", "下次一定", "特别喜欢"]
+    return ["".join(rng.choice(fragments) for _ in range(rng.randint(1, 6))) for _ in range(count)]
+
+
+def synthetic_lexicon(size: int, seed: int = 7) -> dict:
+    """Build a large random lexicon of 2-4 character CJK words"""
+    rng = random.Random(seed)
+    lexicon = dict(DEFAULT_LEXICON)
+    while len(lexicon) < size:
+        word = "".join(chr(rng.randint(0x4e00, 0x9fa5)) for _ in range(rng.randint(2, 4)))
+        lexicon[word] = rng.choice([1.0, -1.0, 0.5, -0.5])
+    return lexicon
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentiment scoring benchmark")
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--lexicon-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    comments = generate_comments(args.lines)
+    likes = [random.randint(0, 5000) for _ in comments]
+    jieba.initialize()
+    print(f"Comments: {len(comments):,}")
+
+    start = time.perf_counter()
+    legacy = legacy_sentiment("\n".join(comments))
+    print(f"jieba whole-corpus:     {time.perf_counter() - start:.3f}s  {legacy}")
+
+    scorer = SentimentScorer()
+    start = time.perf_counter()
+    result = scorer.analyze(comments, likes)
+    print(f"automaton per-comment:  {time.perf_counter() - start:.3f}s  {result['counts']}  weighted={result['weighted']}")
+
+    start = time.perf_counter()
+    large = SentimentScorer(synthetic_lexicon(args.lexicon_size))
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    large.analyze(comments, likes)
+    print(f"{args.lexicon_size:,}-entry lexicon: build {build_time:.3f}s, score {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
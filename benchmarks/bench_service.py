@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: HTTP service throughput and latency under concurrent load
+
+Starts the service in-process on the offline stand-ins (fake SiliconFlow
+server, in-memory Bilibili data) and fires requests for a pool of BVs from
+concurrent clients. Each client submits a job, follows its progress events
+until it finishes and records the end-to-end latency. Duplicate BVs show
+single-flight deduplication while in flight and the cached-report fast path
+afterwards.
+
+Usage:
+  python benchmarks/bench_service.py --requests 200 --concurrency 16 --unique 20
+  python benchmarks/bench_service.py --no-cache --video-seconds 30
+"""
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import statistics
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from bilivagent.config import Config
+from fakes import FakeSiliconFlowServer, FakeBilibiliParser, FakeBilibiliDownloader
+from fixtures import fixture_video, generate_comments, generate_danmaku
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_client(base_url: str, bvid: str) -> dict:
+    """Submit one job and follow it to completion"""
+    session = requests.Session()
+    start = time.perf_counter()
+    response = session.post(f"{base_url}/jobs", json={"video": bvid}, timeout=30)
+    if response.status_code == 503:
+        return {"status": "rejected", "latency": time.perf_counter() - start}
+    job = response.json()
+
+    after = 0
+    while job.get("status") not in ("done", "failed"):
+        events = session.get(f"{base_url}/jobs/{job['job_id']}/events",
+                             params={"after": after, "wait": 5}, timeout=60).json()
+        after = events["next"]
+        if events["finished"]:
+            job = session.get(f"{base_url}/jobs/{job['job_id']}", timeout=30).json()
+
+    return {
+        "status": job["status"],
+        "cached": job["cached"],
+        "deduplicated": response.json().get("deduplicated", False),
+        "latency": time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP service load benchmark")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--unique", type=int, default=10, help="number of distinct BVs requested")
+    parser.add_argument("--workers", type=int, default=2, help="service worker pool size")
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--danmaku", type=int, default=5_000)
+    parser.add_argument("--video-seconds", type=int, default=0, help="fixture video length, 0 to skip video analysis")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--page-latency", type=float, default=0.02)
+    parser.add_argument("--no-cache", action="store_true", help="disable the cached-report fast path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bilivagent_service_bench_")
+    Config.OUTPUT_DIR = os.path.join(workdir, "output")
+    Config.TEMP_DIR = os.path.join(workdir, "temp")
+    Config.SILICONFLOW_API_KEY = "offline-benchmark"
+    Config.DEBUG = False
+
+    video_path = fixture_video(args.video_seconds) if args.video_seconds > 0 else None
+
+    with FakeSiliconFlowServer(latency=args.llm_latency) as fake_llm:
+        Config.SILICONFLOW_BASE_URL = fake_llm.url
+
+        from bilivagent.agents.bilivagent import BiliVagent
+        from bilivagent.service.api import AnalysisService, create_server
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent = BiliVagent()
+        agent.parser = FakeBilibiliParser(generate_comments(100), generate_danmaku(args.danmaku),
+                                          duration=args.video_seconds, page_latency=args.page_latency)
+        agent.downloader = FakeBilibiliDownloader(video_path)
+
+        service = AnalysisService(agent, workers=args.workers, max_queue=args.max_queue,
+                                  cache_ttl=-1 if args.no_cache else None)
+        server = create_server(service, "127.0.0.1", 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = "http://127.0.0.1:%d" % server.server_address[1]
+
+        rng = random.Random(42)
+        bvids = [f"BV1bench{rng.randrange(args.unique):04d}" for _ in range(args.requests)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(lambda bvid: run_client(base_url, bvid), bvids))
+        elapsed = time.perf_counter() - start
+
+        server.shutdown()
+        service.shutdown()
+        health = service.health()
+
+    latencies = [r["latency"] for r in results if r["status"] != "rejected"]
+    by_status = {}
+    for r in results:
+        by_status[r["status"]] = by_status.get(r["status"], 0) + 1
+
+    print(f"Requests: {args.requests} from {args.concurrency} clients over {args.unique} BVs, "
+          f"{args.workers} workers")
+    print(f"Elapsed:     {elapsed:.2f}s  ({args.requests / elapsed:.1f} req/s)")
+    print(f"Latency:     p50 {percentile(latencies, 0.5):.3f}s  p99 {percentile(latencies, 0.99):.3f}s  "
+          f"mean {statistics.mean(latencies):.3f}s")
+    print(f"Outcomes:    {by_status}")
+    print(f"Analyses:    {health['completed'] + health['failed']} run, {health['deduplicated']} deduplicated, "
+          f"{health['cache_hits']} served from cache, {health['rejected']} rejected")
+    print(f"LLM server:  {fake_llm.stats['requests']} requests")
+
+
+if __name__ == "__main__":
+    main()
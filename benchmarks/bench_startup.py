@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: startup import cost per entry path, with a budget check
+
+Runs each entry path in a fresh interpreter with `-X importtime`, sums the
+self time of all imports and fails (exit code 1) when a path exceeds its
+budget or imports a module that should only be loaded on first use.
+
+Usage:
+  python benchmarks/bench_startup.py
+  python benchmarks/bench_startup.py --scale 2.0   # slower machine
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy dependencies that must stay out of startup paths
+HEAVY_MODULES = ["cv2", "moviepy", "vosk", "wordcloud", "matplotlib", "langchain_core", "langchain_classic"]
+
+# name: (interpreter arguments, import budget in ms, modules that must not be imported)
+ENTRY_PATHS: Dict[str, Tuple[List[str], float, List[str]]] = {
+    "cli --help": (["main.py", "--help"], 150, HEAVY_MODULES + ["bilibili_api", "jieba", "numpy", "requests"]),
+    "gui module": (["-c", "import gui"], 250, HEAVY_MODULES + ["bilibili_api", "jieba", "numpy", "requests"]),
+    "agent module": (["-c", "import bilivagent.agents.bilivagent"], 1500, HEAVY_MODULES),
+}
+
+
+def import_times(args: List[str]) -> Tuple[Dict[str, Tuple[int, int]], float]:
+    """Run python -X importtime and return {module: (self_us, cumulative_us)} and wall time"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup import time budget check")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply all budgets")
+    parser.add_argument("--top", type=int, default=8, help="slowest top-level imports to show")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per path (the fastest counts)")
+    args = parser.parse_args()
+
+    failures = 0
+    for name, (command, budget_ms, forbidden) in ENTRY_PATHS.items():
+        try:
+            runs = [import_times(command) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{name:<14} failed: {e}")
+            failures += 1
+            continue
+        modules, wall = min(runs, key=lambda run: sum(s for s, _ in run[0].values()))
+        total_ms = sum(s for s, _ in modules.values()) / 1000
+        budget_ms *= args.scale
+
+        loaded = sorted(m for m in forbidden if m in modules)
+        status = "ok"
+        if total_ms > budget_ms or loaded:
+            status = "FAIL"
+            failures += 1
+
+        print(f"{name:<14} imports {total_ms:8.1f} ms (budget {budget_ms:.0f} ms)  wall {wall * 1000:7.1f} ms  {status}")
+        if loaded:
+            print(f"  loaded eagerly: {', '.join(loaded)}")
+        top_level = sorted(
+            ((cumulative, module) for module, (_, cumulative) in modules.items() if "." not in module),
+            reverse=True,
+        )
+        for cumulative, module in top_level[:args.top]:
+            print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+    if failures:
+        print(f"\n{failures} entry path(s) failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
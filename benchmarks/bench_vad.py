@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: voice-activity gating before speech recognition
+
+Builds a music-heavy soundtrack (music intro, speech, speech over BGM,
+music-only break, silence) and reports how much audio the VAD keeps, how
+well it matches the speech sections and its own cost. With a Vosk model
+at VOSK_MODEL_PATH it also times transcription with and without gating.
+
+Usage:
+  python benchmarks/bench_vad.py --minutes 20
+  python benchmarks/bench_vad.py --minutes 5 --no-asr
+"""
+import os
+import sys
+import time
+import argparse
+import resource
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bilivagent.config import Config
+from bilivagent.utils.vad import speech_regions
+from fixtures import music_like_audio, speech_like_audio, write_wav
+
+SAMPLE_RATE = 16000
+
+
+def soundtrack(minutes: float):
+    """Samples plus (name, start, end, is_speech) sections"""
+    unit = minutes * 60 / 10
+    plan = [("music intro", 2, False), ("speech", 3, True), ("speech over BGM", 2, True),
+            ("music break", 2, False), ("silence", 1, False)]
+    parts, sections, pos = [], [], 0
+    for i, (name, units, speech) in enumerate(plan):
+        seconds = units * unit
+        if name == "silence":
+            part = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.int16)
+        elif name == "speech over BGM":
+            mixed = speech_like_audio(seconds, seed=i).astype(np.int32) + music_like_audio(seconds, seed=i) // 3
+            part = np.clip(mixed, -32768, 32767).astype(np.int16)
+        elif speech:
+            part = speech_like_audio(seconds, seed=i)
+        else:
+            part = music_like_audio(seconds, seed=i)
+        parts.append(part)
+        sections.append((name, pos, pos + len(part), speech))
+        pos += len(part)
+    return np.concatenate(parts), sections
+
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VAD gating benchmark")
+    parser.add_argument("--minutes", type=float, default=20)
+    parser.add_argument("--no-asr", action="store_true", help="skip the Vosk comparison")
+    args = parser.parse_args()
+
+    Config.DEBUG = False
+    samples, sections = soundtrack(args.minutes)
+    path = write_wav(os.path.join(tempfile.mkdtemp(prefix="bilivagent_vad_bench_"), "soundtrack.wav"), samples)
+    try:
+        start = time.perf_counter()
+        regions, rate, total = speech_regions(path, padding=Config.VAD_PADDING)
+        elapsed = time.perf_counter() - start
+
+        kept = sum(end - begin for begin, end in regions)
+        print(f"{total / rate / 60:.0f} min audio: VAD {elapsed * 1000:.0f} ms "
+              f"({total / rate / elapsed:,.0f}x realtime), kept {kept / rate:.0f}s "
+              f"({kept / total:.0%}) in {len(regions)} regions")
+        for name, begin, end, speech in sections:
+            overlap = sum(max(0, min(e, end) - max(b, begin)) for b, e in regions)
+            print(f"  {name:<16} {(end - begin) / rate:6.0f}s  kept {overlap / (end - begin):6.1%}"
+                  f"  ({'speech' if speech else 'no speech'})")
+
+        if args.no_asr:
+            return
+        if not os.path.exists(Config.VOSK_MODEL_PATH):
+            print(f"No Vosk model at {Config.VOSK_MODEL_PATH}, skipping the ASR comparison")
+            return
+
+        from bilivagent.utils.audio import SpeechRecognizer
+
+        recognizer = SpeechRecognizer(Config.VOSK_MODEL_PATH)
+        results = {}
+        for vad in (False, True):
+            cpu_start, start = cpu_seconds(), time.perf_counter()
+            segments = recognizer.transcribe_segments(path, vad=vad)
+            results[vad] = (time.perf_counter() - start, cpu_seconds() - cpu_start, segments)
+            wall, cpu, _ = results[vad]
+            print(f"  ASR {'with' if vad else 'without'} VAD: {wall:7.1f}s wall  {cpu:7.1f}s cpu  "
+                  f"{len(segments)} utterances")
+        print(f"  ASR CPU reduced {results[False][1] / max(results[True][1], 1e-9):.1f}x")
+    finally:
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+
+
+if __name__ == "__main__":
+    main()
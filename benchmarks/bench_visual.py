@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark: local visual features versus frame sampling alone
+
+Times the single pass that saves the style frames and computes the local
+visual features, next to the seek-based random frame extraction it
+replaces, and shows what each style mode sends to the vision model.
+
+Fixture: an "edited" video cutting between test patterns every few
+seconds (so cuts per minute is known), or any video given with --video.
+
+Usage:
+  python benchmarks/bench_visual.py --seconds 300
+  python benchmarks/bench_visual.py --video ~/Downloads/BV1xx411c7mD.mp4
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bilivagent.config import Config
+from bilivagent.utils.ffmpeg import find_ffmpeg
+from bilivagent.utils.video import VideoProcessor
+from bilivagent.utils.visual import describe
+from fixtures import FIXTURE_DIR
+
+SOURCES = ["testsrc2", "smptebars", "mandelbrot", "rgbtestsrc", "cellauto"]
+
+
+def edited_video(seconds: int, shot: int) -> str:
+    """640x360 video switching source every `shot` seconds, generated once"""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    path = os.path.join(FIXTURE_DIR, f"edited_{seconds}s_{shot}s.mp4")
+    if os.path.exists(path):
+        return path
+
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg is required to generate fixture videos")
+    shots = -(-seconds // shot)
+    command = [ffmpeg, "-y", "-loglevel", "error"]
+    for i in range(shots):
+        command += ["-f", "lavfi", "-t", str(shot), "-i", f"{SOURCES[i % len(SOURCES)]}=size=640x360:rate=25"]
+    inputs = "".join(f"[{i}:v]format=yuv420p,setsar=1[v{i}];" for i in range(shots))
+    concat = "".join(f"[v{i}]" for i in range(shots)) + f"concat=n={shots}:v=1:a=0[out]"
+    tmp_path = path + ".tmp.mp4"
+    subprocess.run(command + ["-filter_complex", inputs + concat, "-map", "[out]",
+                              "-c:v", "mpeg4", "-q:v", "5", tmp_path], check=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local visual features benchmark")
+    parser.add_argument("--seconds", type=int, default=300, help="fixture length")
+    parser.add_argument("--shot", type=int, default=5, help="fixture shot length in seconds")
+    parser.add_argument("--video", default=None, help="use this video instead of the fixture")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    Config.DEBUG = False
+    video = args.video or edited_video(args.seconds, args.shot)
+    processor = VideoProcessor()
+    out_dir = tempfile.mkdtemp(prefix="bilivagent_visual_bench_")
+    try:
+        import cv2
+        cap = cv2.VideoCapture(video)
+        duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / (cap.get(cv2.CAP_PROP_FPS) or 25)
+        cap.release()
+        print(f"{os.path.basename(video)}: {duration:.0f}s"
+              + ("" if args.video else f", a cut every {args.shot}s ({60 / args.shot:.0f}/min)"))
+
+        def best(fn):
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                result = fn()
+                times.append(time.perf_counter() - start)
+            return min(times), result
+
+        elapsed, _ = best(lambda: processor.extract_random_frames(video, 30, out_dir))
+        print(f"  seek 30 random frames (no features):  {elapsed:6.2f}s")
+
+        for mode, frames in (("vlm", 30), ("hybrid", Config.VIDEO_STYLE_FRAMES), ("local", 0)):
+            elapsed, (paths, features) = best(lambda: processor.extract_frames_with_features(video, frames, out_dir))
+            sent = paths[:10] if mode == "vlm" else paths
+            size = sum(os.path.getsize(path) for path in sent)
+            print(f"  {mode:<6} pass, {len(paths):2d} frames + features:  {elapsed:6.2f}s "
+                  f"({duration / elapsed:5.0f}x realtime)  to VLM: "
+                  + (f"{len(sent)} frames, {size / 1024:.0f} KiB" if sent else "no call"))
+        print(f"\n  features: {features}")
+        print(f"  local style: {describe(features)}")
+    finally:
+        shutil.rmtree(out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Local stand-ins for the network services used by the pipeline
+
+- FakeSiliconFlowServer: OpenAI-compatible /chat/completions endpoint with
+  configurable latency, generation speed, streaming and injected 429s
+- FakeBilibiliParser / FakeBilibiliDownloader: serve video info, comments,
+  danmaku and a fixture video from memory instead of Bilibili
+"""
+import os
+import sys
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bilivagent.utils.bilibili import BilibiliParser
+
+_SUMMARY_TEXT = "视频介绍了剪辑流程和配音技巧，节奏紧凑，讲解清楚，适合入门观众。"
+_KEYWORDS = ["剪辑", "配音", "节奏", "教程", "入门", "画质", "字幕", "bgm", "技巧", "流程"]
+_STYLE_TEXT = "画面明亮，以近景讲解为主，剪辑节奏较快，整体风格轻松活泼。"
+
+
+class FakeSiliconFlowServer:
+    """
+    Threaded local server answering chat completions with canned text.
+
+    Args:
+        latency: seconds before the first byte of every response
+        tokens_per_second: simulated generation speed (0 = instant)
+        rate_limit_ratio: fraction of requests answered with HTTP 429
+        seed: seed for 429 injection
+    """
+
+    def __init__(self, latency: float = 0.05, tokens_per_second: float = 0.0, rate_limit_ratio: float = 0.0,
+                 seed: int = 42, port: int = 0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.rate_limit_ratio = rate_limit_ratio
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "streams": 0, "vision": 0, "request_bytes": 0}
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeSiliconFlowServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def reset_stats(self):
+        with self._lock:
+            for key in self.stats:
+                self.stats[key] = 0
+
+    def _count(self, **values: int):
+        with self._lock:
+            for key, value in values.items():
+                self.stats[key] += value
+
+    def _should_rate_limit(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.rate_limit_ratio
+
+    @staticmethod
+    def answer_for(payload: Dict) -> str:
+        """Pick a canned answer matching what the pipeline asked for"""
+        messages = payload.get("messages") or []
+        last = messages[-1].get("content", "") if messages else ""
+        if isinstance(last, list):
+            return _STYLE_TEXT
+        if "JSON" in last:
+            return json.dumps({"summary": _SUMMARY_TEXT, "keywords": _KEYWORDS}, ensure_ascii=False)
+        return _SUMMARY_TEXT
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str = "application/json", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                payload = json.loads(raw or b"{}")
+                last = (payload.get("messages") or [{}])[-1].get("content", "")
+                server._count(requests=1, request_bytes=len(raw), vision=int(isinstance(last, list)))
+
+                time.sleep(server.latency)
+                if server._should_rate_limit():
+                    server._count(rate_limited=1)
+                    body = json.dumps({"error": {"message": "rate limited"}}).encode()
+                    self._send(429, body, headers={"Retry-After": "1"})
+                    return
+
+                text = server.answer_for(payload)
+                for stop in payload.get("stop") or []:
+                    text = text.split(stop)[0]
+                completion_tokens = len(text)
+                if server.tokens_per_second and not payload.get("stream"):
+                    time.sleep(completion_tokens / server.tokens_per_second)
+
+                if payload.get("stream"):
+                    server._count(streams=1)
+                    self._stream(text)
+                    return
+
+                body = json.dumps({
+                    "model": payload.get("model", ""),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": len(raw) // 3, "completion_tokens": completion_tokens},
+                }, ensure_ascii=False).encode()
+                self._send(200, body)
+
+            def _stream(self, text: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                step = 8
+                for i in range(0, len(text), step):
+                    piece = text[i:i + step]
+                    if server.tokens_per_second:
+                        time.sleep(len(piece) / server.tokens_per_second)
+                    event = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+                    self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        return Handler
+
+
+class FakeBilibiliParser(BilibiliParser):
+    """
+    BilibiliParser serving fixed data; `page_latency` simulates the
+    round trip of each API page (comments come 20 per page).
+    """
+
+    def __init__(self, comments: List[Dict], danmaku: List[str], duration: int = 60, page_latency: float = 0.0):
+        super().__init__()
+        self.comments = comments
+        self.danmaku = danmaku
+        self.duration = duration
+        self.page_latency = page_latency
+
+    def get_video_info(self, bv_number: str) -> Dict:
+        time.sleep(self.page_latency)
+        return {
+            "bvid": bv_number,
+            "title": "离线基准测试视频",
+            "desc": "benchmark fixture",
+            "owner": "bench",
+            "tags": ["教程", "剪辑"],
+            "tname": "知识",
+            "duration": self.duration,
+            "pubdate": 0,
+            "cid": 1,
+        }
+
+    def get_comments(self, bv_number: str, max_count: int = 100) -> list:
+        pages = -(-min(len(self.comments), max_count) // 20)
+        time.sleep(self.page_latency * (pages + 1))
+        return self.comments[:max_count]
+
+    def get_danmaku(self, bv_number: str, cid: int) -> list:
+        time.sleep(self.page_latency)
+        return list(self.danmaku)
+
+    def iter_danmaku(self, bv_number: str, cid: int, duration: int):
+        """The danmaku spread evenly over the 6-minute segments"""
+        segments = max(0, duration) // 360 + 1
+        size = -(-len(self.danmaku) // segments)
+        for start in range(0, len(self.danmaku), size or 1):
+            time.sleep(self.page_latency)
+            yield self.danmaku[start:start + size]
+
+
+class FakeBilibiliDownloader:
+    """Downloader returning a pre-generated fixture video (or None to skip video analysis)"""
+
+    def __init__(self, video_path: Optional[str]):
+        self.video_path = video_path
+
+    def download_video(self, bv_number: str, audio_only: bool = False) -> Optional[str]:
+        return self.video_path
+
+    def find_downloaded(self, bv_number: str, audio_only: bool = False) -> Optional[str]:
+        return None
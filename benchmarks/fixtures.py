@@ -0,0 +1,148 @@
+"""
+Synthetic benchmark inputs: speech-like audio, fixture videos, danmaku and comment corpora
+"""
+import os
+import sys
+import wave
+import random
+import subprocess
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bilivagent.config import Config
+from bilivagent.utils.ffmpeg import find_ffmpeg
+
+FIXTURE_DIR = os.path.join(Config.CACHE_DIR, "bench_fixtures")
+
+
+def speech_like_audio(seconds: float, sample_rate: int = 16000, seed: int = 42) -> np.ndarray:
+    """
+    Mono int16 audio with speech-like structure: ~4 Hz syllables of a
+    harmonic voiced source with drifting pitch, separated by short and
+    long pauses, over a low noise floor.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    audio = np.zeros(total, dtype=np.float32)
+
+    pos = 0
+    while pos < total:
+        # Utterance of 5-20 syllables, then a pause of 0.3-1.2s
+        for _ in range(rng.integers(5, 21)):
+            length = int(rng.uniform(0.12, 0.3) * sample_rate)
+            end = min(pos + length, total)
+            if end <= pos:
+                break
+            t = np.arange(end - pos) / sample_rate
+            pitch = rng.uniform(100, 250) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(1, 3) * t))
+            phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+            voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+            envelope = np.sin(np.pi * np.arange(end - pos) / (end - pos)) ** 2
+            audio[pos:end] = 0.3 * voiced * envelope
+            pos = end + int(rng.uniform(0.02, 0.08) * sample_rate)
+        pos += int(rng.uniform(0.3, 1.2) * sample_rate)
+
+    audio += rng.normal(0, 0.005, total).astype(np.float32)
+    return (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+
+
+def music_like_audio(seconds: float, sample_rate: int = 16000, seed: int = 7) -> np.ndarray:
+    """
+    Mono int16 background music: sustained harmonic chords changing every
+    2 seconds with a kick drum on every half second.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    t = np.arange(total) / sample_rate
+    audio = np.zeros(total, dtype=np.float32)
+
+    chords = [(220, 277, 330), (196, 247, 294), (175, 220, 262), (165, 208, 247)]
+    bar = 2 * sample_rate
+    for i, start in enumerate(range(0, total, bar)):
+        span = slice(start, min(start + bar, total))
+        for freq in chords[i % len(chords)]:
+            for k in range(1, 5):
+                audio[span] += 0.08 / k * np.sin(2 * np.pi * freq * k * t[span])
+
+    kick = np.arange(2000) / sample_rate
+    kick = 0.5 * np.exp(-kick * sample_rate / 300) * np.sin(2 * np.pi * 60 * kick)
+    for start in range(0, total, sample_rate // 2):
+        end = min(start + len(kick), total)
+        audio[start:end] += kick[:end - start]
+
+    audio += rng.normal(0, 0.003, total).astype(np.float32)
+    return (np.clip(audio, -1, 1) * 20000).astype(np.int16)
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int = 16000) -> str:
+    """Write mono int16 samples as a WAV file"""
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.tobytes())
+    return path
+
+
+def fixture_video(seconds: int, fixture_dir: str = FIXTURE_DIR) -> str:
+    """
+    Return a 640x360 test-pattern video with speech-like audio,
+    generating (and caching) it on first use.
+    """
+    os.makedirs(fixture_dir, exist_ok=True)
+    video_path = os.path.join(fixture_dir, f"fixture_{seconds}s.mp4")
+    if os.path.exists(video_path):
+        return video_path
+
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg is required to generate fixture videos")
+
+    wav_path = write_wav(os.path.join(fixture_dir, f"fixture_{seconds}s.wav"), speech_like_audio(seconds))
+    tmp_path = video_path + ".tmp.mp4"
+    subprocess.run(
+        [ffmpeg, "-y", "-loglevel", "error",
+         "-f", "lavfi", "-i", f"testsrc2=size=640x360:rate=25:duration={seconds}",
+         "-i", wav_path,
+         "-c:v", "mpeg4", "-q:v", "5", "-c:a", "aac", "-shortest", tmp_path],
+        check=True,
+    )
+    os.replace(tmp_path, video_path)
+    os.remove(wav_path)
+    return video_path
+
+
+def generate_danmaku(count: int, seed: int = 42) -> List[str]:
+    """Spam-heavy danmaku: a few memes repeated with noise plus some unique lines"""
+    rng = random.Random(seed)
+    spam = ["哈哈哈哈", "前方高能", "awsl", "来了", "泪目", "下次一定", "妈妈问我为什么跪着看"]
+    topics = ["剪辑", "配音", "画质", "剧情", "up主", "结尾", "bgm", "字幕", "节奏", "封面"]
+    opinions = ["真的很用心", "有点拖沓", "比上一期好", "讲得很清楚", "没看懂", "建议出续集"]
+    lines = []
+    for _ in range(count):
+        r = rng.random()
+        if r < 0.8:
+            line = rng.choice(spam) * rng.randint(1, 3) + "!" * rng.randint(0, 3)
+        else:
+            line = f"{rng.choice(topics)}{rng.choice(opinions)}{rng.randint(0, 10 ** rng.randint(1, 5))}"
+        lines.append(line)
+    return lines
+
+
+def generate_comments(count: int, seed: int = 42) -> List[Dict]:
+    """Comments in the shape returned by BilibiliParser.get_comments, some with contact details"""
+    rng = random.Random(seed)
+    fragments = ["这个视频", "真的", "太棒了", "不好看", "无聊", "up主", "好像", "还行吧", "一点都不精彩", "支持",
+                 "哈哈哈", "讲得很清楚", "垃圾", "感动", "下次一定", "特别喜欢"]
+    contacts = ["联系我 13812345678", "邮箱 fan@example.com", ""]
+    return [
+        {
+            "content": "".join(rng.choice(fragments) for _ in range(rng.randint(1, 6))) + rng.choice(contacts),
+            "like": int(rng.paretovariate(1.2)) - 1,
+            "member": f"user{i}",
+        }
+        for i in range(count)
+    ]
@@ -1,43 +1,34 @@
-"""Main BiliVagent agent using LangChain"""
+"""Main BiliVagent agent"""
 import os
 import json
-from typing import Dict
-from langchain_classic.agents import AgentExecutor, create_react_agent
-from langchain_core.tools import Tool
-from langchain_core.prompts import PromptTemplate
-from langchain_core.language_models.llms import LLM
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
-from typing import Optional, List, Any
+import time
+import contextlib
+from typing import Callable, Dict, Optional
 
 from bilivagent.config import Config
 from bilivagent.utils.bilibili import BilibiliParser, BilibiliDownloader
 from bilivagent.utils.siliconflow import SiliconFlowClient
+from bilivagent.utils.routing import ModelRouter
+from bilivagent.utils import streaming
+from bilivagent.utils.streaming import LineSpill
+from bilivagent.utils.tracing import tracer
+from bilivagent.utils.metrics import ANALYSES, STAGE_SECONDS
+from bilivagent.utils.report import print_report
+from bilivagent.utils.report_store import ReportStore
+from bilivagent.utils.planner import Plan, StageCosts
+from bilivagent.utils.visual import report_fields
+from bilivagent.utils.cancel import CancelToken, Cancelled, cancel_scope, check_cancelled
 from bilivagent.processors.video_content import VideoContentProcessor
 from bilivagent.processors.text_content import TextContentProcessor
 
 
-class SiliconFlowLLM(LLM):
-    """Custom LLM wrapper for SiliconFlow API"""
-    
-    client: SiliconFlowClient = None
-    
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.client = SiliconFlowClient()
-    
-    @property
-    def _llm_type(self) -> str:
-        return "siliconflow"
-    
-    def _call(
-        self,
-        prompt: str,
-        stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
-        **kwargs: Any,
-    ) -> str:
-        messages = [{"role": "user", "content": prompt}]
-        return self.client.chat_completion(messages, max_tokens=2000)
+def __getattr__(name: str):
+    # SiliconFlowLLM lives in bilivagent.agents.llm; importing it pulls in
+    # LangChain, so it is only loaded when actually requested from here
+    if name == "SiliconFlowLLM":
+        from bilivagent.agents.llm import SiliconFlowLLM
+        return SiliconFlowLLM
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class BiliVagent:
@@ -48,87 +39,183 @@ class BiliVagent:
         
         self.parser = BilibiliParser()
         self.downloader = BilibiliDownloader(Config.TEMP_DIR)
-        self.video_processor = VideoContentProcessor()
-        self.text_processor = TextContentProcessor()
         self.client = SiliconFlowClient()
+        # One router for all processors so model metrics cover the whole run
+        self.router = ModelRouter(self.client)
+        self.video_processor = VideoContentProcessor(self.router)
+        self.text_processor = TextContentProcessor(self.router)
+        self.report_store = ReportStore()
+        self.stage_costs = StageCosts()
     
-    def analyze_video(self, url_or_bv: str) -> Dict:
-        """Complete video analysis workflow"""
+    def analyze_video(self, url_or_bv: str, download: bool = True,
+                      on_stage: Optional[Callable[[str], None]] = None,
+                      deadline: Optional[float] = None,
+                      cancel: Optional[CancelToken] = None) -> Dict:
+        """
+        Complete video analysis workflow.
+        With download=False the video stage is skipped and only comments
+        and danmaku are analyzed. on_stage is called with each stage name
+        ("parse", "video_info", ..., "report") as the stage starts.
+        With a deadline (seconds) the pipeline is degraded as needed to
+        finish in time (see bilivagent.utils.planner); the report then
+        lists the degradations under 处理计划.
+        Cancelling the token (from any thread) stops the running stage and
+        raises Cancelled (see bilivagent.utils.cancel).
+        """
+        with cancel_scope(cancel):
+            try:
+                report = self._analyze_video(url_or_bv, download, on_stage, deadline)
+            except Cancelled:
+                ANALYSES.inc(outcome="cancelled")
+                print("\nAnalysis cancelled")
+                raise
+            except Exception:
+                ANALYSES.inc(outcome="failed")
+                raise
+            ANALYSES.inc(outcome="done")
+            return report
+
+    def _analyze_video(self, url_or_bv: str, download: bool,
+                       on_stage: Optional[Callable[[str], None]], deadline: Optional[float]) -> Dict:
+        start = time.monotonic()
+
+        @contextlib.contextmanager
+        def stage(name: str):
+            check_cancelled()
+            if on_stage:
+                on_stage(name)
+            with tracer.span(f"stage.{name}"), STAGE_SECONDS.time(stage=name):
+                yield
+
         print("="*60)
         print("BiliVagent - Bilibili Video Analysis")
         print("="*60)
         
         # Step 1: Parse BV number
         print("\n[1/8] Parsing BV number...")
-        bv_number = self.parser.parse_bv_number(url_or_bv)
+        with stage("parse"):
+            bv_number = self.parser.parse_bv_number(url_or_bv)
         print(f"BV号: {bv_number}")
         
-        # Step 2: Get video info
-        print("\n[2/8] Fetching video information...")
-        video_info = self.parser.get_video_info(bv_number)
-        print(f"标题: {video_info['title']}")
-        print(f"分区: {video_info['tname']}")
-        
-        # Step 3: Download video
-        print("\n[3/8] Downloading video...")
-        video_path = self.downloader.download_video(bv_number)
-        
-        if not video_path:
-            print("Warning: Video download failed, skipping video analysis")
-            video_analysis = {
-                "transcription": "视频下载失败",
-                "summary": "",
-                "keywords": [],
-                "frames": [],
-                "video_style": "无法分析"
-            }
-        else:
-            print(f"Video saved to: {video_path}")
+        with tracer.span("analyze_video", bvid=bv_number):
+            # Step 2: Get video info
+            print("\n[2/8] Fetching video information...")
+            with stage("video_info"):
+                video_info = self.parser.get_video_info(bv_number)
+            print(f"标题: {video_info['title']}")
+            print(f"分区: {video_info['tname']}")
+
+            minutes = video_info['duration'] / 60
+            plan = Plan.create(deadline, minutes, self.stage_costs, download, start)
+            if deadline is not None:
+                print(plan.describe())
             
-            # Step 4: Process video content
-            print("\n[4/8] Processing video content...")
-            video_analysis = self.video_processor.process(video_path, bv_number)
-        
-        # Step 5: Get comments
-        print("\n[5/8] Fetching comments...")
-        comments = self.parser.get_comments(bv_number, max_count=100)
-        print(f"Fetched {len(comments)} comments")
-        
-        # Step 6: Get danmaku
-        print("\n[6/8] Fetching danmaku...")
-        danmaku = self.parser.get_danmaku(bv_number, video_info['cid'])
-        print(f"Fetched {len(danmaku)} danmaku")
-        
-        # Step 7: Process text content
-        print("\n[7/8] Processing text content (comments and danmaku)...")
-        text_analysis = self.text_processor.process(comments, danmaku)
-        
-        # Step 8: Generate final report
-        print("\n[8/8] Generating final report...")
-        report = self._generate_report(
-            bv_number=bv_number,
-            video_info=video_info,
-            video_analysis=video_analysis,
-            text_analysis=text_analysis
-        )
-        
-        # Save report
-        output_path = os.path.join(Config.OUTPUT_DIR, f"{bv_number}_report.json")
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, ensure_ascii=False, indent=2)
+            # Step 3: Download video
+            print("\n[3/8] Downloading video...")
+            video_path = None
+            if plan.download:
+                with stage("download"):
+                    cached = self.downloader.find_downloaded(bv_number, plan.audio_only) is not None
+                    with plan.timed("download_audio" if plan.audio_only else "download", minutes, record=not cached):
+                        video_path = self.downloader.download_video(bv_number, audio_only=plan.audio_only)
+            else:
+                print("Skipped video download")
+            
+            if not plan.download:
+                video_analysis = {
+                    "transcription": "已跳过视频下载",
+                    "summary": "",
+                    "keywords": [],
+                    "frames": [],
+                    "video_style": "未分析",
+                    "visual_features": {}
+                }
+            elif not video_path:
+                print("Warning: Video download failed, skipping video analysis")
+                video_analysis = {
+                    "transcription": "视频下载失败",
+                    "summary": "",
+                    "keywords": [],
+                    "frames": [],
+                    "video_style": "无法分析",
+                    "visual_features": {}
+                }
+            else:
+                print(f"Video saved to: {video_path}")
+                
+                # Step 4: Process video content
+                print("\n[4/8] Processing video content...")
+                with stage("video_content"):
+                    video_analysis = self.video_processor.process(video_path, bv_number, plan)
+            
+            # Step 5: Get comments
+            print("\n[5/8] Fetching comments...")
+            with stage("comments"), plan.timed("comments"):
+                comments = self.parser.get_comments(bv_number, max_count=100)
+            print(f"Fetched {len(comments)} comments")
+            
+            # Step 6: Get danmaku
+            print("\n[6/8] Fetching danmaku...")
+            with stage("danmaku"), plan.timed("danmaku"):
+                if streaming.enabled():
+                    # Fetched segment by segment into a file instead of memory
+                    danmaku = LineSpill.write(
+                        self.parser.iter_danmaku(bv_number, video_info['cid'], video_info['duration']),
+                        Config.TEMP_DIR, prefix=f"{bv_number}.danmaku."
+                    )
+                else:
+                    danmaku = self.parser.get_danmaku(bv_number, video_info['cid'])
+            print(f"Fetched {len(danmaku)} danmaku")
+            
+            # Step 7: Process text content
+            print("\n[7/8] Processing text content (comments and danmaku)...")
+            try:
+                with stage("text_content"), plan.timed("text"):
+                    text_analysis = self.text_processor.process(comments, danmaku)
+            finally:
+                if isinstance(danmaku, LineSpill):
+                    danmaku.remove()
+            
+            # Step 8: Generate final report
+            print("\n[8/8] Generating final report...")
+            with stage("report"):
+                report = self._generate_report(
+                    bv_number=bv_number,
+                    video_info=video_info,
+                    video_analysis=video_analysis,
+                    text_analysis=text_analysis,
+                    video_status="已跳过" if not plan.download else "下载失败" if not video_path else "完整"
+                )
+                if deadline is not None:
+                    report["处理计划"] = plan.report()
+                
+                # Save report
+                self.report_store.put(report)
+                output_path = self.report_store.path
+                if Config.SAVE_REPORT_JSON:
+                    output_path = os.path.join(Config.OUTPUT_DIR, f"{bv_number}_report.json")
+                    with open(output_path, 'w', encoding='utf-8') as f:
+                        json.dump(report, f, ensure_ascii=False, indent=2)
         
         print(f"\n✓ Report saved to: {output_path}")
+        Config.debug_print(f"[DEBUG] LLM usage by model tier:\n{self.router.metrics_summary()}")
         
         return report
     
-    def _generate_report(self, bv_number: str, video_info: Dict, video_analysis: Dict, text_analysis: Dict) -> Dict:
-        """Generate final analysis report"""
+    def _generate_report(self, bv_number: str, video_info: Dict, video_analysis: Dict, text_analysis: Dict,
+                         video_status: str = "完整") -> Dict:
+        """
+        Generate final analysis report. video_status (完整, 已跳过 or 下载失败)
+        records whether the video itself was analyzed, so cached reports are
+        only reused by requests they cover.
+        """
         report = {
             "BV号": bv_number,
             "视频标题": video_info['title'],
             "概述": video_analysis.get('summary', ''),
             "关键词（前十）": video_analysis.get('keywords', []),
             "视频风格": video_analysis.get('video_style', ''),
+            "视觉特征": report_fields(video_analysis.get('visual_features', {})),
             "讨论情感": text_analysis.get('sentiment_label', ''),
             "讨论关键词": text_analysis.get('comment_keywords', []),
             "相关讨论": text_analysis.get('discussion_summary', ''),
@@ -137,8 +224,10 @@ class BiliVagent:
                 "标签": video_info['tags'],
                 "UP主": video_info['owner'],
                 "时长": video_info['duration'],
+                "发布时间": video_info.get('pubdate', 0),
                 "评论数": text_analysis.get('total_comments', 0),
                 "弹幕数": text_analysis.get('total_danmaku', 0),
+                "视频分析": video_status,
             }
         }
         
@@ -146,24 +235,4 @@ class BiliVagent:
     
     def print_report(self, report: Dict):
         """Print formatted report"""
-        print("\n" + "="*60)
-        print("分析报告")
-        print("="*60)
-        print(f"\nBV号: {report['BV号']}")
-        print(f"视频标题: {report['视频标题']}")
-        print(f"\n概述:\n{report['概述']}")
-        print(f"\n关键词（前十）:")
-        for i, keyword in enumerate(report['关键词（前十）'], 1):
-            print(f"  {i}. {keyword}")
-        print(f"\n视频风格: {report['视频风格']}")
-        print(f"\n讨论情感: {report['讨论情感']}")
-        print(f"\n讨论关键词:")
-        for i, keyword in enumerate(report['讨论关键词'], 1):
-            print(f"  {i}. {keyword}")
-        print(f"\n相关讨论:\n{report['相关讨论']}")
-        print("\n元数据:")
-        print(f"  分区: {report['元数据']['分区']}")
-        print(f"  UP主: {report['元数据']['UP主']}")
-        print(f"  评论数: {report['元数据']['评论数']}")
-        print(f"  弹幕数: {report['元数据']['弹幕数']}")
-        print("="*60)
+        print_report(report)
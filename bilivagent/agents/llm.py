@@ -0,0 +1,129 @@
+"""LangChain LLM wrapper around the SiliconFlow client"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from langchain_core.language_models.llms import LLM
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
+
+from bilivagent.config import Config
+from bilivagent.utils.routing import ModelRouter
+from bilivagent.utils.cancel import bound
+
+
+class SiliconFlowLLM(LLM):
+    """
+    Custom LLM wrapper for SiliconFlow API.
+
+    Implements native sync/async calls, streaming and concurrent batching on
+    the router's pooled client, so LangChain's `abatch`/`astream` do not fall
+    back to wrapping blocking requests in threads. Stop sequences are sent to
+    the server so generation ends as soon as one is produced.
+    """
+    
+    router: Any = None
+    task: str = "agent"
+    max_tokens: int = 2000
+    temperature: float = 0.7
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if self.router is None:
+            self.router = ModelRouter()
+    
+    @property
+    def _llm_type(self) -> str:
+        return "siliconflow"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.router.model_for(self.task), "max_tokens": self.max_tokens, "temperature": self.temperature}
+
+    def _request_kwargs(self, stop: Optional[List[str]], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "stop": stop,
+            "max_tokens": kwargs.get("max_tokens", self.max_tokens),
+            "temperature": kwargs.get("temperature", self.temperature),
+        }
+    
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        messages = [{"role": "user", "content": prompt}]
+        return self.router.complete(self.task, messages, **self._request_kwargs(stop, kwargs))
+
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        messages = [{"role": "user", "content": prompt}]
+        return await self.router.acomplete(self.task, messages, **self._request_kwargs(stop, kwargs))
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        messages = [{"role": "user", "content": prompt}]
+        for delta in self.router.client.stream_chat_completion(
+            messages, model=self.router.model_for(self.task), **self._request_kwargs(stop, kwargs)
+        ):
+            chunk = GenerationChunk(text=delta)
+            if run_manager:
+                run_manager.on_llm_new_token(delta, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        messages = [{"role": "user", "content": prompt}]
+        async for delta in self.router.client.astream_chat_completion(
+            messages, model=self.router.model_for(self.task), **self._request_kwargs(stop, kwargs)
+        ):
+            chunk = GenerationChunk(text=delta)
+            if run_manager:
+                await run_manager.on_llm_new_token(delta, chunk=chunk)
+            yield chunk
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        # Run the batch concurrently on the pooled session, keeping prompt order
+        workers = max(1, min(Config.LLM_MAX_CONCURRENCY, len(prompts)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Workers run under the caller's cancel token
+            texts = list(executor.map(bound(lambda p: self._call(p, stop=stop, **kwargs)), prompts))
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        semaphore = asyncio.Semaphore(Config.LLM_MAX_CONCURRENCY)
+
+        async def run(prompt: str) -> str:
+            async with semaphore:
+                return await self._acall(prompt, stop=stop, **kwargs)
+
+        texts = await asyncio.gather(*(run(p) for p in prompts))
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
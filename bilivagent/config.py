@@ -15,13 +15,111 @@ class Config:
     # Models
     LLM_MODEL = os.getenv("LLM_MODEL", "Qwen/Qwen2.5-32B-Instruct")
     VLM_MODEL = os.getenv("VLM_MODEL", "OpenGVLab/InternVL2-26B")
+    # Small, fast model for cheap tasks (chunk summaries, JSON repair, discussion summary)
+    LLM_SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", "Qwen/Qwen2.5-7B-Instruct")
+    # Task -> tier overrides, e.g. "discussion_summary=large,chunk_summary=small"
+    MODEL_ROUTES = os.getenv("MODEL_ROUTES", "")
+    # Try the small model first for large-tier tasks and escalate on bad output
+    MODEL_CASCADE = os.getenv("MODEL_CASCADE", "false").lower() in ("true", "1", "yes")
+
+    # Long transcripts are summarized in chunks of this many tokens, with at
+    # most LLM_MAX_CONCURRENCY requests in flight
+    SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+    # Speech recognition backend: "vosk" or "faster_whisper"
+    ASR_BACKEND = os.getenv("ASR_BACKEND", "vosk").lower()
 
     # Vosk
     VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH", "./model/vosk-model-cn-0.22")
 
+    # faster-whisper: model size ("small", "medium", ...) or a local CTranslate2 model
+    # directory; int8 quantization on CPU, 0 threads means one per core
+    WHISPER_MODEL = os.getenv("WHISPER_MODEL", "small")
+    WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+    WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))
+    WHISPER_BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "1"))
+    WHISPER_LANGUAGE = os.getenv("WHISPER_LANGUAGE", "zh")
+    # Skip silence and music before speech recognition, keeping this much padding (seconds) around speech
+    VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() in ("true", "1", "yes")
+    VAD_PADDING = float(os.getenv("VAD_PADDING", "0.3"))
+    # Audio extraction: "ffmpeg" (direct demux/resample) or "moviepy"
+    AUDIO_BACKEND = os.getenv("AUDIO_BACKEND", "ffmpeg").lower()
+
+    # Video style: "vlm" (vision model on 10 frames), "hybrid" (local frame statistics in the
+    # prompt, VIDEO_STYLE_FRAMES frames) or "local" (frame statistics only, no vision model call)
+    VIDEO_STYLE_MODE = os.getenv("VIDEO_STYLE_MODE", "vlm").lower()
+    VIDEO_STYLE_FRAMES = int(os.getenv("VIDEO_STYLE_FRAMES", "4"))
+    # Frame statistics are sampled at this rate, spaced out further on long videos
+    VISUAL_SAMPLE_FPS = float(os.getenv("VISUAL_SAMPLE_FPS", "2"))
+    VISUAL_MAX_SAMPLES = int(os.getenv("VISUAL_MAX_SAMPLES", "1200"))
+
+    # --deadline planning keeps this fraction of the remaining time as the stage budget
+    DEADLINE_MARGIN = float(os.getenv("DEADLINE_MARGIN", "0.85"))
+
+    # Bounded-memory streaming mode for long videos: MB for the data that grows with the
+    # video length (audio buffers, danmaku, text statistics); 0 keeps everything in memory
+    MEMORY_LIMIT_MB = int(os.getenv("MEMORY_LIMIT_MB", "0"))
+
     # Directories
     OUTPUT_DIR = os.getenv("OUTPUT_DIR", "./output")
     TEMP_DIR = os.getenv("TEMP_DIR", "./temp")
+    CACHE_DIR = os.getenv("CACHE_DIR", "./cache")
+
+    # jieba - extra user dictionaries (os.pathsep separated) and custom IDF table
+    JIEBA_USER_DICTS = [p for p in os.getenv("JIEBA_USER_DICTS", "").split(os.pathsep) if p]
+    JIEBA_IDF_PATH = os.getenv("JIEBA_IDF_PATH", "")
+
+    # Sentiment - optional external lexicon ("word score" per line) merged into the built-in one
+    SENTIMENT_LEXICON_PATH = os.getenv("SENTIMENT_LEXICON_PATH", "")
+    SENTIMENT_NEGATION_WINDOW = int(os.getenv("SENTIMENT_NEGATION_WINDOW", "2"))
+
+    # Token budget for comments/danmaku sent to the discussion summary prompt
+    DISCUSSION_TOKEN_BUDGET = int(os.getenv("DISCUSSION_TOKEN_BUDGET", "3000"))
+
+    # Extra desensitization rules on top of phone/email/ID card (e.g. "qq,url,bank_card")
+    DESENSITIZE_EXTRA_PATTERNS = [p.strip() for p in os.getenv("DESENSITIZE_EXTRA_PATTERNS", "").split(",") if p.strip()]
+
+    # Unix socket of the warm worker daemon (python -m bilivagent.service.daemon)
+    DAEMON_SOCKET = os.getenv("DAEMON_SOCKET", os.path.join(CACHE_DIR, "bilivagent.sock"))
+
+    # HTTP service (python -m bilivagent.service.api)
+    SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+    SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8000"))
+    SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "2"))
+    SERVICE_MAX_QUEUE = int(os.getenv("SERVICE_MAX_QUEUE", "16"))
+    # Saved reports younger than this (seconds) are returned without re-analysis
+    REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "86400"))
+
+    # Report store database (default: OUTPUT_DIR/reports.db)
+    REPORT_STORE_PATH = os.getenv("REPORT_STORE_PATH", "")
+    # Also write each report to OUTPUT_DIR/{bv}_report.json
+    SAVE_REPORT_JSON = os.getenv("SAVE_REPORT_JSON", "true").lower() in ("true", "1", "yes")
+
+    # Durable job queue (python -m bilivagent.service.jobqueue)
+    JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(CACHE_DIR, "jobs.db"))
+    # A worker that stops heartbeating loses its job after this many seconds
+    JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    # Retry delay after the first failure, doubled on each further failure
+    JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "30"))
+    # WAL journal is faster but unsafe when the database is on a network filesystem
+    JOB_QUEUE_WAL = os.getenv("JOB_QUEUE_WAL", "false").lower() in ("true", "1", "yes")
+
+    # Prometheus metrics of the job queue worker and the daemon (the HTTP service
+    # always serves GET /metrics): port for /metrics (0 = off), and/or a textfile
+    # for node_exporter's textfile collector rewritten every METRICS_INTERVAL seconds
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+    METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "")
+    METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "15"))
+
+    # Record/replay of external I/O: "off", "record" or "replay"
+    CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off").lower()
+    CASSETTE_PATH = os.getenv("CASSETTE_PATH", os.path.join(CACHE_DIR, "cassette.json.gz"))
+    # Sleep for the recorded latency of each response during replay
+    CASSETTE_REPLAY_LATENCY = os.getenv("CASSETTE_REPLAY_LATENCY", "false").lower() in ("true", "1", "yes")
+    # Fail on changed requests instead of serving the next recorded response of the same kind
+    CASSETTE_STRICT = os.getenv("CASSETTE_STRICT", "false").lower() in ("true", "1", "yes")
     
     # Debug mode - show detailed info like transcription
     DEBUG = os.getenv("DEBUG", "true").lower() in ("true", "1", "yes")
@@ -41,3 +139,4 @@ class Config:
         # Create directories if they don't exist
         os.makedirs(cls.OUTPUT_DIR, exist_ok=True)
         os.makedirs(cls.TEMP_DIR, exist_ok=True)
+        os.makedirs(cls.CACHE_DIR, exist_ok=True)
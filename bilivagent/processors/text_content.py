@@ -1,18 +1,27 @@
 """Text content processor for comments and danmaku"""
-from typing import Dict, List
-from bilivagent.utils.text import TextProcessor
-from bilivagent.utils.siliconflow import SiliconFlowClient
+import itertools
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+from bilivagent.utils import streaming
+from bilivagent.utils.text import TextProcessor, KeywordCounter
+from bilivagent.utils.routing import ModelRouter
+from bilivagent.utils.dedup import collapse_near_duplicates, pack_by_value
+from bilivagent.config import Config
+from bilivagent.utils.tracing import tracer
+from bilivagent.utils.metrics import TEXT_LINES
+from bilivagent.utils.cancel import check_cancelled
 
 
 class TextContentProcessor:
     """Process text content from comments and danmaku"""
     
-    def __init__(self):
+    def __init__(self, router: Optional[ModelRouter] = None):
         self.text_processor = TextProcessor()
-        self.client = SiliconFlowClient()
+        self.router = router or ModelRouter()
+        self.client = self.router.client
     
-    def process(self, comments: List[Dict], danmaku: List[str]) -> Dict:
-        """Process comments and danmaku"""
+    def process(self, comments: List[Dict], danmaku: Iterable[str]) -> Dict:
+        """Process comments and danmaku (a list, or a LineSpill in streaming mode)"""
         result = {
             "comment_keywords": [],
             "sentiment": {},
@@ -20,41 +29,117 @@ class TextContentProcessor:
             "total_comments": len(comments),
             "total_danmaku": len(danmaku)
         }
+        TEXT_LINES.inc(result["total_comments"], kind="comment")
+        TEXT_LINES.inc(result["total_danmaku"], kind="danmaku")
+        if streaming.enabled():
+            return self._process_bounded(comments, danmaku, result)
         
         # Combine all text
         comment_texts = [c.get("content", "") for c in comments]
         all_texts = comment_texts + danmaku
+        # Danmaku have no likes; they get the base weight
+        all_likes = [c.get("like", 0) for c in comments] + [0] * len(danmaku)
         
         if not all_texts:
             return result
         
         # Desensitize
         print("Desensitizing text content...")
-        desensitized_texts = [self.text_processor.desensitize_text(t) for t in all_texts]
+        with tracer.span("text.desensitize", lines=len(all_texts)):
+            desensitized_texts, redaction_counts = self.text_processor.desensitize_batch(all_texts)
+        result["redaction_counts"] = redaction_counts
         combined_text = "\n".join(desensitized_texts)
         
         # Extract keywords
+        check_cancelled()
         print("Extracting keywords from comments and danmaku...")
-        keywords = self.text_processor.extract_keywords(combined_text, top_k=10)
+        with tracer.span("text.keywords", chars=len(combined_text)):
+            keywords = self.text_processor.extract_keywords(combined_text, top_k=10)
         result["comment_keywords"] = [k[0] for k in keywords]
         
         # Analyze sentiment
+        check_cancelled()
         print("Analyzing sentiment...")
-        sentiment = self.text_processor.analyze_sentiment_keywords(combined_text)
-        result["sentiment"] = sentiment
+        with tracer.span("text.sentiment", lines=len(desensitized_texts)):
+            sentiment = self.text_processor.analyze_sentiment(desensitized_texts, all_likes)
+        result["sentiment"] = sentiment["counts"]
+        result["sentiment_weighted"] = sentiment["weighted"]
+        result["comment_sentiment_scores"] = sentiment["scores"][:len(comments)].tolist()
         
-        # Determine overall sentiment
-        sentiment_label = self._determine_sentiment_label(sentiment)
+        # Determine overall sentiment from the like-weighted counts
+        sentiment_label = self._determine_sentiment_label(sentiment["weighted"])
         result["sentiment_label"] = sentiment_label
         
         # Generate discussion summary
+        check_cancelled()
         print("Generating discussion summary...")
-        discussion_summary = self._generate_discussion_summary(combined_text[:5000])
+        # Collapse repeated danmaku so the token budget goes to real discussion
+        with tracer.span("text.dedup", lines=len(desensitized_texts)) as span:
+            groups = collapse_near_duplicates(desensitized_texts)
+            span.set(groups=len(groups))
+        Config.debug_print(f"[DEBUG] Collapsed {len(desensitized_texts)} lines into {len(groups)} groups")
+        discussion_text = pack_by_value(groups, Config.DISCUSSION_TOKEN_BUDGET)
+        discussion_summary = self._generate_discussion_summary(discussion_text)
         result["discussion_summary"] = discussion_summary
         
         return result
     
-    def _determine_sentiment_label(self, sentiment: Dict[str, int]) -> str:
+    def _process_bounded(self, comments: List[Dict], danmaku: Iterable[str], result: Dict) -> Dict:
+        """
+        process() in bounded memory: lines are desensitized, scored and counted
+        for keywords batch by batch, and only a uniform sample of at most
+        streaming.max_text_lines() lines is kept for the discussion summary.
+        """
+        # Comments first, with their likes; danmaku have no likes and get the base weight
+        batches = itertools.chain(
+            [([c.get("content", "") for c in comments], [c.get("like", 0) for c in comments])],
+            ((batch, None) for batch in streaming.batches(danmaku)),
+        )
+        redaction_counts: Counter = Counter()
+        keywords = KeywordCounter()
+        counts: Counter = Counter()
+        weighted: Counter = Counter()
+        sample = streaming.Reservoir(streaming.max_text_lines())
+
+        print("Desensitizing, extracting keywords and analyzing sentiment in batches...")
+        with tracer.span("text.batches", lines=result["total_comments"] + result["total_danmaku"]):
+            for texts, likes in batches:
+                check_cancelled()
+                if not texts:
+                    continue
+                texts, redactions = self.text_processor.desensitize_batch(texts)
+                redaction_counts.update(redactions)
+                keywords.add("\n".join(texts))
+                sentiment = self.text_processor.analyze_sentiment(texts, likes)
+                counts.update(sentiment["counts"])
+                weighted.update(sentiment["weighted"])
+                if likes is not None:
+                    result["comment_sentiment_scores"] = sentiment["scores"].tolist()
+                sample.extend(texts)
+
+        if not sample.seen:
+            return result
+        result["redaction_counts"] = dict(redaction_counts)
+        result["comment_keywords"] = [k[0] for k in keywords.top(10)]
+        result["sentiment"] = {label: counts[label] for label in ("positive", "negative", "neutral")}
+        result["sentiment_weighted"] = {label: round(weighted[label], 2) for label in ("positive", "negative", "neutral")}
+        result.setdefault("comment_sentiment_scores", [])
+        result["sentiment_label"] = self._determine_sentiment_label(result["sentiment_weighted"])
+
+        check_cancelled()
+        print("Generating discussion summary...")
+        with tracer.span("text.dedup", lines=len(sample.items)) as span:
+            # Group counts are scaled back up from the sample to all lines
+            groups = [(text, max(1, round(count * sample.scale)))
+                      for text, count in collapse_near_duplicates(sample.items)]
+            span.set(groups=len(groups))
+        Config.debug_print(f"[DEBUG] Collapsed {len(sample.items)} sampled lines (of {sample.seen}) "
+                           f"into {len(groups)} groups")
+        discussion_text = pack_by_value(groups, Config.DISCUSSION_TOKEN_BUDGET)
+        result["discussion_summary"] = self._generate_discussion_summary(discussion_text)
+        return result
+
+    def _determine_sentiment_label(self, sentiment: Dict[str, float]) -> str:
         """Determine overall sentiment label"""
         total = sum(sentiment.values())
         if total == 0:
@@ -82,9 +167,12 @@ class TextContentProcessor:
             },
             {
                 "role": "user",
-                "content": f"请根据以下评论和弹幕内容，总结观众的主要讨论点（150字以内）：\n\n{text}"
+                "content": f"请根据以下评论和弹幕内容，总结观众的主要讨论点（150字以内）。重复出现的内容已合并，括号中的“×N”表示出现次数：\n\n{text}"
             }
         ]
         
-        summary = self.client.chat_completion(messages, max_tokens=500)
+        # Cascades (when enabled and routed to the large tier) escalate on empty/very short output
+        summary = self.router.complete(
+            "discussion_summary", messages, validate=lambda s: len(s.strip()) >= 20, max_tokens=500
+        )
         return summary if summary else "无法生成讨论总结"
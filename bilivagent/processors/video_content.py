@@ -1,46 +1,77 @@
 """Video content processor"""
 import os
-from typing import Dict, List
+import json
+from typing import Dict, List, Optional
 from bilivagent.utils.video import VideoProcessor
-from bilivagent.utils.audio import SpeechRecognizer
-from bilivagent.utils.siliconflow import SiliconFlowClient
+from bilivagent.utils.audio import SpeechRecognizer, create_speech_recognizer
+from bilivagent.utils.routing import ModelRouter
+from bilivagent.utils.summarize import MapReduceSummarizer
+from bilivagent.utils.structured import extract_json, split_keywords
+from bilivagent.utils.visual import describe, prompt_lines
+from bilivagent.utils.planner import Plan
+from bilivagent.utils.cancel import Cancelled
+from bilivagent.utils.cassette import CassetteMiss
+from bilivagent.utils.metrics import FRAMES
 from bilivagent.config import Config
 
 
 class VideoContentProcessor:
     """Process video content: extract audio, transcribe, and analyze"""
     
-    def __init__(self):
+    def __init__(self, router: Optional[ModelRouter] = None):
         self.video_processor = VideoProcessor()
-        self.speech_recognizer = None
-        self.client = SiliconFlowClient()
-        
-        # Initialize speech recognizer if model exists
-        if os.path.exists(Config.VOSK_MODEL_PATH):
-            self.speech_recognizer = SpeechRecognizer(Config.VOSK_MODEL_PATH)
+        self._speech_recognizer = None
+        self._speech_recognizer_loaded = False
+        self.router = router or ModelRouter()
+        self.client = self.router.client
+        self.summarizer = MapReduceSummarizer(self.router)
+
+    @property
+    def speech_recognizer(self) -> Optional[SpeechRecognizer]:
+        """Speech recognizer of Config.ASR_BACKEND, loaded on first use (None if unavailable)"""
+        if not self._speech_recognizer_loaded:
+            self._speech_recognizer = create_speech_recognizer()
+            self._speech_recognizer_loaded = True
+        return self._speech_recognizer
     
-    def process(self, video_path: str, bv_number: str) -> Dict:
-        """Process video content"""
+    def process(self, video_path: str, bv_number: str, plan: Optional[Plan] = None) -> Dict:
+        """
+        Process video content. A plan (see bilivagent.utils.planner) may limit
+        or skip speech recognition, switch the summary model and style mode,
+        and marks audio-only downloads; it also measures the stage costs.
+        """
+        plan = plan or Plan()
         result = {
             "transcription": "",
             "summary": "",
             "keywords": [],
             "frames": [],
-            "video_style": ""
+            "video_style": "",
+            "visual_features": {}
         }
         
-        # Extract audio
-        print("Extracting audio from video...")
-        audio_path = self.video_processor.extract_audio(
-            video_path, 
-            os.path.join(Config.TEMP_DIR, f"{bv_number}.wav")
-        )
+        # Extract audio (not needed when the deadline leaves no time for transcription)
+        limit = plan.transcript_limit()
+        audio_path = ""
+        if limit != 0:
+            print("Extracting audio from video...")
+            with plan.timed("audio", plan.minutes):
+                audio_path = self.video_processor.extract_audio(
+                    video_path, 
+                    os.path.join(Config.TEMP_DIR, f"{bv_number}.wav")
+                )
         
         # Transcribe audio to text
-        if self.speech_recognizer and os.path.exists(audio_path):
-            print("Transcribing audio to text...")
+        if limit == 0:
+            print("Skipping transcription to meet the deadline")
+            result["transcription"] = "未进行语音识别（超出时限）"
+        elif self.speech_recognizer and os.path.exists(audio_path):
+            print("Transcribing audio to text..." if limit is None else
+                  f"Transcribing the first {limit / 60:g} minutes of audio...")
             try:
-                transcription = self.speech_recognizer.transcribe(audio_path)
+                minutes = plan.minutes if limit is None else min(plan.minutes, limit / 60)
+                with plan.timed(plan.asr_key, minutes):
+                    transcription = self.speech_recognizer.transcribe(audio_path, max_seconds=limit)
                 result["transcription"] = transcription
                 
                 # Show transcription in debug mode
@@ -48,90 +79,149 @@ class VideoContentProcessor:
                     Config.debug_print(f"[DEBUG] Transcription result ({len(transcription)} chars):")
                     Config.debug_print(f"[DEBUG] {transcription[:500]}{'...' if len(transcription) > 500 else ''}")
 
-                # Generate summary using LLM
+                # Generate summary and keywords using LLM
                 if transcription:
-                    print("Generating summary from transcription...")
-                    summary = self._generate_summary(transcription)
-                    result["summary"] = summary
+                    print("Generating summary and keywords from transcription...")
+                    with plan.timed(plan.summary_key), self.router.overridden(plan.routes):
+                        # Long transcripts are condensed chunk by chunk so nothing is cut off
+                        condensed = self.summarizer.condense(transcription)
+                        analysis = self._analyze_transcript(condensed)
+                    result["summary"] = analysis["summary"]
+                    result["keywords"] = analysis["keywords"]
+                    summary = analysis["summary"]
                     Config.debug_print(f"[DEBUG] Summary: {summary[:200]}..." if len(summary) > 200 else f"[DEBUG] Summary: {summary}")
-
-                    # Extract keywords
-                    keywords = self._extract_keywords(transcription)
-                    result["keywords"] = keywords
-                    Config.debug_print(f"[DEBUG] Keywords: {keywords}")
+                    Config.debug_print(f"[DEBUG] Keywords: {analysis['keywords']}")
+            except CassetteMiss:
+                raise
             except Exception as e:
                 print(f"Error in speech recognition: {e}")
                 result["transcription"] = "语音识别失败"
         else:
             print("Speech recognizer not available, skipping transcription")
-            result["transcription"] = "未进行语音识别（需要Vosk模型）"
+            result["transcription"] = "未进行语音识别（需要语音识别模型）"
+
+        if plan.audio_only:
+            print("Audio-only download, skipping frame analysis")
+            result["video_style"] = "未分析（仅下载音频）"
+            return result
         
-        # Extract and analyze video frames
-        print("Extracting video frames...")
+        # Extract video frames and local visual features in one pass
+        num_frames = {"vlm": 30, "hybrid": Config.VIDEO_STYLE_FRAMES}.get(plan.style_mode, 0)
+        print("Extracting video frames and visual features...")
         try:
-            frame_paths = self.video_processor.extract_random_frames(
-                video_path, 
-                num_frames=30,  # Extract 30 frames for better analysis
-                output_dir=Config.TEMP_DIR
-            )
+            with plan.timed("frames", plan.minutes):
+                frame_paths, features = self.video_processor.extract_frames_with_features(
+                    video_path,
+                    num_frames=num_frames,
+                    output_dir=Config.TEMP_DIR
+                )
             result["frames"] = frame_paths
-            Config.debug_print(f"[DEBUG] Extracted {len(frame_paths)} frames")
+            result["visual_features"] = features
+            FRAMES.inc(len(frame_paths))
+            Config.debug_print(f"[DEBUG] Extracted {len(frame_paths)} frames, visual features: {features}")
 
-            # Analyze video style from frames using multi-image analysis
-            if frame_paths:
+            mode = plan.style()
+            if mode == "local" or not frame_paths:
+                # Local statistics only, no vision model call
+                result["video_style"] = describe(features)
+            else:
+                # Analyze video style from frames using multi-image analysis
                 print(f"Analyzing video style from {len(frame_paths)} frames...")
-                video_style = self._analyze_video_style(frame_paths)
-                result["video_style"] = video_style
-                Config.debug_print(f"[DEBUG] Video style: {video_style}")
+                with plan.timed(f"style.{mode}"):
+                    result["video_style"] = self._analyze_video_style(
+                        frame_paths, features if mode == "hybrid" else None
+                    )
+            Config.debug_print(f"[DEBUG] Video style: {result['video_style']}")
+        except Cancelled:
+            # Frames of a cancelled analysis are not kept
+            for frame_path in result["frames"]:
+                if os.path.exists(frame_path):
+                    os.remove(frame_path)
+            raise
+        except CassetteMiss:
+            # A drifted cassette fails the replay rather than the style analysis
+            raise
         except Exception as e:
             print(f"Error extracting frames: {e}")
         
         return result
     
-    def _generate_summary(self, text: str) -> str:
-        """Generate summary from text using LLM"""
+    def _analyze_transcript(self, text: str, extra_fields: Optional[Dict[str, str]] = None) -> Dict:
+        """
+        Generate summary and keywords (plus optional extra fields) in one
+        structured-output LLM call.
+
+        Args:
+            text: transcript (already condensed to fit one prompt)
+            extra_fields: optional field name -> description to request as well
+        """
+        schema = {
+            "summary": "string, 100字以内的内容概述",
+            "keywords": "array of strings, 最重要的10个关键词",
+        }
+        schema.update(extra_fields or {})
+
         messages = [
             {
                 "role": "system",
-                "content": "你是一个专业的内容分析助手。请根据提供的文本生成简洁的概述。"
+                "content": "你是一个专业的内容分析助手。请只输出一个 JSON 对象，不要输出任何其他内容。"
             },
             {
                 "role": "user",
-                "content": f"请为以下内容生成一个100字以内的概述：\n\n{text[:3000]}"
+                "content": (
+                    "请分析以下内容，按此 JSON 结构输出（字段说明见值）：\n"
+                    f"{json.dumps(schema, ensure_ascii=False, indent=2)}\n\n内容：\n{text}"
+                )
             }
         ]
-        
-        summary = self.client.chat_completion(messages, max_tokens=500)
-        return summary
-    
-    def _extract_keywords(self, text: str) -> List[str]:
-        """Extract keywords from text using LLM"""
+
+        raw = self.router.complete("content_summary", messages, validate=self._is_valid_analysis, max_tokens=700)
+        data = extract_json(raw)
+        if data is None and raw:
+            Config.debug_print("[DEBUG] Malformed structured output, requesting repair")
+            data = extract_json(self._repair_json(raw, schema))
+
+        if data is None:
+            # Repair failed too: keep whatever text the model produced as the summary
+            return {"summary": raw.strip(), "keywords": []}
+
+        result = {key: data.get(key) for key in (extra_fields or {})}
+        result["summary"] = str(data.get("summary") or "").strip()
+        result["keywords"] = split_keywords(data.get("keywords"))
+        return result
+
+    @staticmethod
+    def _is_valid_analysis(raw: str) -> bool:
+        """Whether structured output is usable as is (used to decide escalation)"""
+        data = extract_json(raw)
+        return bool(data and data.get("summary") and len(split_keywords(data.get("keywords"))) >= 3)
+
+    def _repair_json(self, raw: str, schema: Dict[str, str]) -> str:
+        """Ask the model to reformat malformed output as JSON (short, cheap call)"""
         messages = [
-            {
-                "role": "system",
-                "content": "你是一个关键词提取专家。请从文本中提取最重要的10个关键词。"
-            },
             {
                 "role": "user",
-                "content": f"请从以下内容中提取10个最重要的关键词，用逗号分隔：\n\n{text[:2000]}"
+                "content": (
+                    "请将以下内容整理为符合此结构的 JSON 对象，只输出 JSON：\n"
+                    f"{json.dumps(schema, ensure_ascii=False)}\n\n{raw}"
+                )
             }
         ]
-        
-        keywords_str = self.client.chat_completion(messages, max_tokens=200)
-        keywords = [k.strip() for k in keywords_str.split('，') if k.strip()]
-        return keywords[:10]
+        return self.router.complete("json_repair", messages, temperature=0, max_tokens=700)
     
-    def _analyze_video_style(self, frame_paths: List[str]) -> str:
+    def _analyze_video_style(self, frame_paths: List[str], features: Optional[Dict] = None) -> str:
         """
         Analyze video style from frames using vision model.
         Uses multi-image analysis for better understanding of video content.
+        With local visual features (hybrid mode) they are included in the prompt.
         """
         if not frame_paths:
             return "无法分析"
         
-        # Sample frames for analysis (use up to 10 frames to balance quality and API limits)
+        # Sample frames for analysis (use up to 10 frames to balance quality and API limits,
+        # fewer when the local features describe the rest)
         # Select evenly distributed frames from the extracted set
-        max_frames_for_analysis = 10
+        max_frames_for_analysis = Config.VIDEO_STYLE_FRAMES if features else 10
         if len(frame_paths) > max_frames_for_analysis:
             step = len(frame_paths) // max_frames_for_analysis
             sampled_frames = [frame_paths[i * step] for i in range(max_frames_for_analysis)]
@@ -150,6 +240,12 @@ class VideoContentProcessor:
 5. **视觉特色**：最突出的视觉特点
 
 请用简洁的语言总结（100字以内）。"""
+        if features:
+            prompt = (
+                f"以下是对全片 {features['samples']} 个采样帧本地计算的画面统计，"
+                f"请据此判断画质、色彩、镜头运动和剪辑节奏，画面帧主要用于判断类型、构图与视觉特色：\n"
+                f"{prompt_lines(features)}\n\n{prompt}"
+            )
 
-        style = self.client.vision_analysis_multi(sampled_frames, prompt)
+        style = self.router.vision("style", sampled_frames, prompt)
         return style if style else "未知风格"
@@ -0,0 +1,446 @@
+"""
+HTTP service mode
+
+A small JSON API around BiliVagent.analyze_video:
+
+  POST /jobs                    {"video": "BV...", "download": true, "force": false, "deadline": 60}
+                                -> 200 with the report if a fresh cached report covers
+                                   the request (video analyzed when download, not
+                                   degraded without a deadline),
+                                   otherwise 202 with the job (an in-flight job for the
+                                   same BV, download flag and deadline/no deadline is
+                                   reused instead of starting another, unless force);
+                                   the optional deadline (seconds from submission)
+                                   lets the analysis degrade to finish in time
+  GET  /jobs/<id>               -> job status, stage, report or error
+  GET  /jobs/<id>/events?after=N&wait=S
+                                -> progress lines after index N, waiting up to S seconds
+  DELETE /jobs/<id>             -> cancel a queued or running job (it ends as "cancelled";
+                                   downloads, ffmpeg and model calls stop within a second)
+  GET  /health                  -> worker pool and queue state
+  GET  /metrics                 -> Prometheus metrics: stage latency, SiliconFlow requests
+                                   and tokens, cache hits, downloads, ASR speed, queue
+                                   depth and worker utilization (bilivagent.utils.metrics)
+
+Jobs run on a bounded worker pool sharing one agent (models are loaded once);
+submissions beyond SERVICE_MAX_QUEUE waiting jobs are rejected with 503.
+
+Start with:  python -m bilivagent.service.api
+"""
+import re
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+from bilivagent.config import Config
+from bilivagent.utils.cancel import CancelToken, Cancelled
+from bilivagent.utils.metrics import CONTENT_TYPE, QUEUE_JOBS, cache_lookup, metrics, worker_state
+
+# "[3/8] Downloading video..." progress lines printed by analyze_video
+_STAGE_LINE = re.compile(r'^\[(\d+)/(\d+)\]\s*(.*)')
+# Finished jobs kept for status queries
+MAX_FINISHED_JOBS = 1000
+
+
+def _video_analyzed(report: Dict) -> bool:
+    """Whether a report's run downloaded and analyzed the video"""
+    status = report.get("元数据", {}).get("视频分析")
+    if status is None:
+        # Reports saved before the status was recorded
+        return report.get("视频风格") not in ("未分析", "无法分析")
+    return status == "完整"
+
+
+class Job:
+    """One analysis job and its progress events"""
+
+    def __init__(self, bvid: str, video: str, download: bool, deadline: Optional[float] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.bvid = bvid
+        self.video = video
+        self.download = download
+        self.deadline = deadline
+        self.status = "queued"  # queued -> running -> done | failed | cancelled
+        self.stage = ""
+        self.progress = 0.0
+        self.events: List[str] = []
+        self.report: Optional[Dict] = None
+        self.error = ""
+        self.cached = False
+        self.submitted = time.time()
+        self.started = 0.0
+        self.finished = 0.0
+        self.changed = threading.Condition()
+        self.cancel_token = CancelToken()
+
+    @property
+    def key(self) -> Tuple[str, bool, bool]:
+        """Single-flight key: jobs are shared only when they produce the same kind of report"""
+        return self.bvid, self.download, self.deadline is not None
+
+    def log(self, line: str):
+        with self.changed:
+            self.events.append(line)
+            match = _STAGE_LINE.match(line)
+            if match:
+                self.progress = int(match.group(1)) / int(match.group(2))
+                self.stage = match.group(3).rstrip(".")
+            self.changed.notify_all()
+
+    def finish(self, report: Optional[Dict] = None, error: str = "", cancelled: bool = False):
+        with self.changed:
+            self.report = report
+            self.error = error
+            self.status = "cancelled" if cancelled else "failed" if error else "done"
+            if not error:
+                self.progress = 1.0
+            self.finished = time.time()
+            self.changed.notify_all()
+
+    def wait_events(self, after: int, timeout: float) -> Tuple[List[str], bool]:
+        """Events after index `after`, waiting up to timeout for new ones"""
+        with self.changed:
+            self.changed.wait_for(lambda: len(self.events) > after or self.finished, timeout)
+            return self.events[after:], bool(self.finished)
+
+    def to_dict(self, include_report: bool = True) -> Dict:
+        data = {
+            "job_id": self.id,
+            "bvid": self.bvid,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 3),
+            "events": len(self.events),
+            "cached": self.cached,
+            "deadline": self.deadline,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if self.error:
+            data["error"] = self.error
+        if include_report and self.report is not None:
+            data["report"] = self.report
+        return data
+
+
+class _ThreadRoutedStdout:
+    """
+    Process-wide stdout that sends lines printed on a job's worker thread
+    to that job's event log and everything else to the real stdout.
+    """
+
+    encoding = "utf-8"  # yt-dlp checks sys.stdout.encoding
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def bind(self, job: Optional[Job]):
+        self.local.job = job
+        self.local.buffer = ""
+
+    def write(self, text) -> int:
+        job = getattr(self.local, "job", None)
+        if job is None:
+            return self.stream.write(text)
+        if isinstance(text, bytes):
+            text = text.decode("utf-8", errors="replace")
+        buffer = self.local.buffer + text
+        *lines, self.local.buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                job.log(line)
+        return len(text)
+
+    def flush(self):
+        job = getattr(self.local, "job", None)
+        if job is not None and self.local.buffer.strip():
+            job.log(self.local.buffer)
+            self.local.buffer = ""
+        self.stream.flush()
+
+    def isatty(self) -> bool:
+        return False
+
+
+class AnalysisService:
+    """Job registry, single-flight deduplication, cached-report fast path and worker pool"""
+
+    def __init__(self, agent=None, workers: Optional[int] = None, max_queue: Optional[int] = None,
+                 cache_ttl: Optional[float] = None):
+        if agent is None:
+            from bilivagent.agents.bilivagent import BiliVagent
+            agent = BiliVagent()
+            # Load the shared models once instead of on the first jobs
+            _ = agent.video_processor.speech_recognizer
+        self.agent = agent
+        self.workers = workers or Config.SERVICE_WORKERS
+        self.max_queue = Config.SERVICE_MAX_QUEUE if max_queue is None else max_queue
+        self.cache_ttl = Config.REPORT_CACHE_TTL if cache_ttl is None else cache_ttl
+
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis")
+        self.lock = threading.Lock()
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.in_flight: Dict[Tuple[str, bool, bool], Job] = {}
+        self.stats = {"submitted": 0, "deduplicated": 0, "cache_hits": 0, "rejected": 0, "completed": 0, "failed": 0,
+                      "cancelled": 0}
+
+        if not isinstance(sys.stdout, _ThreadRoutedStdout):
+            sys.stdout = _ThreadRoutedStdout(sys.stdout)
+        self.stdout = sys.stdout
+
+        worker_state.total = self.workers
+        metrics.on_collect(self._collect_metrics)
+
+    def _cached_report(self, bvid: str, download: bool = True, degraded: bool = False) -> Optional[Dict]:
+        """
+        Fresh stored report that covers the request: with download, only
+        reports of runs that analyzed the video; reports degraded to meet a
+        deadline only if degraded is allowed
+        """
+        report = self.agent.report_store.get(bvid, max_age=self.cache_ttl)
+        if report is None:
+            return None
+        if not degraded and report.get("处理计划", {}).get("降级"):
+            return None
+        if download and not _video_analyzed(report):
+            return None
+        return report
+
+    def submit(self, video: str, download: bool = True, force: bool = False,
+               deadline: Optional[float] = None) -> Tuple[Job, bool]:
+        """
+        Return (job, created). A fresh cached report yields a finished job;
+        an in-flight job for the same BV, download flag and deadline/no
+        deadline is returned as is. force skips both and starts a new job.
+        Raises OverflowError when the queue is full.
+        """
+        bvid = self.agent.parser.parse_bv_number(video)
+        with self.lock:
+            self.stats["submitted"] += 1
+            job = None if force else self.in_flight.get((bvid, download, deadline is not None))
+            if job is not None:
+                self.stats["deduplicated"] += 1
+                return job, False
+
+            if not force:
+                report = self._cached_report(bvid, download, degraded=deadline is not None)
+                cache_lookup("report", hit=report is not None)
+                if report is not None:
+                    self.stats["cache_hits"] += 1
+                    job = Job(bvid, video, download, deadline)
+                    job.cached = True
+                    job.finish(report)
+                    self._remember(job)
+                    return job, True
+
+            waiting = sum(1 for j in self._active_jobs() if j.status == "queued")
+            if waiting >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise OverflowError(f"Queue full ({waiting} jobs waiting)")
+
+            job = Job(bvid, video, download, deadline)
+            self.in_flight[job.key] = job
+            self._remember(job)
+        self.executor.submit(self._run, job)
+        return job, True
+
+    def _active_jobs(self) -> List[Job]:
+        """Unfinished, uncancelled jobs; counted over all jobs because a forced
+        job takes over the in-flight entry of the one it overtakes"""
+        return [j for j in self.jobs.values() if not j.finished and not j.cancel_token.cancelled]
+
+    def _remember(self, job: Job):
+        self.jobs[job.id] = job
+        while len(self.jobs) > MAX_FINISHED_JOBS:
+            oldest_id, oldest = next(iter(self.jobs.items()))
+            if not oldest.finished:
+                break
+            del self.jobs[oldest_id]
+
+    def _run(self, job: Job):
+        with worker_state.busy():
+            self._run_job(job)
+
+    def _run_job(self, job: Job):
+        job.status = "running"
+        job.started = time.time()
+        self.stdout.bind(job)
+        try:
+            # Time spent queued counts against the deadline
+            deadline = None if job.deadline is None else job.deadline - (job.started - job.submitted)
+            report = self.agent.analyze_video(job.video, download=job.download, deadline=deadline,
+                                              cancel=job.cancel_token)
+            self.stdout.flush()
+            job.finish(report)
+        except Cancelled as e:
+            self.stdout.flush()
+            job.finish(error=str(e), cancelled=True)
+        except Exception as e:
+            self.stdout.flush()
+            job.finish(error=str(e))
+        finally:
+            self.stdout.bind(None)
+            with self.lock:
+                if self.in_flight.get(job.key) is job:
+                    del self.in_flight[job.key]
+                self.stats["completed" if job.status == "done" else job.status] += 1
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job; a later submission for it starts a new job"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and not job.finished:
+                job.cancel_token.cancel()
+                if self.in_flight.get(job.key) is job:
+                    del self.in_flight[job.key]
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def health(self) -> Dict:
+        with self.lock:
+            statuses = [j.status for j in self._active_jobs()]
+            return {
+                "workers": self.workers,
+                "running": statuses.count("running"),
+                "queued": statuses.count("queued"),
+                "max_queue": self.max_queue,
+                **self.stats,
+            }
+
+    def _collect_metrics(self):
+        health = self.health()
+        QUEUE_JOBS.set(health["queued"], status="queued")
+        QUEUE_JOBS.set(health["running"], status="running")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service: AnalysisService = None
+
+    def log_message(self, format, *args):
+        Config.debug_print(f"[DEBUG] {self.address_string()} {format % args}")
+
+    def _json(self, status: int, data: Dict):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/jobs":
+            self._json(404, {"error": "not found"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            deadline = request.get("deadline")
+            job, created = self.service.submit(
+                request["video"], bool(request.get("download", True)), bool(request.get("force", False)),
+                None if deadline is None else float(deadline)
+            )
+        except (KeyError, ValueError) as e:
+            self._json(400, {"error": f"invalid request: {e}"})
+            return
+        except OverflowError as e:
+            self._json(503, {"error": str(e)})
+            return
+        data = job.to_dict()
+        data["deduplicated"] = not created
+        self._json(200 if job.finished else 202, data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        if parts == ["health"]:
+            self._json(200, self.service.health())
+            return
+        if parts == ["metrics"]:
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if len(parts) < 2 or parts[0] != "jobs":
+            self._json(404, {"error": "not found"})
+            return
+
+        job = self.service.get(parts[1])
+        if job is None:
+            self._json(404, {"error": "unknown job"})
+        elif len(parts) == 2:
+            self._json(200, job.to_dict())
+        elif parts[2:] == ["events"]:
+            query = parse_qs(url.query)
+            try:
+                after = max(0, int(query.get("after", ["0"])[0]))
+                wait = min(max(0.0, float(query.get("wait", ["0"])[0])), 30.0)
+            except ValueError:
+                self._json(400, {"error": "after must be an integer and wait a number"})
+                return
+            events, finished = job.wait_events(after, wait)
+            self._json(200, {"events": events, "next": after + len(events), "finished": finished,
+                             "status": job.status, "stage": job.stage})
+        else:
+            self._json(404, {"error": "not found"})
+
+
+    def do_DELETE(self):
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        if len(parts) != 2 or parts[0] != "jobs":
+            self._json(404, {"error": "not found"})
+            return
+        job = self.service.cancel(parts[1])
+        if job is None:
+            self._json(404, {"error": "unknown job"})
+        else:
+            self._json(200, job.to_dict(include_report=False))
+
+
+def create_server(service: AnalysisService, host: Optional[str] = None, port: Optional[int] = None) -> ThreadingHTTPServer:
+    """HTTP server bound to the service (port 0 picks a free port)"""
+    handler = type("Handler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host or Config.SERVICE_HOST, Config.SERVICE_PORT if port is None else port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BiliVagent HTTP service")
+    parser.add_argument("--host", default=None, help=f"bind address (default: {Config.SERVICE_HOST})")
+    parser.add_argument("--port", type=int, default=None, help=f"port (default: {Config.SERVICE_PORT})")
+    parser.add_argument("--workers", type=int, default=None, help=f"concurrent analyses (default: {Config.SERVICE_WORKERS})")
+    args = parser.parse_args()
+
+    service = AnalysisService(workers=args.workers)
+    server = create_server(service, args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"Serving on http://{host}:{port} with {service.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Warm worker daemon
+
+Keeps one BiliVagent (speech recognition model, jieba dictionaries, sentiment automaton,
+pooled HTTP clients) resident and serves analysis jobs over a Unix socket,
+so repeated runs skip all warm-up.
+
+Protocol: one JSON object per line. The client sends a request
+({"op": "analyze", "video": ..., "download": true, "deadline": null}, {"op": "ping"},
+{"op": "cancel", "job_id": ...} or {"op": "shutdown"}); the daemon answers an
+analysis with {"type": "job", "job_id": ...} first, then {"type": "log", "text": ...}
+lines while the job runs and ends with {"type": "result", "report": ...},
+{"type": "cancelled"} or {"type": "error", "message": ...}. "cancel" stops
+that job, whether it is running or still waiting for the previous one.
+
+With METRICS_PORT or METRICS_TEXTFILE set, the daemon exports Prometheus
+metrics (see bilivagent.utils.metrics).
+
+Start with:  python -m bilivagent.service.daemon
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import argparse
+import threading
+import contextlib
+import socketserver
+from typing import Callable, Dict, Optional
+from bilivagent.config import Config
+from bilivagent.utils.cancel import CancelToken, Cancelled
+from bilivagent.utils.metrics import start_exporters, worker_state
+
+
+def _send(stream, message: Dict):
+    stream.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+    stream.flush()
+
+
+class _LogWriter:
+    """stdout replacement forwarding complete lines to the client as log messages"""
+
+    encoding = "utf-8"  # yt-dlp checks sys.stdout.encoding
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = ""
+        self.closed = False
+
+    def write(self, text) -> int:
+        if isinstance(text, bytes):
+            text = text.decode("utf-8", errors="replace")
+        self.buffer += text
+        while "\n" in self.buffer:
+            line, self.buffer = self.buffer.split("\n", 1)
+            self._emit(line)
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            self._emit(self.buffer)
+            self.buffer = ""
+
+    def isatty(self) -> bool:
+        return False
+
+    def _emit(self, line: str):
+        if self.closed:
+            return
+        try:
+            _send(self.stream, {"type": "log", "text": line})
+        except OSError:
+            # Client went away; the job still finishes and saves its report
+            self.closed = True
+
+
+class WarmWorker:
+    """Owns the resident agent and runs one job at a time"""
+
+    def __init__(self):
+        from bilivagent.agents.bilivagent import BiliVagent
+        from bilivagent.utils import jieba_cache
+
+        start = time.perf_counter()
+        self.agent = BiliVagent()
+        # Load everything that is otherwise built lazily on the first job
+        jieba_cache.ensure_loaded()
+        _ = self.agent.text_processor.text_processor.sentiment_scorer
+        if self.agent.video_processor.speech_recognizer is None:
+            print(f"Warning: {Config.ASR_BACKEND} speech recognition unavailable, transcription disabled")
+        self.lock = threading.Lock()
+        self.jobs = 0
+        self.cancel_tokens: Dict[str, CancelToken] = {}  # of the waiting and running jobs, by job id
+        print(f"Worker ready in {time.perf_counter() - start:.1f}s")
+
+    def analyze(self, video: str, download: bool, stream, deadline: Optional[float] = None) -> Dict:
+        writer = _LogWriter(stream)
+        received = time.monotonic()
+        job_id = uuid.uuid4().hex[:12]
+        token = self.cancel_tokens[job_id] = CancelToken()
+        try:
+            # The client needs the id to cancel this job (and not another client's)
+            _send(stream, {"type": "job", "job_id": job_id})
+            if not self.lock.acquire(blocking=False):
+                writer.write("Waiting for the running job to finish...\n")
+                while not self.lock.acquire(timeout=0.5):
+                    token.check()
+            try:
+                token.check()
+                if deadline is not None:
+                    # Time spent waiting for the previous job counts against the deadline
+                    deadline -= time.monotonic() - received
+                # Jobs run one at a time, so capturing the process-wide stdout is safe
+                with contextlib.redirect_stdout(writer), worker_state.busy():
+                    report = self.agent.analyze_video(video, download=download, deadline=deadline, cancel=token)
+                self.jobs += 1
+                return report
+            finally:
+                writer.flush()
+                self.lock.release()
+        finally:
+            del self.cancel_tokens[job_id]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a waiting or running job; False if there is no such job"""
+        token = self.cancel_tokens.get(job_id)
+        if token is None:
+            return False
+        token.cancel()
+        return True
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+            op = request.get("op")
+            if op == "ping":
+                _send(self.wfile, {"type": "result", "pid": os.getpid(), "jobs": self.server.worker.jobs})
+            elif op == "cancel":
+                _send(self.wfile, {"type": "result", "cancelled": self.server.worker.cancel(request.get("job_id", ""))})
+            elif op == "shutdown":
+                _send(self.wfile, {"type": "result"})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            elif op == "analyze":
+                report = self.server.worker.analyze(request["video"], request.get("download", True), self.wfile,
+                                                    request.get("deadline"))
+                _send(self.wfile, {"type": "result", "report": report})
+            else:
+                _send(self.wfile, {"type": "error", "message": f"Unknown op: {op}"})
+        except OSError:
+            pass
+        except Cancelled:
+            try:
+                _send(self.wfile, {"type": "cancelled"})
+            except OSError:
+                pass
+        except Exception as e:
+            try:
+                _send(self.wfile, {"type": "error", "message": str(e)})
+            except OSError:
+                pass
+
+
+class DaemonClient:
+    """Submit jobs to a running daemon"""
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: Optional[float] = None):
+        self.socket_path = socket_path or Config.DAEMON_SOCKET
+        self.timeout = timeout
+        # State of the analyze() in progress, for cancel() from another thread
+        self.lock = threading.Lock()
+        self.analyzing = False
+        self.job_id: Optional[str] = None
+        self.cancel_requested = False
+
+    def _request(self, request: Dict, on_log: Optional[Callable[[str], None]] = None) -> Dict:
+        if not hasattr(socket, "AF_UNIX"):
+            raise ConnectionError("Unix sockets are not supported on this platform")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            sock.close()
+            raise ConnectionError(f"No daemon listening on {self.socket_path}") from e
+
+        with sock, sock.makefile("rwb") as stream:
+            _send(stream, request)
+            for line in stream:
+                message = json.loads(line)
+                if message["type"] == "log":
+                    if on_log:
+                        on_log(message["text"])
+                elif message["type"] == "job":
+                    self._started(message["job_id"])
+                elif message["type"] == "error":
+                    raise RuntimeError(message["message"])
+                elif message["type"] == "cancelled":
+                    raise Cancelled()
+                else:
+                    return message
+        raise ConnectionError("Daemon closed the connection before the job finished")
+
+    def ping(self) -> Dict:
+        return self._request({"op": "ping"})
+
+    def is_running(self) -> bool:
+        try:
+            self.ping()
+            return True
+        except (ConnectionError, OSError):
+            return False
+
+    def analyze(self, video: str, download: bool = True, on_log: Optional[Callable[[str], None]] = print,
+                deadline: Optional[float] = None) -> Dict:
+        """Run an analysis on the daemon, passing its output lines to on_log"""
+        request = {"op": "analyze", "video": video, "download": download, "deadline": deadline}
+        with self.lock:
+            self.analyzing, self.job_id, self.cancel_requested = True, None, False
+        try:
+            return self._request(request, on_log)["report"]
+        finally:
+            with self.lock:
+                self.analyzing, self.job_id = False, None
+
+    def _started(self, job_id: str):
+        with self.lock:
+            self.job_id = job_id
+            cancel = self.cancel_requested
+        if cancel:
+            self._request({"op": "cancel", "job_id": job_id})
+
+    def cancel(self) -> bool:
+        """
+        Cancel this client's analyze() on the daemon (it then raises
+        Cancelled); False if none is in progress
+        """
+        with self.lock:
+            if not self.analyzing:
+                return False
+            if self.job_id is None:
+                # The daemon has not assigned the job id yet: cancel once it does
+                self.cancel_requested = True
+                return True
+            job_id = self.job_id
+        return self._request({"op": "cancel", "job_id": job_id})["cancelled"]
+
+    def shutdown(self):
+        self._request({"op": "shutdown"})
+
+
+def serve(socket_path: Optional[str] = None):
+    """Warm up and serve until shutdown (Ctrl+C or a shutdown request)"""
+    socket_path = socket_path or Config.DAEMON_SOCKET
+    if not hasattr(socketserver, "ThreadingUnixStreamServer"):
+        raise RuntimeError("The daemon needs Unix socket support")
+
+    if os.path.exists(socket_path):
+        if DaemonClient(socket_path).is_running():
+            raise RuntimeError(f"A daemon is already listening on {socket_path}")
+        os.remove(socket_path)  # stale socket from a crashed daemon
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+
+    worker = WarmWorker()
+    worker_state.total = 1
+    start_exporters()
+    server = socketserver.ThreadingUnixStreamServer(socket_path, _Handler)
+    server.daemon_threads = True
+    server.worker = worker
+    print(f"Listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        print("Daemon stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BiliVagent warm worker daemon")
+    parser.add_argument("--socket", default=None, help=f"socket path (default: {Config.DAEMON_SOCKET})")
+    parser.add_argument("--stop", action="store_true", help="stop a running daemon")
+    args = parser.parse_args()
+
+    if args.stop:
+        try:
+            DaemonClient(args.socket).shutdown()
+            print("Daemon stopping")
+        except ConnectionError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        return
+
+    try:
+        serve(args.socket)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+Durable job queue backed by SQLite
+
+Jobs survive crashes and restarts and can be drained by several worker
+processes, on one host or on several hosts sharing the database file:
+
+- claiming takes a time-limited lease inside a write transaction, so a
+  job is only ever held by one worker
+- workers heartbeat to extend their lease; a crashed worker's lease
+  expires and the job is picked up again
+- failures are retried with exponential backoff up to max_attempts
+- higher priority first, then oldest
+- the current stage and the status of every stage are recorded
+
+Network filesystems do not support SQLite's WAL mode, so the rollback
+journal is used unless JOB_QUEUE_WAL is enabled (single host only).
+
+Workers export Prometheus metrics (queue depth by status, utilization and
+the pipeline metrics) on METRICS_PORT and/or to METRICS_TEXTFILE.
+
+Usage:
+  python -m bilivagent.service.jobqueue add BV1xx411c7mD BV1yy411c7mE --priority 5
+  python -m bilivagent.service.jobqueue work --metrics-port 9464
+  python -m bilivagent.service.jobqueue status
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+from bilivagent.config import Config
+from bilivagent.utils.cancel import CancelToken, Cancelled
+from bilivagent.utils.metrics import QUEUE_JOBS, metrics, start_exporters, worker_state
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    video         TEXT    NOT NULL,
+    bvid          TEXT    NOT NULL,
+    download      INTEGER NOT NULL DEFAULT 1,
+    priority      INTEGER NOT NULL DEFAULT 0,
+    status        TEXT    NOT NULL DEFAULT 'queued',
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    max_attempts  INTEGER NOT NULL DEFAULT 3,
+    available_at  REAL    NOT NULL,
+    lease_owner   TEXT,
+    lease_expires REAL,
+    stage         TEXT    NOT NULL DEFAULT '',
+    stages        TEXT    NOT NULL DEFAULT '{}',
+    error         TEXT    NOT NULL DEFAULT '',
+    report_path   TEXT    NOT NULL DEFAULT '',
+    created       REAL    NOT NULL,
+    updated       REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, available_at, id);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_bvid ON jobs (bvid) WHERE status IN ('queued', 'running');
+"""
+
+
+class LeaseLost(RuntimeError):
+    """The worker no longer holds the job's lease (it expired and was reclaimed)"""
+
+
+class JobQueue:
+    """SQLite job queue; use one instance per thread"""
+
+    def __init__(self, path: Optional[str] = None, lease_seconds: Optional[float] = None):
+        self.path = path or Config.JOB_QUEUE_PATH
+        self.lease_seconds = lease_seconds or Config.JOB_LEASE_SECONDS
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Autocommit; write transactions are opened explicitly with BEGIN IMMEDIATE
+        self.db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA busy_timeout = 30000")
+        self.db.execute(f"PRAGMA journal_mode = {'WAL' if Config.JOB_QUEUE_WAL else 'DELETE'}")
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _write(self, sql: str, params=()) -> sqlite3.Cursor:
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self.db.execute(sql, params)
+            self.db.execute("COMMIT")
+            return cursor
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def add(self, video: str, bvid: str, priority: int = 0, download: bool = True,
+            max_attempts: Optional[int] = None) -> Optional[int]:
+        """Enqueue a job; returns None if the BV is already queued or running"""
+        now = time.time()
+        try:
+            cursor = self._write(
+                "INSERT INTO jobs (video, bvid, download, priority, max_attempts, available_at, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (video, bvid, int(download), priority, max_attempts or Config.JOB_MAX_ATTEMPTS, now, now, now),
+            )
+        except sqlite3.IntegrityError:
+            return None
+        return cursor.lastrowid
+
+    def claim(self, owner: str) -> Optional[Dict]:
+        """
+        Lease the next available job: queued and due, or running with an
+        expired lease (its worker died). Returns the job row or None.
+        """
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            # Expired leases of jobs that used up their attempts fail for good
+            self.db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired after final attempt',"
+                " lease_owner = NULL, updated = ?"
+                " WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts",
+                (now, now),
+            )
+            row = self.db.execute(
+                "SELECT * FROM jobs"
+                " WHERE (status = 'queued' AND available_at <= ?) OR (status = 'running' AND lease_expires < ?)"
+                " ORDER BY priority DESC, available_at, id LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                self.db.execute("COMMIT")
+                return None
+            self.db.execute(
+                "UPDATE jobs SET status = 'running', lease_owner = ?, lease_expires = ?,"
+                " attempts = attempts + 1, updated = ? WHERE id = ?",
+                (owner, now + self.lease_seconds, now, row["id"]),
+            )
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        job = dict(row)
+        job["attempts"] += 1
+        job["stages"] = json.loads(job["stages"])
+        return job
+
+    def _owned(self, sql: str, params: tuple, job_id: int, owner: str):
+        """Run an update that only applies while the owner holds the lease"""
+        cursor = self._write(sql + " WHERE id = ? AND lease_owner = ? AND status = 'running'", params + (job_id, owner))
+        if cursor.rowcount == 0:
+            raise LeaseLost(f"Lease on job {job_id} lost by {owner}")
+
+    def heartbeat(self, job_id: int, owner: str):
+        """Extend the lease"""
+        now = time.time()
+        self._owned("UPDATE jobs SET lease_expires = ?, updated = ?", (now + self.lease_seconds, now), job_id, owner)
+
+    def set_stage(self, job_id: int, owner: str, stage: str, stages: Dict[str, str]):
+        """Record the running stage (stages maps every stage seen so far to its status)"""
+        now = time.time()
+        self._owned(
+            "UPDATE jobs SET stage = ?, stages = ?, lease_expires = ?, updated = ?",
+            (stage, json.dumps(stages), now + self.lease_seconds, now), job_id, owner,
+        )
+
+    def complete(self, job_id: int, owner: str, report_path: str, stages: Dict[str, str]):
+        self._owned(
+            "UPDATE jobs SET status = 'done', report_path = ?, stages = ?, error = '',"
+            " lease_owner = NULL, updated = ?",
+            (report_path, json.dumps(stages), time.time()), job_id, owner,
+        )
+
+    def fail(self, job_id: int, owner: str, error: str, attempts: int, max_attempts: int, stages: Dict[str, str]):
+        """Requeue with exponential backoff, or fail for good after the last attempt"""
+        now = time.time()
+        if attempts < max_attempts:
+            delay = min(Config.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), 3600) * random.uniform(0.8, 1.2)
+            self._owned(
+                "UPDATE jobs SET status = 'queued', available_at = ?, error = ?, stages = ?,"
+                " lease_owner = NULL, updated = ?",
+                (now + delay, error, json.dumps(stages), now), job_id, owner,
+            )
+        else:
+            self._owned(
+                "UPDATE jobs SET status = 'failed', error = ?, stages = ?, lease_owner = NULL, updated = ?",
+                (error, json.dumps(stages), now), job_id, owner,
+            )
+
+    def release(self, job_id: int, owner: str):
+        """Hand a job back without counting the attempt (e.g. on shutdown)"""
+        self._owned(
+            "UPDATE jobs SET status = 'queued', attempts = attempts - 1, lease_owner = NULL, updated = ?",
+            (time.time(),), job_id, owner,
+        )
+
+    def counts(self) -> Dict[str, int]:
+        rows = self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        sql = "SELECT * FROM jobs"
+        params: tuple = ()
+        if status:
+            sql += " WHERE status = ?"
+            params = (status,)
+        rows = self.db.execute(sql + " ORDER BY id DESC LIMIT ?", params + (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+
+class _Heartbeat(threading.Thread):
+    """Extends a job's lease in the background (with its own connection)"""
+
+    def __init__(self, path: str, job_id: int, owner: str, interval: float, cancel: Optional[CancelToken] = None):
+        super().__init__(daemon=True)
+        self.path = path
+        self.job_id = job_id
+        self.owner = owner
+        self.interval = interval
+        self.cancel = cancel  # cancelled when the lease is lost
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        queue = JobQueue(self.path)
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    queue.heartbeat(self.job_id, self.owner)
+                except LeaseLost:
+                    self.lost = True
+                    print(f"Warning: lease on job {self.job_id} was lost; stopping it")
+                    if self.cancel is not None:
+                        # Another worker owns the job now; stop spending time and quota on it
+                        self.cancel.cancel()
+                    return
+                except sqlite3.OperationalError as e:
+                    Config.debug_print(f"[DEBUG] Heartbeat failed, retrying: {e}")
+        finally:
+            queue.close()
+
+
+def _queue_collector(path: str):
+    """Metrics collector for the job counts; it runs on the exporter thread, so it opens its own connection"""
+    uri = Path(path).absolute().as_uri() + "?mode=ro"
+
+    def collect():
+        db = sqlite3.connect(uri, uri=True, timeout=5)
+        try:
+            counts = dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        finally:
+            db.close()
+        for status in ("queued", "running", "done", "failed"):
+            QUEUE_JOBS.set(counts.get(status, 0), status=status)
+    return collect
+
+
+def work(queue: JobQueue, owner: Optional[str] = None, drain: bool = False, poll: float = 5.0, agent=None):
+    """Claim and run jobs until interrupted (or until the queue is empty with drain=True)"""
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    if agent is None:
+        from bilivagent.agents.bilivagent import BiliVagent
+        agent = BiliVagent()
+    worker_state.total = 1
+    metrics.on_collect(_queue_collector(queue.path))
+    print(f"Worker {owner} polling {queue.path}")
+
+    while True:
+        job = queue.claim(owner)
+        if job is None:
+            if drain:
+                return
+            time.sleep(poll)
+            continue
+
+        print(f"\nJob {job['id']}: {job['video']} (attempt {job['attempts']}/{job['max_attempts']})")
+        stages = dict(job["stages"])
+
+        def on_stage(name: str):
+            for seen, state in stages.items():
+                if state == "running":
+                    stages[seen] = "done"
+            stages[name] = "running"
+            queue.set_stage(job["id"], owner, name, stages)
+
+        cancel = CancelToken()
+        heartbeat = _Heartbeat(queue.path, job["id"], owner, queue.lease_seconds / 3, cancel)
+        heartbeat.start()
+        try:
+            with worker_state.busy():
+                report = agent.analyze_video(job["video"], download=bool(job["download"]), on_stage=on_stage,
+                                             cancel=cancel)
+        except Cancelled:
+            print(f"Job {job['id']} stopped")
+            continue
+        except KeyboardInterrupt:
+            heartbeat.stopped.set()
+            queue.release(job["id"], owner)
+            print(f"Job {job['id']} released")
+            raise
+        except Exception as e:
+            heartbeat.stopped.set()
+            stages = {name: ("failed" if state == "running" else state) for name, state in stages.items()}
+            print(f"Job {job['id']} failed: {e}")
+            try:
+                queue.fail(job["id"], owner, str(e), job["attempts"], job["max_attempts"], stages)
+            except LeaseLost as lost:
+                print(f"Warning: {lost}")
+            continue
+        finally:
+            heartbeat.stopped.set()
+
+        stages = {name: ("done" if state == "running" else state) for name, state in stages.items()}
+        if Config.SAVE_REPORT_JSON:
+            report_path = os.path.join(Config.OUTPUT_DIR, f"{report.get('BV号', job['bvid'])}_report.json")
+        else:
+            report_path = agent.report_store.path
+        try:
+            queue.complete(job["id"], owner, report_path, stages)
+            print(f"Job {job['id']} done")
+        except LeaseLost as lost:
+            print(f"Warning: {lost}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BiliVagent durable job queue")
+    parser.add_argument("--db", default=None, help=f"queue database (default: {Config.JOB_QUEUE_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    add = sub.add_parser("add", help="enqueue videos")
+    add.add_argument("videos", nargs="+", help="Bilibili video links or BV numbers")
+    add.add_argument("--priority", type=int, default=0, help="higher runs first")
+    add.add_argument("--no-download", action="store_true", help="only analyze comments and danmaku")
+    add.add_argument("--max-attempts", type=int, default=None)
+
+    run = sub.add_parser("work", help="run a worker")
+    run.add_argument("--drain", action="store_true", help="exit when no job is available")
+    run.add_argument("--worker-id", default=None)
+    run.add_argument("--poll", type=float, default=5.0, help="seconds between polls when idle")
+    run.add_argument("--metrics-port", type=int, default=None,
+                     help=f"serve Prometheus metrics at /metrics on this port (default: METRICS_PORT={Config.METRICS_PORT})")
+    run.add_argument("--metrics-file", default=None,
+                     help="also write the metrics to this textfile for node_exporter (default: METRICS_TEXTFILE)")
+
+    status = sub.add_parser("status", help="show queue state")
+    status.add_argument("--status", default=None, help="only jobs with this status")
+    status.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+    queue = JobQueue(args.db)
+
+    if args.command == "add":
+        from bilivagent.utils.bilibili import BilibiliParser
+
+        bilibili = BilibiliParser()
+        for video in args.videos:
+            try:
+                bvid = bilibili.parse_bv_number(video)
+            except ValueError as e:
+                print(f"Skipped: {e}", file=sys.stderr)
+                continue
+            job_id = queue.add(video, bvid, args.priority, not args.no_download, args.max_attempts)
+            print(f"{bvid}: " + (f"job {job_id}" if job_id else "already queued or running"))
+    elif args.command == "work":
+        if args.metrics_port is not None:
+            Config.METRICS_PORT = args.metrics_port
+        if args.metrics_file is not None:
+            Config.METRICS_TEXTFILE = args.metrics_file
+        start_exporters(args.worker_id)
+        try:
+            work(queue, args.worker_id, args.drain, args.poll)
+        except KeyboardInterrupt:
+            print("\nWorker stopped")
+    else:
+        print(", ".join(f"{k}: {v}" for k, v in sorted(queue.counts().items())) or "empty")
+        for job in queue.jobs(args.status, args.limit):
+            stages = " ".join(f"{name}={state}" for name, state in json.loads(job["stages"]).items())
+            line = f"  #{job['id']:<5} {job['bvid']:<14} {job['status']:<8} p{job['priority']:<3} attempt {job['attempts']}/{job['max_attempts']}"
+            if job["lease_owner"]:
+                line += f"  [{job['lease_owner']}]"
+            print(line + (f"  {stages}" if stages else "") + (f"  error: {job['error']}" if job["error"] else ""))
+
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
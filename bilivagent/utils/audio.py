@@ -1,47 +1,221 @@
 """Audio processing and speech recognition"""
 import os
 import json
-import wave
-from typing import Optional
-from vosk import Model, KaldiRecognizer
+import time
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from bilivagent.config import Config
+from bilivagent.utils import streaming
+from bilivagent.utils.tracing import tracer
+from bilivagent.utils.metrics import ASR_AUDIO_SECONDS, ASR_REAL_TIME_FACTOR, ASR_SECONDS
+from bilivagent.utils.cancel import check_cancelled
+from bilivagent.utils.vad import speech_regions, wav_data
 
 
 class SpeechRecognizer:
+    """
+    Speech recognition backend interface.
+    Backends implement transcribe_pcm(); VAD gating and mapping times back
+    to the original audio are shared.
+    """
+
+    name = ""
+    # Whether transcribe_pcm reads its input block by block; otherwise the whole
+    # region is decoded at once and streaming mode hands it bounded windows
+    streams_pcm = False
+
+    def transcribe_pcm(self, samples: np.ndarray, sample_rate: int) -> List[Dict]:
+        """
+        Transcribe mono int16 PCM to utterances {"start", "end", "text", "words"},
+        with times in seconds from the start of samples.
+        """
+        raise NotImplementedError
+
+    def transcribe(self, audio_path: str, vad: Optional[bool] = None, max_seconds: Optional[float] = None) -> str:
+        """Transcribe audio to text"""
+        return " ".join(segment["text"] for segment in self.iter_segments(audio_path, vad, max_seconds))
+
+    def transcribe_segments(self, audio_path: str, vad: Optional[bool] = None,
+                            max_seconds: Optional[float] = None) -> List[Dict]:
+        """
+        Transcribe a mono 16-bit PCM WAV to utterances with times in seconds
+        of the original audio. With VAD (default: Config.VAD_ENABLED) only
+        speech regions are decoded and their times shifted by the region start.
+        With max_seconds only the beginning of the audio is transcribed.
+        """
+        return list(self.iter_segments(audio_path, vad, max_seconds))
+
+    def iter_segments(self, audio_path: str, vad: Optional[bool] = None,
+                      max_seconds: Optional[float] = None) -> Iterator[Dict]:
+        """transcribe_segments as a generator, yielding each region's utterances as they are decoded"""
+        lazy = streaming.enabled()
+        samples, rate = wav_data(audio_path, lazy)
+        total = len(samples)
+        if max_seconds is not None:
+            total = min(total, int(max_seconds * rate))
+            samples = samples[:total]
+        regions = [(0, total)]
+        if (Config.VAD_ENABLED if vad is None else vad):
+            with tracer.span("vad.detect") as span:
+                regions, _, _ = speech_regions(audio_path, padding=Config.VAD_PADDING, lazy=lazy)
+                regions = [(start, min(end, total)) for start, end in regions if start < total]
+                span.set(regions=len(regions))
+            Config.debug_print(f"[DEBUG] VAD kept {sum(end - start for start, end in regions) / rate:.0f}s "
+                               f"of {total / rate:.0f}s audio in {len(regions)} speech regions")
+        if lazy and not self.streams_pcm:
+            regions = self._windows(regions, int(streaming.audio_window_seconds() * rate))
+
+        started = time.perf_counter()
+        with tracer.span(f"{self.name}.transcribe", audio_seconds=total / rate,
+                         speech_seconds=sum(end - start for start, end in regions) / rate):
+            for start, end in regions:
+                check_cancelled()
+                offset = start / rate
+                for segment in self.transcribe_pcm(samples[start:end], rate):
+                    yield self._shift(segment, offset)
+        self._record(total / rate, time.perf_counter() - started)
+
+    def _record(self, audio_seconds: float, seconds: float):
+        """Feed a finished transcription into the ASR metrics"""
+        if audio_seconds <= 0:
+            return
+        ASR_AUDIO_SECONDS.inc(audio_seconds, backend=self.name)
+        ASR_SECONDS.inc(seconds, backend=self.name)
+        ASR_REAL_TIME_FACTOR.observe(seconds / audio_seconds, backend=self.name)
+
+    @staticmethod
+    def _windows(regions: List[tuple], size: int) -> List[tuple]:
+        """Split regions longer than size samples into equal windows of at most size"""
+        windows = []
+        for start, end in regions:
+            count = -(-(end - start) // size)
+            for i in range(count):
+                windows.append((start + (end - start) * i // count, start + (end - start) * (i + 1) // count))
+        return windows
+
+    @staticmethod
+    def _shift(segment: Dict, offset: float) -> Dict:
+        """Move a segment and its words by offset seconds"""
+        words = [
+            dict(word, start=round(word["start"] + offset, 3), end=round(word["end"] + offset, 3))
+            for word in segment.get("words", [])
+        ]
+        return dict(segment, start=round(segment["start"] + offset, 3),
+                    end=round(segment["end"] + offset, 3), words=words)
+
+
+class VoskRecognizer(SpeechRecognizer):
     """Speech to text using Vosk"""
-    
+
+    name = "vosk"
+    streams_pcm = True
+
     def __init__(self, model_path: str):
         if not os.path.exists(model_path):
             raise ValueError(f"Vosk model not found at: {model_path}")
-        
-        self.model = Model(model_path)
-    
-    def transcribe(self, audio_path: str) -> str:
-        """Transcribe audio to text"""
-        wf = wave.open(audio_path, "rb")
-        
-        if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() not in [8000, 16000, 32000, 48000]:
+
+        from vosk import Model
+
+        with tracer.span("vosk.load_model"):
+            self.model = Model(model_path)
+
+    def transcribe_pcm(self, samples: np.ndarray, sample_rate: int) -> List[Dict]:
+        from vosk import KaldiRecognizer
+
+        if sample_rate not in [8000, 16000, 32000, 48000]:
             raise ValueError("Audio file must be WAV format mono PCM")
-        
-        rec = KaldiRecognizer(self.model, wf.getframerate())
+
+        rec = KaldiRecognizer(self.model, sample_rate)
         rec.SetWords(True)
-        
-        transcription = []
-        
-        while True:
-            data = wf.readframes(4000)
-            if len(data) == 0:
-                break
-            
+
+        segments: List[Dict] = []
+        for start in range(0, len(samples), 4000):
+            check_cancelled()
+            data = np.ascontiguousarray(samples[start:start + 4000], dtype="<i2").tobytes()
             if rec.AcceptWaveform(data):
-                result = json.loads(rec.Result())
-                if "text" in result:
-                    transcription.append(result["text"])
-        
+                self._add_segment(segments, rec.Result())
+
         # Get final result
-        final_result = json.loads(rec.FinalResult())
-        if "text" in final_result:
-            transcription.append(final_result["text"])
-        
-        wf.close()
-        
-        return " ".join(transcription)
+        self._add_segment(segments, rec.FinalResult())
+        return segments
+
+    @staticmethod
+    def _add_segment(segments: List[Dict], result: str):
+        result = json.loads(result)
+        text = result.get("text", "")
+        if not text:
+            return
+        words = result.get("result", [])
+        segments.append({
+            "start": words[0]["start"] if words else 0.0,
+            "end": words[-1]["end"] if words else 0.0,
+            "text": text,
+            "words": words,
+        })
+
+
+class FasterWhisperRecognizer(SpeechRecognizer):
+    """Speech to text using faster-whisper (CTranslate2, int8-quantized on CPU by default)"""
+
+    name = "faster_whisper"
+
+    def __init__(self, model: Optional[str] = None, compute_type: Optional[str] = None,
+                 cpu_threads: Optional[int] = None, beam_size: Optional[int] = None,
+                 language: Optional[str] = None):
+        from faster_whisper import WhisperModel
+
+        self.beam_size = beam_size or Config.WHISPER_BEAM_SIZE
+        self.language = language or Config.WHISPER_LANGUAGE or None
+        with tracer.span("faster_whisper.load_model"):
+            self.model = WhisperModel(
+                model or Config.WHISPER_MODEL,
+                device="cpu",
+                compute_type=compute_type or Config.WHISPER_COMPUTE_TYPE,
+                cpu_threads=Config.WHISPER_CPU_THREADS if cpu_threads is None else cpu_threads,
+            )
+
+    def transcribe_pcm(self, samples: np.ndarray, sample_rate: int) -> List[Dict]:
+        if sample_rate != 16000:
+            raise ValueError("faster-whisper needs 16 kHz audio")
+
+        audio = np.asarray(samples, dtype=np.float32) / 32768.0
+        results, _ = self.model.transcribe(
+            audio,
+            language=self.language,
+            beam_size=self.beam_size,
+            # Regions are already gated by our VAD
+            vad_filter=False,
+            condition_on_previous_text=False,
+            # Nudges Chinese output towards simplified characters
+            initial_prompt="以下是普通话的句子。" if self.language == "zh" else None,
+        )
+        # Segments are decoded lazily while iterating, so cancellation stops decoding
+        segments: List[Dict] = []
+        for result in results:
+            check_cancelled()
+            if result.text.strip():
+                segments.append({"start": result.start, "end": result.end, "text": result.text.strip(), "words": []})
+        return segments
+
+
+# Backend names for Config.ASR_BACKEND
+BACKENDS = ("vosk", "faster_whisper")
+
+
+def create_speech_recognizer(backend: Optional[str] = None) -> Optional[SpeechRecognizer]:
+    """The configured speech recognizer, or None if its model or package is unavailable"""
+    backend = (backend or Config.ASR_BACKEND).replace("-", "_")
+    if backend == "vosk":
+        if not os.path.exists(Config.VOSK_MODEL_PATH):
+            print(f"Warning: Vosk model not found at {Config.VOSK_MODEL_PATH}")
+            return None
+        return VoskRecognizer(Config.VOSK_MODEL_PATH)
+    if backend == "faster_whisper":
+        try:
+            return FasterWhisperRecognizer()
+        except ImportError:
+            print("Warning: faster-whisper is not installed (pip install faster-whisper)")
+            return None
+    raise ValueError(f"Unknown ASR backend: {backend} (expected one of {', '.join(BACKENDS)})")
@@ -3,10 +3,15 @@ import re
 import os
 import json
 import subprocess
-from typing import Dict, Optional
+from typing import Dict, Iterator, List, Optional
 from bilibili_api import video, sync, comment, Credential
 import requests
 from bilivagent.config import Config
+from bilivagent.utils.tracing import tracer
+from bilivagent.utils.metrics import DOWNLOAD_BYTES, cache_lookup
+from bilivagent.utils.cassette import CassetteMiss, cassette
+from bilivagent.utils.ffmpeg import find_ffmpeg
+from bilivagent.utils.cancel import Cancelled, check_cancelled
 
 
 class BilibiliParser:
@@ -30,7 +35,8 @@ class BilibiliParser:
     def get_video_info(self, bv_number: str) -> Dict:
         """Get video information"""
         v = video.Video(bvid=bv_number, credential=self.credential)
-        info = sync(v.get_info())
+        with tracer.span("bilibili.get_info", bvid=bv_number):
+            info = cassette.call("bilibili.get_info", {"bvid": bv_number}, lambda: sync(v.get_info()))
         
         return {
             "bvid": bv_number,
@@ -51,7 +57,8 @@ class BilibiliParser:
         try:
             # First get the video info to get the aid (oid for comments)
             v = video.Video(bvid=bv_number, credential=self.credential)
-            info = sync(v.get_info())
+            with tracer.span("bilibili.get_info", bvid=bv_number):
+                info = cassette.call("bilibili.get_info", {"bvid": bv_number}, lambda: sync(v.get_info()))
             aid = info.get('aid')
 
             if not aid:
@@ -61,12 +68,19 @@ class BilibiliParser:
             # Use the comment module's get_comments_lazy function
             offset = ''
             while len(comments) < max_count:
-                comment_result = sync(comment.get_comments_lazy(
-                    oid=aid,
-                    type_=comment.CommentResourceType.VIDEO,
-                    offset=offset,
-                    credential=self.credential
-                ))
+                check_cancelled()
+                with tracer.span("bilibili.comment_page") as span:
+                    comment_result = cassette.call(
+                        "bilibili.comment_page",
+                        {"aid": aid, "offset": offset},
+                        lambda: sync(comment.get_comments_lazy(
+                            oid=aid,
+                            type_=comment.CommentResourceType.VIDEO,
+                            offset=offset,
+                            credential=self.credential
+                        ))
+                    )
+                    span.set(replies=len((comment_result or {}).get("replies") or []))
 
                 if not comment_result or "replies" not in comment_result:
                     break
@@ -92,6 +106,8 @@ class BilibiliParser:
                 if not offset:
                     break
 
+        except CassetteMiss:
+            raise
         except Exception as e:
             print(f"Error fetching comments: {e}")
         
@@ -103,12 +119,48 @@ class BilibiliParser:
         
         try:
             # get_danmakus uses page_index (0-based), cid is optional
-            danmaku_list = sync(v.get_danmakus(page_index=0, cid=cid if cid else None))
-            return [dm.text for dm in danmaku_list]
+            with tracer.span("bilibili.get_danmakus") as span:
+                danmaku = cassette.call(
+                    "bilibili.get_danmakus",
+                    {"bvid": bv_number, "cid": cid},
+                    lambda: [dm.text for dm in sync(v.get_danmakus(page_index=0, cid=cid if cid else None))]
+                )
+                span.set(count=len(danmaku))
+            return danmaku
+        except CassetteMiss:
+            raise
         except Exception as e:
             print(f"Error fetching danmaku: {e}")
             return []
 
+    def iter_danmaku(self, bv_number: str, cid: int, duration: int) -> Iterator[List[str]]:
+        """
+        Danmaku one 6-minute segment at a time, for streaming mode on long
+        videos (get_danmaku holds every Danmaku object of the video at once).
+        """
+        v = video.Video(bvid=bv_number, credential=self.credential)
+        segments = max(0, duration) // 360 + 1
+
+        with tracer.span("bilibili.get_danmakus", segments=segments) as span:
+            count = 0
+            for segment in range(segments):
+                check_cancelled()
+                try:
+                    danmaku = cassette.call(
+                        "bilibili.get_danmakus",
+                        {"bvid": bv_number, "cid": cid, "segment": segment},
+                        lambda: [dm.text for dm in sync(v.get_danmakus(
+                            page_index=0, cid=cid if cid else None, from_seg=segment, to_seg=segment))]
+                    )
+                except CassetteMiss:
+                    raise
+                except Exception as e:
+                    print(f"Error fetching danmaku segment {segment}: {e}")
+                    continue
+                count += len(danmaku)
+                yield danmaku
+            span.set(count=count)
+
 
 
 class BilibiliDownloader:
@@ -121,42 +173,42 @@ class BilibiliDownloader:
 
     def _find_ffmpeg(self) -> Optional[str]:
         """
-        Find ffmpeg executable path.
-        Priority:
-        1. Environment PATH (system ffmpeg)
-        2. Project folder ./ffmpeg/bin/ffmpeg.exe or ./ffmpeg/ffmpeg.exe
-        3. Project folder ./ffmpeg.exe
+        Find ffmpeg for yt-dlp merging (see bilivagent.utils.ffmpeg.find_ffmpeg).
+        Returns None when ffmpeg is in PATH, since yt-dlp then finds it itself.
         """
         import shutil
 
-        # First, check if ffmpeg is in system PATH
-        ffmpeg_in_path = shutil.which("ffmpeg")
-        if ffmpeg_in_path:
-            print(f"Found ffmpeg in PATH: {ffmpeg_in_path}")
+        ffmpeg_path = find_ffmpeg()
+        if not ffmpeg_path:
+            print("Warning: ffmpeg not found. Video merging may fail.")
+            return None
+        if ffmpeg_path == shutil.which("ffmpeg"):
+            print(f"Found ffmpeg in PATH: {ffmpeg_path}")
             return None  # Return None means use system ffmpeg (no special config needed)
 
-        # Get project root directory
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        print(f"Found ffmpeg: {ffmpeg_path}")
+        return ffmpeg_path
 
-        # Check possible ffmpeg locations in project folder
-        possible_paths = [
-            os.path.join(project_root, "ffmpeg", "bin", "ffmpeg.exe"),
-            os.path.join(project_root, "ffmpeg", "ffmpeg.exe"),
-            os.path.join(project_root, "ffmpeg.exe"),
-            # Also check for non-Windows systems
-            os.path.join(project_root, "ffmpeg", "bin", "ffmpeg"),
-            os.path.join(project_root, "ffmpeg", "ffmpeg"),
-        ]
+    def download_video(self, bv_number: str, audio_only: bool = False) -> Optional[str]:
+        """
+        Download video (or only its audio track), recording/replaying the
+        result by content hash in cassette mode
+        """
+        if cassette.active:
+            params = {"bvid": bv_number, "audio_only": True} if audio_only else {"bvid": bv_number}
+            return cassette.media("ytdlp.download", params, lambda: self._download_video(bv_number, audio_only))
+        return self._download_video(bv_number, audio_only)
 
-        for path in possible_paths:
-            if os.path.isfile(path):
-                print(f"Found ffmpeg in project folder: {path}")
-                return path
+    def find_downloaded(self, bv_number: str, audio_only: bool = False) -> Optional[str]:
+        """Previously downloaded video (or, with audio_only, also an audio-only download)"""
+        import glob
 
-        print("Warning: ffmpeg not found. Video merging may fail.")
-        return None
+        existing_files = glob.glob(os.path.join(self.output_dir, f"{bv_number}*.mp4"))
+        if audio_only:
+            existing_files += glob.glob(os.path.join(self.output_dir, f"{bv_number}*.m4a"))
+        return existing_files[0] if existing_files else None
 
-    def download_video(self, bv_number: str) -> Optional[str]:
+    def _download_video(self, bv_number: str, audio_only: bool = False) -> Optional[str]:
         """Download video using yt-dlp as Python module"""
         url = f"https://www.bilibili.com/video/{bv_number}"
         output_template = os.path.join(self.output_dir, f"{bv_number}.%(ext)s")
@@ -165,11 +217,14 @@ class BilibiliDownloader:
             import yt_dlp
             import glob
 
-            # Check if video already exists
-            existing_files = glob.glob(os.path.join(self.output_dir, f"{bv_number}*.mp4"))
-            if existing_files:
-                Config.debug_print(f"[DEBUG] Video already exists: {existing_files[0]}")
-                return existing_files[0]
+            # Check if video already exists (a full video also serves audio-only requests)
+            existing = self.find_downloaded(bv_number, audio_only)
+            if existing:
+                Config.debug_print(f"[DEBUG] Video already exists: {existing}")
+                tracer.event("ytdlp.download", cache_hit=True)
+                cache_lookup("download", hit=True)
+                return existing
+            cache_lookup("download", hit=False)
 
             # Custom logger class to avoid stdout encoding issues
             class YTDLPLogger:
@@ -193,22 +248,35 @@ class BilibiliDownloader:
                 'nocheckcertificate': True,  # Skip certificate verification
                 'socket_timeout': 30,  # Timeout for network operations
                 'logger': YTDLPLogger(),  # Use custom logger
-                'progress_hooks': [self._download_progress_hook],  # Progress callback
+                'progress_hooks': [self._download_progress_hook],  # Progress callback (also checks for cancellation)
+                'postprocessor_hooks': [self._postprocessor_hook],
             }
 
-            # If we found ffmpeg in project folder, configure it
+            if audio_only:
+                # Audio track only: a fraction of the download, no merging
+                ydl_opts['format'] = 'bestaudio[ext=m4a]/bestaudio'
+                del ydl_opts['merge_output_format']
+
+            # If ffmpeg is not in PATH (project folder or imageio-ffmpeg), configure it
             if self.ffmpeg_path:
-                ffmpeg_dir = os.path.dirname(self.ffmpeg_path)
-                ydl_opts['ffmpeg_location'] = ffmpeg_dir
-                Config.debug_print(f"[DEBUG] Using ffmpeg from: {ffmpeg_dir}")
+                # yt-dlp accepts the binary itself and looks for ffprobe next to it
+                ydl_opts['ffmpeg_location'] = self.ffmpeg_path
+                Config.debug_print(f"[DEBUG] Using ffmpeg from: {self.ffmpeg_path}")
 
-            print(f"Downloading video: {bv_number}")
+            print(f"Downloading {'audio' if audio_only else 'video'}: {bv_number}")
             Config.debug_print(f"[DEBUG] URL: {url}")
 
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                error_code = ydl.download([url])
-                if error_code != 0:
-                    print(f"Download error code: {error_code}")
+            with tracer.span("ytdlp.download", cache_hit=False, audio_only=audio_only) as span:
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    error_code = ydl.download([url])
+                    if error_code != 0:
+                        print(f"Download error code: {error_code}")
+                downloaded = sum(
+                    os.path.getsize(f) for f in glob.glob(os.path.join(self.output_dir, f"{bv_number}*"))
+                    if os.path.isfile(f)
+                )
+                span.set(bytes=downloaded)
+                DOWNLOAD_BYTES.inc(downloaded, kind="audio" if audio_only else "video")
 
             # Find the downloaded file
             video_path = os.path.join(self.output_dir, f"{bv_number}.mp4")
@@ -219,7 +287,8 @@ class BilibiliDownloader:
             # Check for format-specific files that yt-dlp might create
             pattern = os.path.join(self.output_dir, f"{bv_number}*")
             files = glob.glob(pattern)
-            video_files = [f for f in files if f.endswith(('.mp4', '.webm', '.mkv', '.flv'))]
+            extensions = ('.m4a', '.webm', '.mp3', '.aac', '.opus') if audio_only else ('.mp4', '.webm', '.mkv', '.flv')
+            video_files = [f for f in files if f.endswith(extensions)]
             if video_files:
                 Config.debug_print(f"[DEBUG] Found video file: {video_files[0]}")
                 return video_files[0]
@@ -228,6 +297,11 @@ class BilibiliDownloader:
             Config.debug_print(f"[DEBUG] Files found matching {bv_number}: {files}")
             return None
             
+        except Cancelled:
+            self._remove_partial(bv_number)
+            raise
+        except CassetteMiss:
+            raise
         except Exception as e:
             import traceback
             print(f"Error downloading video: {e}")
@@ -235,8 +309,29 @@ class BilibiliDownloader:
                 traceback.print_exc()
             return None
 
+    def _remove_partial(self, bv_number: str):
+        """
+        Delete the leftovers of an aborted download: partial files yt-dlp would
+        keep to resume, and unmerged format streams (BV....f100026.mp4) that
+        find_downloaded would otherwise take for a finished video
+        """
+        import glob
+
+        for path in glob.glob(os.path.join(self.output_dir, f"{bv_number}*")):
+            name = os.path.basename(path)
+            if name.endswith(('.part', '.ytdl')) or re.search(r'\.(part-Frag\d+|temp|f\d+)\.', name + '.'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _postprocessor_hook(self, d):
+        """Stop before merging/converting if the analysis was cancelled"""
+        check_cancelled()
+
     def _download_progress_hook(self, d):
-        """Progress hook for download status"""
+        """Progress hook for download status; raising from it aborts the download"""
+        check_cancelled()
         if d['status'] == 'downloading':
             percent = d.get('_percent_str', 'N/A')
             speed = d.get('_speed_str', 'N/A')
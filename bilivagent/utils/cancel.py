@@ -0,0 +1,118 @@
+"""
+Cooperative cancellation
+
+A CancelToken is passed to BiliVagent.analyze_video and made current for
+the analysis (a ContextVar, like the route overrides), so the stages check
+it without every signature carrying it:
+
+- check_cancelled() at stage boundaries and inside long loops (frame
+  scan, speech recognition, comment pages, download progress hooks)
+- on_cancel(callback) around blocking work that cannot poll, e.g. killing
+  an ffmpeg child process or closing a streaming HTTP response
+
+Cancelled derives from BaseException (like KeyboardInterrupt), so the
+many `except Exception` fallbacks in the pipeline do not swallow it.
+"""
+import threading
+import contextlib
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+
+class Cancelled(BaseException):
+    """The analysis was cancelled"""
+
+    def __init__(self, message: str = "Analysis cancelled"):
+        super().__init__(message)
+
+
+class CancelToken:
+    """Thread-safe cancellation flag with callbacks fired on cancel"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        """Request cancellation; callbacks registered with on_cancel run now, on this thread"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass  # a failing cleanup must not stop the others
+
+    def check(self):
+        """Raise Cancelled if cancellation was requested"""
+        if self._event.is_set():
+            raise Cancelled()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Sleep up to timeout seconds, returning early (True) on cancel"""
+        return self._event.wait(timeout)
+
+    @contextlib.contextmanager
+    def on_cancel(self, callback: Callable[[], None]):
+        """Call callback if the token is cancelled while inside this block (or already is)"""
+        with self._lock:
+            registered = not self._event.is_set()
+            if registered:
+                self._callbacks.append(callback)
+        if not registered:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+
+# Token of the analysis running in this thread (or asyncio task)
+_current: ContextVar[Optional[CancelToken]] = ContextVar("cancel_token", default=None)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current.get()
+
+
+@contextlib.contextmanager
+def cancel_scope(token: Optional[CancelToken]):
+    """Make token current inside this block (None: not cancellable)"""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def check_cancelled():
+    """Raise Cancelled if the current analysis was cancelled"""
+    token = _current.get()
+    if token is not None and token.cancelled:
+        raise Cancelled()
+
+
+def on_cancel(callback: Callable[[], None]):
+    """CancelToken.on_cancel for the current token (no-op without one)"""
+    token = _current.get()
+    return token.on_cancel(callback) if token is not None else contextlib.nullcontext()
+
+
+def bound(fn: Callable) -> Callable:
+    """fn running under the caller's token, for work handed to thread pools"""
+    token = _current.get()
+
+    def run(*args, **kwargs):
+        with cancel_scope(token):
+            return fn(*args, **kwargs)
+    return run
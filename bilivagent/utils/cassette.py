@@ -0,0 +1,210 @@
+"""Record/replay of external I/O (Bilibili API, downloads, SiliconFlow) for reproducible runs"""
+import os
+import copy
+import gzip
+import json
+import time
+import atexit
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+from bilivagent.config import Config
+
+CASSETTE_VERSION = 1
+MODES = ("off", "record", "replay")
+
+
+class CassetteMiss(LookupError):
+    """
+    Replay requested a response that is not in the cassette. The pipeline's
+    fallbacks (empty comments, empty LLM answer, ...) re-raise it, so a
+    drifted cassette fails the run instead of replaying something else.
+    """
+
+
+def request_key(request: Any) -> str:
+    """Short stable hash of a JSON-serializable request description"""
+    data = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file, read in 1 MiB blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Cassette:
+    """
+    Captures external responses in record mode and serves them back in
+    replay mode.
+
+    Entries are stored in call order as {"kind", "key", "response",
+    "latency"} in a gzipped JSON file. Replay first matches kind and
+    request key; when the request changed (e.g. a prompt built from a
+    different transcript) and strict mode is off, the next unused entry of
+    the same kind is served instead, so runs stay comparable while
+    CPU-side code changes. Identical requests are served in recorded order.
+    """
+
+    def __init__(self, mode: Optional[str] = None, path: Optional[str] = None,
+                 replay_latency: Optional[bool] = None, strict: Optional[bool] = None):
+        self._lock = threading.Lock()
+        self._save_registered = False
+        self.configure(
+            mode or Config.CASSETTE_MODE,
+            path or Config.CASSETTE_PATH,
+            Config.CASSETTE_REPLAY_LATENCY if replay_latency is None else replay_latency,
+            Config.CASSETTE_STRICT if strict is None else strict,
+        )
+
+    def configure(self, mode: str, path: Optional[str] = None, replay_latency: Optional[bool] = None,
+                  strict: Optional[bool] = None):
+        """Switch mode; in replay mode the cassette file is loaded on first use"""
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode: {mode} (expected one of {', '.join(MODES)})")
+        with self._lock:
+            self.mode = mode
+            self.path = path or getattr(self, "path", Config.CASSETTE_PATH)
+            if replay_latency is not None:
+                self.replay_latency = replay_latency
+            if strict is not None:
+                self.strict = strict
+            self.entries = []
+            self._by_key: Dict[tuple, deque] = {}
+            self._by_kind: Dict[str, deque] = {}
+            self._used = set()
+            self._loaded = False
+
+    @property
+    def active(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def call(self, kind: str, request: Any, fn: Callable[[], Any]) -> Any:
+        """Run fn live (recording its result in record mode) or return the recorded response"""
+        if self.replaying:
+            return self.replay(kind, request)
+        if not self.recording:
+            return fn()
+        start = time.perf_counter()
+        response = fn()
+        self.record(kind, request, response, time.perf_counter() - start)
+        return response
+
+    async def acall(self, kind: str, request: Any, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async version of call"""
+        if self.replaying:
+            entry = self._take(kind, request)
+            if self.replay_latency:
+                await asyncio.sleep(entry["latency"])
+            return copy.deepcopy(entry["response"])
+        if not self.recording:
+            return await fn()
+        start = time.perf_counter()
+        response = await fn()
+        self.record(kind, request, response, time.perf_counter() - start)
+        return response
+
+    def record(self, kind: str, request: Any, response: Any, latency: float = 0.0):
+        """Append a response (must be JSON-serializable)"""
+        entry = {"kind": kind, "key": request_key(request), "response": response, "latency": round(latency, 4)}
+        with self._lock:
+            self.entries.append(entry)
+            if not self._save_registered:
+                atexit.register(self.save)
+                self._save_registered = True
+
+    def replay(self, kind: str, request: Any) -> Any:
+        """Return the recorded response, sleeping for its latency if enabled"""
+        entry = self._take(kind, request)
+        if self.replay_latency:
+            time.sleep(entry["latency"])
+        return copy.deepcopy(entry["response"])
+
+    def _take(self, kind: str, request: Any) -> Dict:
+        key = request_key(request)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            entry = self._pop_unused(self._by_key.get((kind, key)))
+            if entry is None and not self.strict:
+                entry = self._pop_unused(self._by_kind.get(kind))
+                if entry is not None:
+                    Config.debug_print(f"[DEBUG] Cassette: request changed, serving next recorded '{kind}'")
+            if entry is None:
+                raise CassetteMiss(f"No recorded '{kind}' response for request {key} in {self.path}")
+            self._used.add(id(entry))
+            return entry
+
+    def _pop_unused(self, queue: Optional[deque]) -> Optional[Dict]:
+        while queue:
+            entry = queue.popleft()
+            if id(entry) not in self._used:
+                return entry
+        return None
+
+    def media(self, kind: str, request: Any, fn: Callable[[], Optional[str]]) -> Optional[str]:
+        """
+        Record/replay a downloaded file by path and content hash. Replay
+        returns the local file only if it is unchanged since recording.
+        """
+        def download():
+            path = fn()
+            if not path:
+                return None
+            return {"path": path, "sha256": file_digest(path), "bytes": os.path.getsize(path)}
+
+        record = self.call(kind, request, download)
+        if not record:
+            return None
+        if self.replaying:
+            if not os.path.exists(record["path"]) or file_digest(record["path"]) != record["sha256"]:
+                raise CassetteMiss(f"Recorded media missing or changed: {record['path']}")
+        return record["path"]
+
+    def save(self, path: Optional[str] = None) -> Optional[str]:
+        """Write recorded entries (atomically) to the cassette file"""
+        path = path or self.path
+        with self._lock:
+            if not self.recording or not self.entries:
+                return None
+            data = {"version": CASSETTE_VERSION, "entries": list(self.entries)}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"), default=str)
+        os.replace(tmp_path, path)
+        Config.debug_print(f"[DEBUG] Cassette saved: {len(data['entries'])} entries -> {path}")
+        return path
+
+    def _load(self):
+        # Called with the lock held
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version in {self.path}: {data.get('version')}")
+
+        self.entries = data["entries"]
+        for entry in self.entries:
+            self._by_key.setdefault((entry["kind"], entry["key"]), deque()).append(entry)
+            self._by_kind.setdefault(entry["kind"], deque()).append(entry)
+        self._loaded = True
+        Config.debug_print(f"[DEBUG] Cassette loaded: {len(self.entries)} entries from {self.path}")
+
+
+# Process-wide cassette used by the Bilibili and SiliconFlow clients
+cassette = Cassette()
@@ -0,0 +1,150 @@
+"""Near-duplicate collapsing for comments and danmaku"""
+import re
+import math
+import zlib
+from typing import Dict, List, Tuple
+import numpy as np
+from bilivagent.utils.tokens import estimate_tokens
+
+# MinHash/LSH parameters: 8 bands of 4 rows put the similarity threshold
+# at about (1/8)^(1/4) ~ 0.6 Jaccard over character bigrams
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Lines are hashed in chunks of this many shingles to bound memory
+_CHUNK_SHINGLES = 1 << 16
+
+_NOISE = re.compile(r'[\s\W_]+')
+_REPEATS = re.compile(r'(.)\1{2,}')
+
+
+def normalize_line(line: str) -> str:
+    """Lowercase, drop punctuation/whitespace and shorten character runs ('哈哈哈哈' -> '哈哈')"""
+    line = _NOISE.sub('', line.lower())
+    return _REPEATS.sub(r'\1\1', line)
+
+
+def _shingles(text: str) -> List[int]:
+    """Hashed character bigrams"""
+    return [zlib.crc32(text[i:i + 2].encode('utf-8')) for i in range(len(text) - 1)]
+
+
+def _minhash_signatures(shingle_lists: List[List[int]], seed: int = 1) -> np.ndarray:
+    """Compute (n, NUM_PERM) MinHash signatures, vectorized over chunks of lines"""
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, _MERSENNE_PRIME, size=(NUM_PERM, 1), dtype=np.uint64)
+    b = rng.randint(0, _MERSENNE_PRIME, size=(NUM_PERM, 1), dtype=np.uint64)
+
+    signatures = np.empty((len(shingle_lists), NUM_PERM), dtype=np.uint64)
+    start = 0
+    while start < len(shingle_lists):
+        # Collect lines until the chunk holds enough shingles
+        end = start
+        total = 0
+        while end < len(shingle_lists) and (total < _CHUNK_SHINGLES or end == start):
+            total += len(shingle_lists[end])
+            end += 1
+
+        chunk = shingle_lists[start:end]
+        lengths = np.fromiter((len(s) for s in chunk), dtype=np.int64, count=len(chunk))
+        values = np.fromiter((h for s in chunk for h in s), dtype=np.uint64, count=int(lengths.sum()))
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+        # Universal hashing (a*x + b) mod p, truncated to 32 bits; uint64
+        # overflow is fine as it only permutes the values further
+        hashed = ((a * values[np.newaxis, :] + b) % np.uint64(_MERSENNE_PRIME)) & np.uint64(_MAX_HASH)
+        signatures[start:end] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        start = end
+
+    return signatures
+
+
+def collapse_near_duplicates(lines: List[str]) -> List[Tuple[str, int]]:
+    """
+    Collapse repeated and near-duplicate lines.
+
+    Returns (representative, count) pairs in order of first appearance; the
+    representative is the first original line of each group. Runs in linear
+    time: exact duplicates (after normalization) are grouped with a dict and
+    only distinct lines go through MinHash + LSH banding.
+    """
+    # Exact grouping on normalized text
+    group_of: Dict[str, int] = {}
+    representatives: List[str] = []
+    counts: List[int] = []
+    keys: List[str] = []
+    for line in lines:
+        key = normalize_line(line)
+        if not key:
+            continue
+        group = group_of.get(key)
+        if group is None:
+            group = len(representatives)
+            group_of[key] = group
+            representatives.append(line.strip())
+            counts.append(0)
+            keys.append(key)
+        counts[group] += 1
+
+    # Near-duplicate merging on distinct lines with enough shingles
+    candidates = [i for i, key in enumerate(keys) if len(key) >= 4]
+    parent = list(range(len(keys)))
+
+    def find(group: int) -> int:
+        while parent[group] != group:
+            parent[group] = parent[parent[group]]
+            group = parent[group]
+        return group
+
+    if candidates:
+        signatures = _minhash_signatures([_shingles(keys[i]) for i in candidates])
+        buckets: List[Dict[bytes, int]] = [{} for _ in range(BANDS)]
+        for row, group in enumerate(candidates):
+            signature = signatures[row]
+            for band in range(BANDS):
+                band_key = signature[band * ROWS:(band + 1) * ROWS].tobytes()
+                owner = buckets[band].setdefault(band_key, group)
+                if owner != group:
+                    parent[group] = find(owner)
+                    break
+
+    merged: Dict[int, int] = {}
+    result: List[Tuple[str, int]] = []
+    for group, count in enumerate(counts):
+        root = find(group)
+        if root in merged:
+            rep, total = result[merged[root]]
+            result[merged[root]] = (rep, total + count)
+        else:
+            merged[root] = len(result)
+            result.append((representatives[root], count))
+    return result
+
+
+def information_value(text: str, count: int) -> float:
+    """Rank a collapsed line: longer, more varied lines and larger groups rank higher"""
+    distinct = len(set(normalize_line(text)))
+    return (1.0 + math.log2(count)) * math.sqrt(distinct)
+
+
+def pack_by_value(groups: List[Tuple[str, int]], token_budget: int) -> str:
+    """
+    Pack collapsed lines into a prompt fragment of at most token_budget
+    (estimated) tokens, highest information value first.
+    """
+    ranked = sorted(groups, key=lambda g: information_value(g[0], g[1]), reverse=True)
+
+    packed = []
+    used = 0
+    for text, count in ranked:
+        line = f"{text} (×{count})" if count > 1 else text
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            continue
+        packed.append(line)
+        used += cost
+    return "\n".join(packed)
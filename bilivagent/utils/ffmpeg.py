@@ -0,0 +1,77 @@
+"""Locating and running ffmpeg"""
+import os
+import shutil
+import subprocess
+from functools import lru_cache
+from typing import Optional
+
+from bilivagent.utils.cancel import check_cancelled, on_cancel
+
+
+@lru_cache(maxsize=1)
+def find_ffmpeg() -> Optional[str]:
+    """
+    Find the ffmpeg executable.
+    Priority:
+    1. Environment PATH (system ffmpeg)
+    2. Project folder ./ffmpeg/bin/ffmpeg(.exe), ./ffmpeg/ffmpeg(.exe) or ./ffmpeg.exe
+    3. The binary bundled with moviepy (imageio-ffmpeg)
+    """
+    ffmpeg_in_path = shutil.which("ffmpeg")
+    if ffmpeg_in_path:
+        return ffmpeg_in_path
+
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    possible_paths = [
+        os.path.join(project_root, "ffmpeg", "bin", "ffmpeg.exe"),
+        os.path.join(project_root, "ffmpeg", "ffmpeg.exe"),
+        os.path.join(project_root, "ffmpeg.exe"),
+        os.path.join(project_root, "ffmpeg", "bin", "ffmpeg"),
+        os.path.join(project_root, "ffmpeg", "ffmpeg"),
+    ]
+    for path in possible_paths:
+        if os.path.isfile(path):
+            return path
+
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def extract_audio(input_path: str, output_path: str, sample_rate: int = 16000) -> str:
+    """
+    Decode the first audio stream of input_path to mono 16-bit PCM WAV.
+    Video streams are dropped at the demuxer (-vn), so frames are never
+    decoded. Raises RuntimeError if ffmpeg is missing or fails, e.g. when
+    the input has no audio stream, and Cancelled (after killing ffmpeg)
+    if the current analysis is cancelled.
+    """
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg not found")
+
+    # Write next to the target and rename, so an interrupted run never
+    # leaves a truncated file that would later be taken as cached audio
+    tmp_path = output_path + ".part"
+    process = subprocess.Popen(
+        [ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+         "-i", input_path,
+         "-map", "0:a:0", "-vn", "-sn", "-dn",
+         "-ac", "1", "-ar", str(sample_rate), "-c:a", "pcm_s16le",
+         "-f", "wav", tmp_path],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    # Cancelling the analysis kills ffmpeg right away
+    with on_cancel(process.kill):
+        _, stderr = process.communicate()
+    if process.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        check_cancelled()
+        message = stderr.decode("utf-8", errors="replace").strip().splitlines()
+        raise RuntimeError(f"ffmpeg failed on {input_path}: {message[-1] if message else process.returncode}")
+
+    os.replace(tmp_path, output_path)
+    return output_path
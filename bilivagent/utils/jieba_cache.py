@@ -0,0 +1,161 @@
+"""Precompiled jieba dictionary cache"""
+import os
+import mmap
+import marshal
+import hashlib
+import tempfile
+import threading
+from typing import List, Optional
+import jieba
+from bilivagent.config import Config
+from bilivagent.utils.tracing import tracer
+from bilivagent.utils.metrics import cache_lookup
+
+# Bump when the cache layout changes so stale files are never loaded
+CACHE_VERSION = 1
+
+_lock = threading.Lock()
+_loaded_key: Optional[str] = None
+
+
+def _file_signature(path: str) -> str:
+    """Identify a source file by path, size and mtime"""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def cache_key(user_dicts: List[str], idf_path: Optional[str] = None) -> str:
+    """Build the cache key for a dictionary/IDF combination"""
+    parts = [
+        f"v{CACHE_VERSION}",
+        f"jieba-{getattr(jieba, '__version__', '')}",
+        # The bundled dictionary only changes with the jieba version
+        _file_signature(jieba.dt.dictionary) if jieba.dt.dictionary else "default",
+    ]
+    parts.extend(_file_signature(p) for p in user_dicts)
+    if idf_path:
+        parts.append(_file_signature(idf_path))
+    return hashlib.md5("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def cache_path_for(key: str, cache_dir: Optional[str] = None) -> str:
+    """Return the cache file path for a key"""
+    cache_dir = cache_dir or Config.CACHE_DIR
+    return os.path.join(cache_dir, f"jieba.v{CACHE_VERSION}.{key}.cache")
+
+
+def build_cache(user_dicts: List[str], idf_path: Optional[str] = None, cache_dir: Optional[str] = None) -> str:
+    """
+    Build the prefix dictionary (with user dictionaries and IDF table)
+    and dump it into a versioned cache file.
+    """
+    import jieba.analyse
+
+    key = cache_key(user_dicts, idf_path)
+    path = cache_path_for(key, cache_dir)
+
+    jieba.dt.initialize()
+    for user_dict in user_dicts:
+        jieba.load_userdict(user_dict)
+    if idf_path:
+        jieba.analyse.set_idf_path(idf_path)
+
+    tfidf = jieba.analyse.default_tfidf
+    payload = (
+        CACHE_VERSION,
+        key,
+        jieba.dt.FREQ,
+        jieba.dt.total,
+        jieba.dt.user_word_tag_tab,
+        tfidf.idf_freq if idf_path else None,
+        tfidf.median_idf if idf_path else None,
+    )
+
+    # Write atomically so concurrent workers never see a partial file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        marshal.dump(payload, f)
+    os.replace(tmp_path, path)
+
+    Config.debug_print(f"[DEBUG] jieba cache written: {path}")
+    return path
+
+
+def _load_cache(path: str, key: str, idf_path: Optional[str]) -> bool:
+    """Load a cache file into the default jieba tokenizer"""
+    import jieba.analyse
+
+    try:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                payload = marshal.loads(mm)
+    except (OSError, ValueError, EOFError, TypeError):
+        return False
+
+    version, stored_key, freq, total, tag_tab, idf_freq, median_idf = payload
+    if version != CACHE_VERSION or stored_key != key:
+        return False
+
+    with jieba.dt.lock:
+        jieba.dt.FREQ = freq
+        jieba.dt.total = total
+        # jieba.user_word_tag_tab aliases this dict, so update it in place
+        jieba.dt.user_word_tag_tab.clear()
+        jieba.dt.user_word_tag_tab.update(tag_tab)
+        jieba.dt.initialized = True
+
+    if idf_path and idf_freq is not None:
+        tfidf = jieba.analyse.default_tfidf
+        tfidf.idf_loader.path = idf_path
+        tfidf.idf_loader.idf_freq = idf_freq
+        tfidf.idf_loader.median_idf = median_idf
+        tfidf.idf_freq, tfidf.median_idf = idf_freq, median_idf
+
+    return True
+
+
+def ensure_loaded(user_dicts: Optional[List[str]] = None, idf_path: Optional[str] = None) -> None:
+    """
+    Make sure jieba is initialized, loading from the precompiled cache
+    when possible and building it otherwise.
+
+    Safe to call repeatedly; after the first call this is a no-op. Calling
+    it in a parent process before forking lets worker processes share the
+    loaded dictionary without rebuilding it.
+    """
+    global _loaded_key
+
+    if user_dicts is None:
+        user_dicts = Config.JIEBA_USER_DICTS
+    if idf_path is None:
+        idf_path = Config.JIEBA_IDF_PATH or None
+
+    user_dicts = [p for p in user_dicts if os.path.exists(p)]
+    key = cache_key(user_dicts, idf_path)
+
+    if _loaded_key == key:
+        return
+
+    with _lock:
+        if _loaded_key == key:
+            return
+
+        jieba.setLogLevel(jieba.logging.INFO)
+        path = cache_path_for(key)
+        with tracer.span("jieba.load") as span:
+            if os.path.exists(path) and _load_cache(path, key, idf_path):
+                Config.debug_print(f"[DEBUG] jieba loaded from cache: {path}")
+                span.set(cache_hit=True)
+                cache_lookup("jieba", hit=True)
+            else:
+                span.set(cache_hit=False)
+                cache_lookup("jieba", hit=False)
+                try:
+                    build_cache(user_dicts, idf_path)
+                except OSError as e:
+                    # Cache directory not writable: the tokenizer is still initialized
+                    Config.debug_print(f"[DEBUG] Failed to write jieba cache: {e}")
+
+        _loaded_key = key
+
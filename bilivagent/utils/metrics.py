@@ -0,0 +1,340 @@
+"""
+Prometheus metrics
+
+Process-wide counters, gauges and histograms for long-running workers,
+rendered in the Prometheus text format (version 0.0.4):
+
+- the HTTP service serves them at GET /metrics
+- the job queue worker and the daemon can serve them on METRICS_PORT
+  and/or rewrite METRICS_TEXTFILE every METRICS_INTERVAL seconds for
+  node_exporter's textfile collector
+
+Unlike the tracer, metrics are always on: recording is a dict update under
+a lock (about a microsecond) at stage, request and job granularity, never
+per frame or per line. Queue depth and worker state are read when the
+metrics are rendered, by collectors registered with Registry.on_collect.
+"""
+import os
+import math
+import time
+import bisect
+import socket
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from bilivagent.config import Config
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self, const: str) -> List[str]:
+        raise NotImplementedError
+
+    def render(self, const: str = "") -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples(const))
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self, const: str) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key, const)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket distribution of observations per label set"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = ()):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (not cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the seconds spent in the block (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self, const: str) -> List[str]:
+        with self._lock:
+            items = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = _labels(self.labelnames, key, f'le="{_format_value(bound)}"' + (f",{const}" if const else ""))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key, const)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key, const)} {count}")
+        return lines
+
+
+class Registry:
+    """Named metrics of this process plus collectors run before rendering"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = ()) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def on_collect(self, collector: Callable[[], None]):
+        """Run collector (e.g. reading the queue depth into a gauge) before each render"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self, const_labels: Optional[Dict[str, str]] = None) -> str:
+        """All metrics in the Prometheus text format; const_labels are added to every sample"""
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                Config.debug_print(f"[DEBUG] Metrics collector failed: {e}")
+        const = ",".join(f'{name}="{_escape(value)}"' for name, value in (const_labels or {}).items())
+        return "\n".join(metric.render(const) for metric in metrics) + "\n"
+
+    def write_textfile(self, path: str, const_labels: Optional[Dict[str, str]] = None) -> str:
+        """Atomically replace path with the rendered metrics"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render(const_labels))
+        os.replace(tmp_path, path)
+        return path
+
+    def serve(self, port: int, host: Optional[str] = None) -> ThreadingHTTPServer:
+        """Serve GET /metrics from a background thread (port 0 picks a free port)"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host or Config.SERVICE_HOST, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+    def start_textfile(self, path: str, interval: float,
+                       const_labels: Optional[Dict[str, str]] = None) -> threading.Event:
+        """Rewrite the textfile every interval seconds until the returned event is set"""
+        stopped = threading.Event()
+
+        def run():
+            while True:
+                try:
+                    self.write_textfile(path, const_labels)
+                except OSError as e:
+                    Config.debug_print(f"[DEBUG] Cannot write metrics to {path}: {e}")
+                if stopped.wait(interval):
+                    return
+
+        threading.Thread(target=run, name="metrics-textfile", daemon=True).start()
+        return stopped
+
+
+# Process-wide registry used by all instrumentation
+metrics = Registry()
+
+
+def start_exporters(worker: Optional[str] = None):
+    """
+    Export the metrics as configured (METRICS_PORT, METRICS_TEXTFILE); for
+    long-running processes. The textfile gets a worker label, since the
+    textfile collector merges the files of all workers on a host.
+    """
+    if Config.METRICS_PORT:
+        server = metrics.serve(Config.METRICS_PORT)
+        host, port = server.server_address[:2]
+        print(f"Metrics on http://{host}:{port}/metrics")
+    if Config.METRICS_TEXTFILE:
+        worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        metrics.start_textfile(Config.METRICS_TEXTFILE, Config.METRICS_INTERVAL, {"worker": worker})
+        print(f"Metrics written to {Config.METRICS_TEXTFILE} every {Config.METRICS_INTERVAL:g}s")
+
+
+# Seconds; pipeline stages run from milliseconds (cached) to tens of minutes (long downloads)
+STAGE_BUCKETS = (0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+REQUEST_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 40, 60, 120, 180)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5)
+
+STAGE_SECONDS = metrics.histogram(
+    "bilivagent_stage_seconds", "Duration of pipeline stages", ("stage",), STAGE_BUCKETS)
+ANALYSES = metrics.counter(
+    "bilivagent_analyses_total", "Finished analyses by outcome (done, failed, cancelled)", ("outcome",))
+SILICONFLOW_REQUESTS = metrics.counter(
+    "bilivagent_siliconflow_requests_total",
+    "SiliconFlow API requests by endpoint and HTTP status (error: no response)", ("endpoint", "status"))
+SILICONFLOW_SECONDS = metrics.histogram(
+    "bilivagent_siliconflow_request_seconds", "SiliconFlow API request latency until the response headers",
+    ("endpoint",), REQUEST_BUCKETS)
+SILICONFLOW_TOKENS = metrics.counter(
+    "bilivagent_siliconflow_tokens_total", "Tokens reported by SiliconFlow, by model and direction (in, out)",
+    ("model", "direction"))
+CACHE_LOOKUPS = metrics.counter(
+    "bilivagent_cache_lookups_total", "Cache lookups by cache (download, audio, jieba, report) and result (hit, miss)",
+    ("cache", "result"))
+DOWNLOAD_BYTES = metrics.counter(
+    "bilivagent_download_bytes_total", "Bytes downloaded from Bilibili (video or audio)", ("kind",))
+ASR_AUDIO_SECONDS = metrics.counter(
+    "bilivagent_asr_audio_seconds_total", "Seconds of audio passed to speech recognition", ("backend",))
+ASR_SECONDS = metrics.counter(
+    "bilivagent_asr_processing_seconds_total", "Seconds spent in speech recognition", ("backend",))
+ASR_REAL_TIME_FACTOR = metrics.histogram(
+    "bilivagent_asr_real_time_factor", "Processing seconds per second of audio, per transcription",
+    ("backend",), RTF_BUCKETS)
+TEXT_LINES = metrics.counter(
+    "bilivagent_text_lines_total", "Comment and danmaku lines processed", ("kind",))
+FRAMES = metrics.counter(
+    "bilivagent_frames_extracted_total", "Video frames saved for style analysis")
+QUEUE_JOBS = metrics.gauge(
+    "bilivagent_queue_jobs", "Jobs by status (queued, running, ...)", ("status",))
+WORKERS = metrics.gauge(
+    "bilivagent_workers", "Analysis workers by state (busy, idle)", ("state",))
+WORKER_BUSY_SECONDS = metrics.counter(
+    "bilivagent_worker_busy_seconds_total", "Seconds workers spent running jobs (utilization: rate / workers)")
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+class WorkerTracker:
+    """Busy/idle workers and busy seconds, including jobs still running at scrape time"""
+
+    def __init__(self):
+        self.total = 0
+        self._lock = threading.Lock()
+        self._since: Dict[object, float] = {}
+        self._done = 0.0
+        self._reported = 0.0
+        metrics.on_collect(self.collect)
+
+    @contextlib.contextmanager
+    def busy(self):
+        """Count the calling worker as busy for the block"""
+        token = object()
+        with self._lock:
+            self._since[token] = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._done += time.monotonic() - self._since.pop(token)
+
+    def collect(self):
+        now = time.monotonic()
+        with self._lock:
+            busy = len(self._since)
+            seconds = self._done + sum(now - since for since in self._since.values())
+            WORKER_BUSY_SECONDS.inc(seconds - self._reported)
+            self._reported = seconds
+        WORKERS.set(busy, state="busy")
+        WORKERS.set(max(self.total - busy, 0), state="idle")
+
+
+# Workers of this process; the service, queue worker or daemon sets the total
+worker_state = WorkerTracker()
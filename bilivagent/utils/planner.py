@@ -0,0 +1,284 @@
+"""
+Deadline planning
+
+Decides how much of the pipeline to run so a report is ready within a
+latency target. Stage costs are estimated from the video duration and the
+costs measured on earlier runs (moving averages kept in
+CACHE_DIR/stage_costs.json, starting from conservative defaults). When the
+full pipeline does not fit, degradations are applied cheapest first:
+
+1. hybrid style analysis (local features in the prompt, fewer frames)
+2. local-only style analysis (no vision model call)
+3. small model for the transcript summary
+4. audio-only download (no frames or visual features)
+5. partial transcript (only the first minutes are recognized)
+6. no speech recognition
+7. no download (comments and danmaku only)
+
+Speech recognition and style analysis are checked again right before they
+run, so overruns of earlier stages are absorbed by cutting them further.
+"""
+import os
+import json
+import time
+import threading
+import contextlib
+from typing import Dict, Optional
+
+from bilivagent.config import Config
+from bilivagent.utils.cassette import cassette
+
+# Seconds per minute of video for these stages, seconds per call for the rest
+PER_MINUTE = ("download", "download_audio", "audio", "frames", "asr.vosk", "asr.faster_whisper")
+
+DEFAULT_COSTS: Dict[str, float] = {
+    "download": 2.0,
+    "download_audio": 0.5,
+    "audio": 0.3,
+    "frames": 1.5,
+    "asr.vosk": 12.0,
+    "asr.faster_whisper": 20.0,
+    "summary": 20.0,
+    "summary_small": 8.0,
+    "style.vlm": 40.0,
+    "style.hybrid": 20.0,
+    "comments": 5.0,
+    "danmaku": 2.0,
+    "text": 15.0,
+}
+
+# Shortest partial transcript worth running, in minutes
+MIN_TRANSCRIPT_MINUTES = 1.0
+
+DEGRADATIONS = {
+    "style_hybrid": "风格分析改为本地画面特征 + {frames} 帧画面",
+    "style_local": "风格分析仅使用本地画面特征（未调用视觉模型）",
+    "small_model": "内容概述改用小模型",
+    "audio_only": "仅下载音频（未分析画面）",
+    "partial_transcript": "仅识别前 {minutes:g} 分钟语音",
+    "no_asr": "跳过语音识别",
+    "no_download": "跳过视频下载（仅分析评论和弹幕）",
+}
+# Degradations made obsolete by a stronger one of the same stage
+SUPERSEDES = {"style_local": "style_hybrid", "no_asr": "partial_transcript"}
+
+
+class StageCosts:
+    """Measured stage costs (exponential moving averages), shared by all runs of a process"""
+
+    def __init__(self, path: Optional[str] = None, alpha: float = 0.3):
+        self.path = path or os.path.join(Config.CACHE_DIR, "stage_costs.json")
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self.costs = dict(DEFAULT_COSTS)
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.costs.update({key: float(value) for key, value in json.load(f).items()})
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def estimate(self, key: str, minutes: float = 0.0) -> float:
+        """Estimated seconds for a stage on a video of this many minutes"""
+        cost = self.costs.get(key, 0.0)
+        return cost * minutes if key in PER_MINUTE else cost
+
+    def record(self, key: str, seconds: float, minutes: float = 0.0):
+        """Fold one measurement into the average and persist it"""
+        if key in PER_MINUTE:
+            if minutes <= 0:
+                return
+            seconds /= minutes
+        with self._lock:
+            previous = self.costs.get(key)
+            self.costs[key] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.costs, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                Config.debug_print(f"[DEBUG] Cannot save stage costs: {e}")
+
+
+class Plan:
+    """What one analysis runs, and the degradations applied to meet its deadline"""
+
+    def __init__(self, deadline: Optional[float] = None, minutes: float = 0.0,
+                 costs: Optional[StageCosts] = None, download: bool = True, start: Optional[float] = None):
+        """
+        Args:
+            deadline: seconds from start, or None to run everything
+            minutes: video duration in minutes
+            costs: stage cost model; without it nothing is measured or planned
+            download: whether the video may be downloaded at all
+            start: time.monotonic() when the analysis started
+        """
+        self.deadline = deadline
+        self.minutes = minutes
+        self.costs = costs
+        self.start = time.monotonic() if start is None else start
+        self.download = download
+        self.audio_only = False
+        self.asr = True
+        self.asr_minutes: Optional[float] = None  # None: the whole audio
+        self.style_mode = Config.VIDEO_STYLE_MODE
+        self.routes: Dict[str, str] = {}
+        # Degradation code -> description; a later change of the same kind replaces the earlier one
+        self.degradations: Dict[str, str] = {}
+        self.estimated = 0.0
+
+    @classmethod
+    def create(cls, deadline: Optional[float], minutes: float, costs: StageCosts,
+               download: bool = True, start: Optional[float] = None) -> "Plan":
+        """Plan for a video, degraded as far as needed to fit the deadline"""
+        plan = cls(deadline, minutes, costs, download, start)
+        plan.estimated = plan.elapsed() + plan._estimate()
+        if deadline is not None:
+            plan._fit()
+        return plan
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def time_left(self) -> float:
+        """Seconds until the deadline (infinite without one)"""
+        return float("inf") if self.deadline is None else self.deadline - self.elapsed()
+
+    @property
+    def asr_key(self) -> str:
+        return f"asr.{Config.ASR_BACKEND.replace('-', '_')}"
+
+    @property
+    def summary_key(self) -> str:
+        return "summary_small" if self.routes.get("content_summary") == "small" else "summary"
+
+    def _cost(self, key: str, minutes: float = 0.0) -> float:
+        return self.costs.estimate(key, minutes) if self.costs else 0.0
+
+    def _after_video(self) -> float:
+        """Estimated seconds of the stages after video content"""
+        return self._cost("comments") + self._cost("danmaku") + self._cost("text")
+
+    def _style_cost(self) -> float:
+        return self._cost(f"style.{self.style_mode}") if self.style_mode in ("vlm", "hybrid") else 0.0
+
+    def _visual_cost(self) -> float:
+        return 0.0 if self.audio_only else self._cost("frames", self.minutes) + self._style_cost()
+
+    def _estimate(self) -> float:
+        """Estimated seconds of the remaining pipeline with the current settings"""
+        total = self._after_video()
+        if self.download:
+            total += self._cost("download_audio" if self.audio_only else "download", self.minutes)
+            total += self._cost("audio", self.minutes) + self._visual_cost()
+            if self.asr:
+                minutes = self.minutes if self.asr_minutes is None else min(self.minutes, self.asr_minutes)
+                total += self._cost(self.asr_key, minutes) + self._cost(self.summary_key)
+        return total
+
+    def _budget(self) -> float:
+        """Seconds the remaining stages may take, keeping a safety margin"""
+        return self.time_left() * Config.DEADLINE_MARGIN
+
+    def _degrade(self, code: str, **details):
+        self.degradations.pop(SUPERSEDES.get(code, ""), None)
+        self.degradations[code] = DEGRADATIONS[code].format(**details)
+        Config.debug_print(f"[DEBUG] Deadline plan: {code} {details or ''}")
+
+    def _fit(self):
+        budget = self._budget()
+        if self._estimate() <= budget or not self.download:
+            return
+
+        if self.style_mode == "vlm":
+            self.style_mode = "hybrid"
+            self._degrade("style_hybrid", frames=Config.VIDEO_STYLE_FRAMES)
+        if self._estimate() > budget and self.style_mode != "local":
+            self.style_mode = "local"
+            self._degrade("style_local")
+        if self._estimate() > budget and self.summary_key != "summary_small":
+            self.routes["content_summary"] = "small"
+            self._degrade("small_model")
+        if self._estimate() > budget:
+            self.audio_only = True
+            self._degrade("audio_only")
+        if self._estimate() > budget:
+            self.asr_minutes = 0.0
+            minutes = self._transcript_minutes(budget - self._estimate())
+            if minutes >= MIN_TRANSCRIPT_MINUTES:
+                self.asr_minutes = minutes
+                self._degrade("partial_transcript", minutes=minutes)
+            else:
+                self.asr = False
+                self.asr_minutes = None
+                self._degrade("no_asr")
+        if self._estimate() > budget or (self.audio_only and not self.asr):
+            # Nothing left worth downloading for; the earlier steps no longer apply
+            self.download = False
+            self.degradations.clear()
+            self._degrade("no_download")
+        self.estimated = self.elapsed() + self._estimate()
+
+    def _transcript_minutes(self, seconds: float) -> float:
+        """Minutes of audio recognizable in this many seconds, rounded down to half minutes"""
+        rate = self._cost(self.asr_key, 1.0)
+        if rate <= 0:
+            return self.minutes
+        return min(self.minutes, int(max(seconds, 0.0) / rate * 2) / 2)
+
+    def transcript_limit(self) -> Optional[float]:
+        """
+        Seconds of audio to recognize right now (None: all), cutting the
+        planned amount if earlier stages overran. 0 means skip recognition.
+        """
+        if not self.asr:
+            return 0.0
+        if self.deadline is None:
+            return None
+        planned = self.minutes if self.asr_minutes is None else self.asr_minutes
+        reserve = self._cost(self.summary_key) + self._visual_cost() + self._after_video()
+        minutes = self._transcript_minutes(self._budget() - reserve)
+        if minutes >= planned:
+            return None if self.asr_minutes is None else self.asr_minutes * 60
+        if minutes < MIN_TRANSCRIPT_MINUTES:
+            self.asr = False
+            self._degrade("no_asr")
+            return 0.0
+        self.asr_minutes = minutes
+        self._degrade("partial_transcript", minutes=minutes)
+        return minutes * 60
+
+    def style(self) -> str:
+        """Style mode to use right now, downgraded if earlier stages overran"""
+        if self.deadline is not None and self.style_mode != "local":
+            room = self._budget() - self._after_video()
+            if self.style_mode == "vlm" and self._cost("style.vlm") > room:
+                self.style_mode = "hybrid"
+                self._degrade("style_hybrid", frames=Config.VIDEO_STYLE_FRAMES)
+            if self._style_cost() > room:
+                self.style_mode = "local"
+                self._degrade("style_local")
+        return self.style_mode
+
+    @contextlib.contextmanager
+    def timed(self, key: str, minutes: float = 0.0, record: bool = True):
+        """Measure a stage and fold its cost into the cost model (not in cassette mode)"""
+        start = time.perf_counter()
+        yield
+        if record and self.costs is not None and not cassette.active:
+            self.costs.record(key, time.perf_counter() - start, minutes)
+
+    def describe(self) -> str:
+        """One line for the console"""
+        text = f"Deadline {self.deadline:.0f}s, estimated {self.estimated:.0f}s"
+        return text + (f", degraded: {'; '.join(self.degradations.values())}" if self.degradations else ", full analysis")
+
+    def report(self) -> Dict:
+        """Plan summary for the report"""
+        return {
+            "时限（秒）": self.deadline,
+            "预计耗时（秒）": round(self.estimated, 1),
+            "实际耗时（秒）": round(self.elapsed(), 1),
+            "降级": list(self.degradations.values()),
+        }
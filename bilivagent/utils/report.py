@@ -0,0 +1,29 @@
+"""Report formatting"""
+from typing import Dict
+
+
+def print_report(report: Dict):
+    """Print formatted report"""
+    print("\n" + "="*60)
+    print("分析报告")
+    print("="*60)
+    print(f"\nBV号: {report['BV号']}")
+    print(f"视频标题: {report['视频标题']}")
+    print(f"\n概述:\n{report['概述']}")
+    print(f"\n关键词（前十）:")
+    for i, keyword in enumerate(report['关键词（前十）'], 1):
+        print(f"  {i}. {keyword}")
+    print(f"\n视频风格: {report['视频风格']}")
+    if report.get('视觉特征'):
+        print("视觉特征: " + "，".join(f"{name} {value}" for name, value in report['视觉特征'].items()))
+    print(f"\n讨论情感: {report['讨论情感']}")
+    print(f"\n讨论关键词:")
+    for i, keyword in enumerate(report['讨论关键词'], 1):
+        print(f"  {i}. {keyword}")
+    print(f"\n相关讨论:\n{report['相关讨论']}")
+    print("\n元数据:")
+    print(f"  分区: {report['元数据']['分区']}")
+    print(f"  UP主: {report['元数据']['UP主']}")
+    print(f"  评论数: {report['元数据']['评论数']}")
+    print(f"  弹幕数: {report['元数据']['弹幕数']}")
+    print("="*60)
@@ -0,0 +1,365 @@
+"""
+Queryable report store
+
+Reports are kept in one SQLite database instead of a JSON file per BV,
+with indexed columns for the common filters (分区, UP主, 讨论情感,
+publish and analysis time) and an inverted keyword index, so queries like
+"知识 videos with 负面 sentiment from the last week" stay in the
+millisecond range over millions of reports. The per-BV JSON files and a
+Parquet table are available as exports.
+
+Usage:
+  python -m bilivagent.utils.report_store query --category 知识 --sentiment 负面 --since 7d
+  python -m bilivagent.utils.report_store query --keyword 量子 --keyword 科普
+  python -m bilivagent.utils.report_store import ./output
+  python -m bilivagent.utils.report_store export-parquet reports.parquet
+  python -m bilivagent.utils.report_store export-json ./output --since 1d
+"""
+import os
+import re
+import sys
+import glob
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+from bilivagent.config import Config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    bvid        TEXT PRIMARY KEY,
+    title       TEXT    NOT NULL DEFAULT '',
+    category    TEXT    NOT NULL DEFAULT '',
+    uploader    TEXT    NOT NULL DEFAULT '',
+    sentiment   TEXT    NOT NULL DEFAULT '',
+    duration    INTEGER NOT NULL DEFAULT 0,
+    comments    INTEGER NOT NULL DEFAULT 0,
+    danmaku     INTEGER NOT NULL DEFAULT 0,
+    published   INTEGER NOT NULL DEFAULT 0,
+    analyzed    REAL    NOT NULL,
+    report      TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_category ON reports (category, sentiment, analyzed);
+CREATE INDEX IF NOT EXISTS reports_sentiment ON reports (sentiment, analyzed);
+CREATE INDEX IF NOT EXISTS reports_uploader ON reports (uploader, analyzed);
+CREATE INDEX IF NOT EXISTS reports_analyzed ON reports (analyzed);
+CREATE INDEX IF NOT EXISTS reports_published ON reports (published);
+CREATE TABLE IF NOT EXISTS report_keywords (
+    keyword TEXT NOT NULL,
+    bvid    TEXT NOT NULL,
+    PRIMARY KEY (keyword, bvid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS report_keywords_bvid ON report_keywords (bvid);
+"""
+
+# Summary columns returned by query()
+COLUMNS = ("bvid", "title", "category", "uploader", "sentiment", "duration",
+           "comments", "danmaku", "published", "analyzed")
+_DURATION = re.compile(r'^(\d+(?:\.\d+)?)([smhdw])$')
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def report_keywords(report: Dict) -> List[str]:
+    """Keywords indexed for a report: video keywords, discussion keywords and tags"""
+    metadata = report.get("元数据", {})
+    words = list(report.get("关键词（前十）", [])) + list(report.get("讨论关键词", [])) + list(metadata.get("标签", []))
+    return sorted({str(w).strip() for w in words if str(w).strip()})
+
+
+def parse_time(value: str) -> float:
+    """Unix timestamp from a number, an age like "7d" / "12h", or an ISO date"""
+    match = _DURATION.match(value)
+    if match:
+        return time.time() - float(match.group(1)) * _UNITS[match.group(2)]
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    from datetime import datetime
+    return datetime.fromisoformat(value).timestamp()
+
+
+class ReportStore:
+    """SQLite-backed report index; safe to share between threads"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.REPORT_STORE_PATH or os.path.join(Config.OUTPUT_DIR, "reports.db")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+        self.db.executescript(_SCHEMA)
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """Per-thread connection"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA busy_timeout = 30000")
+            db.execute("PRAGMA synchronous = NORMAL")
+            self._local.db = db
+        return db
+
+    def close(self):
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    @staticmethod
+    def _row(report: Dict, analyzed: float) -> tuple:
+        metadata = report.get("元数据", {})
+        return (
+            report["BV号"],
+            report.get("视频标题", ""),
+            metadata.get("分区", ""),
+            metadata.get("UP主", ""),
+            report.get("讨论情感", ""),
+            int(metadata.get("时长", 0) or 0),
+            int(metadata.get("评论数", 0) or 0),
+            int(metadata.get("弹幕数", 0) or 0),
+            int(metadata.get("发布时间", 0) or 0),
+            analyzed,
+            json.dumps(report, ensure_ascii=False, separators=(",", ":")),
+        )
+
+    def put(self, report: Dict, analyzed: Optional[float] = None):
+        self.put_many([report], analyzed)
+
+    def put_many(self, reports: Iterable[Dict], analyzed: Optional[float] = None, batch_size: int = 5000) -> int:
+        """
+        Insert or replace reports, one transaction per batch.
+        analyzed defaults to now; returns the number of reports written.
+        """
+        return self._put_pairs(((report, analyzed) for report in reports), batch_size)
+
+    def _put_pairs(self, pairs: Iterable[tuple], batch_size: int = 5000) -> int:
+        count = 0
+        batch: List[tuple] = []
+        for pair in pairs:
+            batch.append(pair)
+            if len(batch) >= batch_size:
+                count += self._write_batch(batch)
+                batch = []
+        if batch:
+            count += self._write_batch(batch)
+        return count
+
+    def _write_batch(self, pairs: List[tuple]) -> int:
+        now = time.time()
+        rows = [self._row(report, now if analyzed is None else analyzed) for report, analyzed in pairs]
+        bvids = [(row[0],) for row in rows]
+        keywords = [(word, report["BV号"]) for report, _ in pairs for word in report_keywords(report)]
+        db = self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany("DELETE FROM report_keywords WHERE bvid = ?", bvids)
+            db.executemany("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            db.executemany("INSERT OR IGNORE INTO report_keywords VALUES (?, ?)", keywords)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def get(self, bvid: str, max_age: Optional[float] = None) -> Optional[Dict]:
+        """The stored report, or None if missing or analyzed more than max_age seconds ago"""
+        row = self.db.execute("SELECT report, analyzed FROM reports WHERE bvid = ?", (bvid,)).fetchone()
+        if row is None or (max_age is not None and time.time() - row[1] > max_age):
+            return None
+        return json.loads(row[0])
+
+    def delete(self, bvid: str):
+        db = self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM report_keywords WHERE bvid = ?", (bvid,))
+            db.execute("DELETE FROM reports WHERE bvid = ?", (bvid,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _where(category: Optional[str] = None, sentiment: Optional[str] = None,
+               uploader: Optional[str] = None, keywords: Sequence[str] = (),
+               since: Optional[float] = None, until: Optional[float] = None,
+               published_since: Optional[float] = None) -> tuple:
+        where, params = [], []
+        for column, value in (("category", category), ("sentiment", sentiment), ("uploader", uploader)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        for column, op, value in (("analyzed", ">=", since), ("analyzed", "<", until),
+                                  ("published", ">=", published_since)):
+            if value is not None:
+                where.append(f"{column} {op} ?")
+                params.append(value)
+        for keyword in keywords or ():
+            where.append("bvid IN (SELECT bvid FROM report_keywords WHERE keyword = ?)")
+            params.append(keyword)
+        return (" WHERE " + " AND ".join(where) if where else ""), params
+
+    def _select(self, limit: Optional[int], full: bool, filters: Dict) -> sqlite3.Cursor:
+        where, params = self._where(**filters)
+        sql = f"SELECT {', '.join(COLUMNS)}{', report' if full else ''} FROM reports{where} ORDER BY analyzed DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self.db.execute(sql, params)
+
+    def query(self, limit: Optional[int] = 100, full: bool = False, **filters) -> List[Dict]:
+        """
+        Reports matching all filters, newest analysis first.
+        Filters: category, sentiment, uploader, keywords (all must be
+        present), since/until (analysis time) and published_since.
+        Rows hold the summary COLUMNS, plus "report" with full=True.
+        """
+        return list(self.iter_reports(limit=limit, full=full, **filters))
+
+    def iter_reports(self, limit: Optional[int] = None, full: bool = True, **filters) -> Iterator[Dict]:
+        """Like query(), streaming rows from the cursor"""
+        for row in self._select(limit, full, filters):
+            item = dict(zip(COLUMNS, row))
+            if full:
+                item["report"] = json.loads(row[-1])
+            yield item
+
+    def count(self, **filters) -> int:
+        where, params = self._where(**filters)
+        return self.db.execute(f"SELECT COUNT(*) FROM reports{where}", params).fetchone()[0]
+
+    def keyword_counts(self, limit: int = 20, **filters) -> List[tuple]:
+        """Most frequent keywords among the reports matching the filters"""
+        where, params = self._where(**filters)
+        sql = "SELECT keyword, COUNT(*) AS n FROM report_keywords"
+        if where:
+            sql += f" WHERE bvid IN (SELECT bvid FROM reports{where})"
+        return self.db.execute(sql + " GROUP BY keyword ORDER BY n DESC LIMIT ?", params + [limit]).fetchall()
+
+    def import_json(self, directory: str) -> int:
+        """Index existing {bv}_report.json files (their mtime becomes the analysis time)"""
+        def load():
+            for path in glob.glob(os.path.join(directory, "*_report.json")):
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        report = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Skipped {path}: {e}")
+                    continue
+                yield report, os.path.getmtime(path)
+        return self._put_pairs(load())
+
+    def export_json(self, directory: str, **filters) -> int:
+        """Write matching reports as {bv}_report.json files"""
+        os.makedirs(directory, exist_ok=True)
+        count = 0
+        for row in self.iter_reports(**filters):
+            with open(os.path.join(directory, f"{row['bvid']}_report.json"), "w", encoding="utf-8") as f:
+                json.dump(row["report"], f, ensure_ascii=False, indent=2)
+            count += 1
+        return count
+
+    def export_parquet(self, path: str, batch_size: int = 50000) -> int:
+        """Write all reports to a Parquet file (summary columns, keywords and the report JSON); needs pyarrow"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+
+        schema = pa.schema([
+            ("bvid", pa.string()), ("title", pa.string()), ("category", pa.string()),
+            ("uploader", pa.string()), ("sentiment", pa.string()), ("duration", pa.int64()),
+            ("comments", pa.int64()), ("danmaku", pa.int64()), ("published", pa.int64()),
+            ("analyzed", pa.float64()), ("keywords", pa.list_(pa.string())), ("report", pa.string()),
+        ])
+        cursor = self.db.execute(f"SELECT {', '.join(COLUMNS)}, report FROM reports ORDER BY bvid")
+        count = 0
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                columns = {name: [row[i] for row in rows] for i, name in enumerate(COLUMNS)}
+                columns["keywords"] = [report_keywords(json.loads(row[-1])) for row in rows]
+                columns["report"] = [row[-1] for row in rows]
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                count += len(rows)
+        return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BiliVagent report store")
+    parser.add_argument("--db", default=None, help="store database (default: REPORT_STORE_PATH or OUTPUT_DIR/reports.db)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_filters(p):
+        p.add_argument("--category", default=None, help="分区, e.g. 知识")
+        p.add_argument("--sentiment", default=None, help="正面 / 负面 / 中性")
+        p.add_argument("--uploader", default=None, help="UP主")
+        p.add_argument("--keyword", action="append", default=[], help="required keyword (repeatable)")
+        p.add_argument("--since", default=None, help="analyzed after: age (7d, 12h), timestamp or ISO date")
+        p.add_argument("--until", default=None, help="analyzed before")
+
+    query = sub.add_parser("query", help="find reports")
+    add_filters(query)
+    query.add_argument("--limit", type=int, default=20)
+    query.add_argument("--full", action="store_true", help="print the full reports as JSON lines")
+    query.add_argument("--top-keywords", type=int, default=0, help="also list the N most frequent keywords")
+
+    importer = sub.add_parser("import", help="index existing *_report.json files")
+    importer.add_argument("directory")
+
+    export_json = sub.add_parser("export-json", help="write reports as *_report.json files")
+    export_json.add_argument("directory")
+    add_filters(export_json)
+
+    export_parquet = sub.add_parser("export-parquet", help="write all reports to a Parquet file")
+    export_parquet.add_argument("path")
+
+    args = parser.parse_args()
+    store = ReportStore(args.db)
+
+    filters = {}
+    if hasattr(args, "category"):
+        filters = {
+            "category": args.category, "sentiment": args.sentiment, "uploader": args.uploader,
+            "keywords": args.keyword,
+            "since": parse_time(args.since) if args.since else None,
+            "until": parse_time(args.until) if args.until else None,
+        }
+
+    if args.command == "query":
+        start = time.perf_counter()
+        rows = store.query(limit=args.limit, full=args.full, **filters)
+        elapsed = (time.perf_counter() - start) * 1000
+        for row in rows:
+            if args.full:
+                print(json.dumps(row["report"], ensure_ascii=False))
+            else:
+                analyzed = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["analyzed"]))
+                print(f"{row['bvid']:<14} {analyzed}  {row['category']:<6} {row['sentiment']:<4} "
+                      f"{row['uploader']:<16} {row['title']}")
+        print(f"{len(rows)} reports in {elapsed:.1f}ms", file=sys.stderr)
+        if args.top_keywords:
+            active = {k: v for k, v in filters.items() if v}
+            for keyword, n in store.keyword_counts(args.top_keywords, **active):
+                print(f"  {keyword}: {n}")
+    elif args.command == "import":
+        print(f"Indexed {store.import_json(args.directory)} reports")
+    elif args.command == "export-json":
+        print(f"Wrote {store.export_json(args.directory, **filters)} reports")
+    else:
+        try:
+            print(f"Wrote {store.export_parquet(args.path)} reports")
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
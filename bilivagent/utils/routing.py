@@ -0,0 +1,166 @@
+"""Tiered model routing for LLM tasks"""
+import time
+import threading
+import contextlib
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+from bilivagent.config import Config
+from bilivagent.utils.siliconflow import SiliconFlowClient
+
+# Default tier per task type. "small" tasks are short or mechanical, "large"
+# ones produce user-facing text, "vision" goes to the VLM.
+DEFAULT_ROUTES: Dict[str, str] = {
+    "content_summary": "large",     # fused summary + keywords of the transcript
+    "chunk_summary": "small",       # map/reduce steps over long transcripts
+    "json_repair": "small",         # reformatting malformed structured output
+    "discussion_summary": "small",  # comments and danmaku
+    "style": "vision",              # frame-based video style analysis
+    "agent": "large",               # LangChain agent
+}
+
+
+# Task -> tier overrides for the current analysis only (see ModelRouter.overridden)
+_overrides: ContextVar[Dict[str, str]] = ContextVar("route_overrides", default={})
+
+
+def _parse_routes(spec: str) -> Dict[str, str]:
+    """Parse "task=tier,task=tier" overrides"""
+    routes = {}
+    for item in spec.split(","):
+        if "=" in item:
+            task, tier = item.split("=", 1)
+            routes[task.strip()] = tier.strip()
+    return routes
+
+
+class ModelRouter:
+    """
+    Map task types to model tiers and collect per-tier latency/token metrics.
+
+    With cascading enabled, tasks routed to the large tier that provide a
+    validator are tried on the small tier first and only escalated when the
+    small model's output is empty or fails validation.
+    """
+
+    def __init__(self, client: Optional[SiliconFlowClient] = None, routes: Optional[Dict[str, str]] = None,
+                 cascade: Optional[bool] = None):
+        self.client = client or SiliconFlowClient()
+        self.tiers = {
+            "small": Config.LLM_SMALL_MODEL,
+            "large": Config.LLM_MODEL,
+            "vision": Config.VLM_MODEL,
+        }
+        self.routes = dict(DEFAULT_ROUTES)
+        self.routes.update(_parse_routes(Config.MODEL_ROUTES))
+        self.routes.update(routes or {})
+        self.cascade = Config.MODEL_CASCADE if cascade is None else cascade
+
+        self._lock = threading.Lock()
+        self.metrics: Dict[str, Dict[str, float]] = {}
+
+    @contextlib.contextmanager
+    def overridden(self, routes: Dict[str, str]):
+        """
+        Route tasks to other tiers inside this block, for the current thread
+        (or asyncio task) only, e.g. to meet one analysis' deadline.
+        """
+        token = _overrides.set({**_overrides.get(), **routes})
+        try:
+            yield
+        finally:
+            _overrides.reset(token)
+
+    def tier_for(self, task: str) -> str:
+        """Tier name for a task (unknown tasks go to the large tier)"""
+        tier = _overrides.get().get(task) or self.routes.get(task, "large")
+        return tier if tier in self.tiers else "large"
+
+    def model_for(self, task: str) -> str:
+        """Model name for a task"""
+        return self.tiers[self.tier_for(task)]
+
+    def complete(self, task: str, messages: List[Dict], validate: Optional[Callable[[str], bool]] = None,
+                 **kwargs) -> str:
+        """
+        Run a chat completion for a task on its routed model.
+
+        Args:
+            task: task type, see DEFAULT_ROUTES
+            messages: chat messages
+            validate: optional check of the output; enables cascading
+            **kwargs: passed to SiliconFlowClient.chat_completion_full
+        """
+        tier = self.tier_for(task)
+
+        if self.cascade and validate is not None and tier == "large":
+            content = self._call("small", messages, **kwargs)
+            if content and validate(content):
+                return content
+            Config.debug_print(f"[DEBUG] Escalating '{task}' from small to large model")
+            self._record("large", escalations=1)
+
+        return self._call(tier, messages, **kwargs)
+
+    async def acomplete(self, task: str, messages: List[Dict], validate: Optional[Callable[[str], bool]] = None,
+                        **kwargs) -> str:
+        """Async version of complete"""
+        tier = self.tier_for(task)
+
+        if self.cascade and validate is not None and tier == "large":
+            content = await self._acall("small", messages, **kwargs)
+            if content and validate(content):
+                return content
+            Config.debug_print(f"[DEBUG] Escalating '{task}' from small to large model")
+            self._record("large", escalations=1)
+
+        return await self._acall(tier, messages, **kwargs)
+
+    def vision(self, task: str, image_paths: List[str], prompt: str) -> str:
+        """Run a multi-image vision analysis for a task on its routed model"""
+        tier = self.tier_for(task)
+        start = time.perf_counter()
+        content = self.client.vision_analysis_multi(image_paths, prompt, model=self.tiers[tier])
+        self._record(tier, calls=1, latency=time.perf_counter() - start)
+        return content
+
+    def _call(self, tier: str, messages: List[Dict], **kwargs) -> str:
+        result = self.client.chat_completion_full(messages, model=self.tiers[tier], **kwargs)
+        self._record(
+            tier,
+            calls=1,
+            latency=result["latency"],
+            prompt_tokens=result["prompt_tokens"],
+            completion_tokens=result["completion_tokens"],
+        )
+        return result["content"]
+
+    async def _acall(self, tier: str, messages: List[Dict], **kwargs) -> str:
+        result = await self.client.achat_completion_full(messages, model=self.tiers[tier], **kwargs)
+        self._record(
+            tier,
+            calls=1,
+            latency=result["latency"],
+            prompt_tokens=result["prompt_tokens"],
+            completion_tokens=result["completion_tokens"],
+        )
+        return result["content"]
+
+    def _record(self, tier: str, **values: float):
+        with self._lock:
+            stats = self.metrics.setdefault(tier, {
+                "calls": 0, "escalations": 0, "latency": 0.0, "prompt_tokens": 0, "completion_tokens": 0,
+            })
+            for key, value in values.items():
+                stats[key] += value
+
+    def metrics_summary(self) -> str:
+        """Per-tier metrics as a printable table"""
+        lines = [f"{'tier':<8}{'model':<36}{'calls':>6}{'esc':>5}{'avg s':>8}{'tok in':>9}{'tok out':>9}"]
+        with self._lock:
+            for tier, stats in sorted(self.metrics.items()):
+                avg = stats["latency"] / stats["calls"] if stats["calls"] else 0.0
+                lines.append(
+                    f"{tier:<8}{self.tiers[tier][:35]:<36}{int(stats['calls']):>6}{int(stats['escalations']):>5}"
+                    f"{avg:>8.2f}{int(stats['prompt_tokens']):>9}{int(stats['completion_tokens']):>9}"
+                )
+        return "\n".join(lines)
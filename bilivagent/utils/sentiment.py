@@ -0,0 +1,217 @@
+"""Lexicon-based sentiment scoring with an Aho-Corasick automaton"""
+import os
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Built-in lexicon: word -> polarity (+1 positive, -1 negative, 0 neutral)
+DEFAULT_LEXICON: Dict[str, float] = {
+    **dict.fromkeys(['好', '棒', '赞', '优秀', '喜欢', '支持', '精彩', '厉害', '牛', '强', '给力', '有趣', '搞笑', '感动', '惊艳'], 1.0),
+    **dict.fromkeys(['差', '烂', '垃圾', '无聊', '讨厌', '恶心', '失望', '糟糕', '难看', '不好', '不行', '烦', '吐槽'], -1.0),
+    **dict.fromkeys(['一般', '还行', '可以', '普通', '平常'], 0.0),
+}
+
+# Words that flip the polarity of a sentiment word shortly after them
+DEFAULT_NEGATIONS = ['不', '没', '没有', '别', '不是', '并不', '毫不', '不太', '不怎么']
+
+# Words containing sentiment characters that carry no sentiment themselves.
+# Without segmentation they would otherwise match e.g. '好' in '好像'.
+DEFAULT_BLOCKERS = [
+    '好像', '好多', '好几', '只好', '正好', '刚好', '好家伙', '强调', '勉强', '牛奶', '可以说',
+    # ...or that contain a negation character without negating anything
+    '特别', '区别', '别人', '差不多', '不少', '不过', '不仅', '没想到', '不得不',
+]
+
+# Entry kinds stored in the automaton
+_SENTIMENT, _NEGATION, _BLOCKER = 0, 1, 2
+
+
+def load_lexicon(path: str) -> Dict[str, float]:
+    """
+    Load an external lexicon file.
+
+    One entry per line: `word<TAB or space>score`. Lines starting with `#`
+    are ignored; a missing score counts as +1.
+    """
+    lexicon = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split()
+            lexicon[parts[0]] = float(parts[1]) if len(parts) > 1 else 1.0
+    return lexicon
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton over strings, reporting (start, length, value) matches"""
+
+    def __init__(self, words: Dict[str, object]):
+        self._native = None
+        try:
+            # Use the C implementation when available
+            import ahocorasick
+            automaton = ahocorasick.Automaton()
+            for word, value in words.items():
+                automaton.add_word(word, (len(word), value))
+            automaton.make_automaton()
+            self._native = automaton
+            return
+        except ImportError:
+            pass
+
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[List[Tuple[int, object]]] = [[]]
+        for word, value in words.items():
+            state = 0
+            for ch in word:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((len(word), value))
+
+        # Breadth-first construction of failure links; outputs are merged
+        # along the failure chain so matching never has to walk it for output
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text: str) -> List[Tuple[int, int, object]]:
+        """Return all (possibly overlapping) matches in text"""
+        if self._native is not None:
+            return [(end - length + 1, length, value) for end, (length, value) in self._native.iter(text)]
+
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for length, value in out[state]:
+                    matches.append((i - length + 1, length, value))
+        return matches
+
+
+class SentimentScorer:
+    """
+    Score each text against a sentiment lexicon in a single pass.
+
+    Overlapping matches are resolved leftmost-longest (so '不好' wins over
+    '好'), and a negation word within `negation_window` characters before a
+    sentiment word flips its polarity.
+    """
+
+    def __init__(self, lexicon: Optional[Dict[str, float]] = None, negations: Optional[Sequence[str]] = None,
+                 blockers: Optional[Sequence[str]] = None, negation_window: int = 2):
+        lexicon = DEFAULT_LEXICON if lexicon is None else lexicon
+        negations = DEFAULT_NEGATIONS if negations is None else negations
+        blockers = DEFAULT_BLOCKERS if blockers is None else blockers
+
+        entries: Dict[str, Tuple[int, float]] = {}
+        for word in blockers:
+            entries[word] = (_BLOCKER, 0.0)
+        for word in negations:
+            entries[word] = (_NEGATION, 0.0)
+        # Lexicon entries win over negations/blockers with the same spelling
+        for word, score in lexicon.items():
+            entries[word] = (_SENTIMENT, float(score))
+
+        self.negation_window = negation_window
+        self.automaton = AhoCorasick(entries)
+
+    @classmethod
+    def from_config(cls) -> "SentimentScorer":
+        """Create a scorer from Config (optional external lexicon)"""
+        from bilivagent.config import Config
+
+        lexicon = dict(DEFAULT_LEXICON)
+        if Config.SENTIMENT_LEXICON_PATH and os.path.exists(Config.SENTIMENT_LEXICON_PATH):
+            lexicon.update(load_lexicon(Config.SENTIMENT_LEXICON_PATH))
+        return cls(lexicon, negation_window=Config.SENTIMENT_NEGATION_WINDOW)
+
+    def score_text(self, text: str) -> Tuple[int, int, int, float]:
+        """Return (positive hits, negative hits, neutral hits, polarity sum) for one text"""
+        matches = self.automaton.find_all(text)
+        if not matches:
+            return 0, 0, 0, 0.0
+
+        matches.sort(key=lambda m: (m[0], -m[1]))
+
+        positive = negative = neutral = 0
+        score = 0.0
+        covered_until = 0
+        negation_end = -1 - self.negation_window
+        for start, length, (kind, polarity) in matches:
+            if start < covered_until:
+                continue
+            covered_until = start + length
+
+            if kind == _NEGATION:
+                negation_end = covered_until
+                continue
+            if kind == _BLOCKER:
+                continue
+
+            if start - negation_end <= self.negation_window:
+                polarity = -polarity
+            score += polarity
+            if polarity > 0:
+                positive += 1
+            elif polarity < 0:
+                negative += 1
+            else:
+                neutral += 1
+
+        return positive, negative, neutral, score
+
+    def score_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Score every text; returns an (n, 4) array of pos/neg/neutral hits and polarity"""
+        if not texts:
+            return np.zeros((0, 4), dtype=np.float64)
+        return np.array([self.score_text(text) for text in texts], dtype=np.float64)
+
+    def analyze(self, texts: Sequence[str], likes: Optional[Sequence[int]] = None) -> Dict:
+        """
+        Score texts and aggregate, weighting each text by its likes.
+
+        A text with `n` likes gets weight `1 + log1p(n)`, so popular comments
+        count more without a single viral comment dominating.
+        """
+        scores = self.score_batch(texts)
+
+        if likes is None:
+            weights = np.ones(len(texts))
+        else:
+            weights = 1.0 + np.log1p(np.maximum(np.asarray(likes, dtype=np.float64), 0))
+
+        counts = scores[:, :3].sum(axis=0)
+        weighted = weights @ scores[:, :3]
+
+        return {
+            "counts": {
+                "positive": int(counts[0]),
+                "negative": int(counts[1]),
+                "neutral": int(counts[2]),
+            },
+            "weighted": {
+                "positive": round(float(weighted[0]), 2),
+                "negative": round(float(weighted[1]), 2),
+                "neutral": round(float(weighted[2]), 2),
+            },
+            "scores": scores[:, 3],
+        }
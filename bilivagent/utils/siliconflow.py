@@ -1,10 +1,17 @@
 """SiliconFlow API client"""
 import os
 import json
+import time
 import base64
-from typing import List, Dict, Optional
+import threading
+from typing import AsyncIterator, Iterator, List, Dict, Optional
 import requests
+import requests.adapters
 from bilivagent.config import Config
+from bilivagent.utils.tracing import tracer
+from bilivagent.utils.metrics import SILICONFLOW_REQUESTS, SILICONFLOW_SECONDS, SILICONFLOW_TOKENS
+from bilivagent.utils.cassette import CassetteMiss, cassette
+from bilivagent.utils.cancel import current_token, check_cancelled, on_cancel
 
 
 class SiliconFlowClient:
@@ -21,30 +28,254 @@ class SiliconFlowClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+
+        # Pooled connections shared by all calls (and threads) on this client
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(Config.LLM_MAX_CONCURRENCY, 10))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self.headers)
+
+        # httpx.AsyncClient is bound to the event loop it was created on
+        self._async_client = None
+        self._async_loop = None
     
-    def chat_completion(self, messages: List[Dict], model: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 2000) -> str:
-        """Call chat completion API"""
-        model = model or Config.LLM_MODEL
-        
-        url = f"{self.base_url}/chat/completions"
-        
+    def _chat_payload(self, messages: List[Dict], model: Optional[str], temperature: float, max_tokens: int,
+                      stop: Optional[List[str]], stream: bool) -> Dict:
         payload = {
-            "model": model,
+            "model": model or Config.LLM_MODEL,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens,
-            "stream": False
+            "stream": stream
         }
+        if stop:
+            # Stop sequences are applied server-side so generation ends early
+            payload["stop"] = stop
+        return payload
+
+    @staticmethod
+    def _parse_completion(data: Dict, result: Dict) -> Dict:
+        usage = data.get("usage") or {}
+        result["content"] = data["choices"][0]["message"]["content"]
+        result["prompt_tokens"] = usage.get("prompt_tokens", 0)
+        result["completion_tokens"] = usage.get("completion_tokens", 0)
+        return result
+
+    @staticmethod
+    def _parse_stream_line(line: str) -> Optional[str]:
+        """Return the content delta of one server-sent event line, "" for none, None at the end"""
+        if not line.startswith("data:"):
+            return ""
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return None
+        choices = json.loads(data).get("choices") or [{}]
+        return choices[0].get("delta", {}).get("content") or ""
+
+    def chat_completion(self, messages: List[Dict], model: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 2000,
+                        stop: Optional[List[str]] = None) -> str:
+        """Call chat completion API"""
+        return self.chat_completion_full(messages, model, temperature, max_tokens, stop)["content"]
+
+    def chat_completion_full(self, messages: List[Dict], model: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 2000,
+                             stop: Optional[List[str]] = None) -> Dict:
+        """
+        Call chat completion API and return content together with token usage
+        and latency: {"content", "model", "prompt_tokens", "completion_tokens", "latency"}
+        """
+        payload = self._chat_payload(messages, model, temperature, max_tokens, stop, stream=False)
+        url = f"{self.base_url}/chat/completions"
         
+        result = {"content": "", "model": payload["model"], "prompt_tokens": 0, "completion_tokens": 0, "latency": 0.0}
+        start = time.perf_counter()
+        with tracer.span("siliconflow.chat", model=payload["model"]) as span:
+            try:
+                data = cassette.call("siliconflow.chat", payload, lambda: self._post_chat(url, payload, span))
+                self._parse_completion(data, result)
+            except CassetteMiss:
+                raise
+            except Exception as e:
+                print(f"Error calling chat completion API: {e}")
+            span.set(prompt_tokens=result["prompt_tokens"], completion_tokens=result["completion_tokens"])
+        result["latency"] = time.perf_counter() - start
+        return result
+
+    @staticmethod
+    def _cancellable(request):
+        """
+        Run a blocking request so that cancelling the current analysis stops
+        waiting for it at once; the abandoned request ends (or times out) on
+        its own thread and its response is dropped.
+        """
+        token = current_token()
+        if token is None:
+            return request()
+        token.check()
+        outcome = {}
+        done = threading.Event()
+
+        def run():
+            try:
+                outcome["response"] = request()
+            except BaseException as e:
+                outcome["error"] = e
+            finally:
+                done.set()
+
+        threading.Thread(target=run, name="siliconflow-request", daemon=True).start()
+        with token.on_cancel(done.set):
+            done.wait()
+        if not outcome:
+            token.check()
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["response"]
+
+    def _send(self, endpoint: str, request):
+        """_cancellable(request), counted in the request metrics by HTTP status ("error" without a response)"""
+        start = time.perf_counter()
         try:
-            response = requests.post(url, headers=self.headers, json=payload, timeout=60)
-            response.raise_for_status()
-            
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+            response = self._cancellable(request)
+        except Exception:
+            SILICONFLOW_REQUESTS.inc(endpoint=endpoint, status="error")
+            raise
+        finally:
+            SILICONFLOW_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        SILICONFLOW_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+        return response
+
+    @staticmethod
+    def _count_tokens(model: str, usage: Optional[Dict]):
+        usage = usage or {}
+        SILICONFLOW_TOKENS.inc(usage.get("prompt_tokens") or 0, model=model, direction="in")
+        SILICONFLOW_TOKENS.inc(usage.get("completion_tokens") or 0, model=model, direction="out")
+
+    def _post_chat(self, url: str, payload: Dict, span) -> Dict:
+        response = self._send("chat", lambda: self.session.post(url, json=payload, timeout=60))
+        span.set(status=response.status_code)
+        response.raise_for_status()
+        data = response.json()
+        self._count_tokens(payload["model"], data.get("usage"))
+        return data
+
+    def stream_chat_completion(self, messages: List[Dict], model: Optional[str] = None, temperature: float = 0.7,
+                               max_tokens: int = 2000, stop: Optional[List[str]] = None) -> Iterator[str]:
+        """Call chat completion API in streaming mode, yielding content deltas"""
+        payload = self._chat_payload(messages, model, temperature, max_tokens, stop, stream=True)
+        url = f"{self.base_url}/chat/completions"
+
+        if cassette.replaying:
+            yield from cassette.replay("siliconflow.chat_stream", payload)
+            return
+
+        deltas = []
+        start = time.perf_counter()
+        with tracer.span("siliconflow.chat_stream", model=payload["model"]) as span:
+            try:
+                response = self._send("chat_stream", lambda: self.session.post(url, json=payload, timeout=60, stream=True))
+                # Cancelling closes the connection, which also stops the generation
+                with response, on_cancel(response.close):
+                    span.set(status=response.status_code)
+                    response.raise_for_status()
+                    # Decode per line: without a charset requests would fall back to ISO-8859-1
+                    for line in response.iter_lines():
+                        check_cancelled()
+                        delta = self._parse_stream_line(line.decode("utf-8") if line else "")
+                        if delta is None:
+                            break
+                        if delta:
+                            span.add("chunks", 1)
+                            deltas.append(delta)
+                            yield delta
+            except Exception as e:
+                # Reading from a connection closed by cancellation fails
+                check_cancelled()
+                print(f"Error calling chat completion API (stream): {e}")
+                return
+
+        if cassette.recording:
+            cassette.record("siliconflow.chat_stream", payload, deltas, time.perf_counter() - start)
+
+    def _get_async_client(self):
+        """Return the pooled httpx.AsyncClient for the running event loop"""
+        import asyncio
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            limits = httpx.Limits(max_connections=max(Config.LLM_MAX_CONCURRENCY, 10))
+            self._async_client = httpx.AsyncClient(headers=self.headers, timeout=60, limits=limits)
+            self._async_loop = loop
+        return self._async_client
+
+    async def achat_completion_full(self, messages: List[Dict], model: Optional[str] = None, temperature: float = 0.7,
+                                    max_tokens: int = 2000, stop: Optional[List[str]] = None) -> Dict:
+        """Async version of chat_completion_full"""
+        payload = self._chat_payload(messages, model, temperature, max_tokens, stop, stream=False)
+        url = f"{self.base_url}/chat/completions"
+
+        result = {"content": "", "model": payload["model"], "prompt_tokens": 0, "completion_tokens": 0, "latency": 0.0}
+        start = time.perf_counter()
+        with tracer.span("siliconflow.chat_async", model=payload["model"]) as span:
+            try:
+                data = await cassette.acall("siliconflow.chat", payload, lambda: self._apost_chat(url, payload, span))
+                self._parse_completion(data, result)
+            except CassetteMiss:
+                raise
+            except Exception as e:
+                print(f"Error calling chat completion API: {e}")
+            span.set(prompt_tokens=result["prompt_tokens"], completion_tokens=result["completion_tokens"])
+        result["latency"] = time.perf_counter() - start
+        return result
+
+    async def _apost_chat(self, url: str, payload: Dict, span) -> Dict:
+        start = time.perf_counter()
+        try:
+            response = await self._get_async_client().post(url, json=payload)
+        except Exception:
+            SILICONFLOW_REQUESTS.inc(endpoint="chat", status="error")
+            raise
+        finally:
+            SILICONFLOW_SECONDS.observe(time.perf_counter() - start, endpoint="chat")
+        SILICONFLOW_REQUESTS.inc(endpoint="chat", status=response.status_code)
+        span.set(status=response.status_code)
+        response.raise_for_status()
+        data = response.json()
+        self._count_tokens(payload["model"], data.get("usage"))
+        return data
+
+    async def astream_chat_completion(self, messages: List[Dict], model: Optional[str] = None, temperature: float = 0.7,
+                                      max_tokens: int = 2000, stop: Optional[List[str]] = None) -> AsyncIterator[str]:
+        """Async version of stream_chat_completion"""
+        payload = self._chat_payload(messages, model, temperature, max_tokens, stop, stream=True)
+        url = f"{self.base_url}/chat/completions"
+
+        if cassette.replaying:
+            for delta in cassette.replay("siliconflow.chat_stream", payload):
+                yield delta
+            return
+
+        deltas = []
+        start = time.perf_counter()
+        try:
+            async with self._get_async_client().stream("POST", url, json=payload) as response:
+                SILICONFLOW_REQUESTS.inc(endpoint="chat_stream", status=response.status_code)
+                SILICONFLOW_SECONDS.observe(time.perf_counter() - start, endpoint="chat_stream")
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    delta = self._parse_stream_line(line)
+                    if delta is None:
+                        break
+                    if delta:
+                        deltas.append(delta)
+                        yield delta
         except Exception as e:
-            print(f"Error calling chat completion API: {e}")
-            return ""
+            print(f"Error calling chat completion API (stream): {e}")
+            return
+
+        if cassette.recording:
+            cassette.record("siliconflow.chat_stream", payload, deltas, time.perf_counter() - start)
     
     def _encode_image(self, image_path: str) -> tuple:
         """Encode image to base64 and return with mime type"""
@@ -121,8 +352,14 @@ class SiliconFlowClient:
 
         Config.debug_print(f"[DEBUG] Analyzing {len(image_paths)} images with model: {model}")
 
+        with tracer.span("siliconflow.vision", model=model, images=len(content) - 1) as span:
+            return cassette.call("siliconflow.vision", payload, lambda: self._post_vision(url, payload, span))
+
+    def _post_vision(self, url: str, payload: Dict, span) -> str:
+        """Send a vision request and extract the content"""
         try:
-            response = requests.post(url, headers=self.headers, json=payload, timeout=180)
+            response = self._send("vision", lambda: self.session.post(url, json=payload, timeout=180))
+            span.set(status=response.status_code, request_bytes=len(response.request.body or b""))
 
             # Check for errors and print detailed info
             if response.status_code != 200:
@@ -139,6 +376,9 @@ class SiliconFlowClient:
 
             result = response.json()
             Config.debug_print(f"[DEBUG] Vision API response received")
+            usage = result.get("usage") or {}
+            span.set(prompt_tokens=usage.get("prompt_tokens", 0), completion_tokens=usage.get("completion_tokens", 0))
+            self._count_tokens(payload["model"], usage)
             return result["choices"][0]["message"]["content"]
         except requests.exceptions.Timeout:
             print("Vision API timeout (180s)")
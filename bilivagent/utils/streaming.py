@@ -0,0 +1,126 @@
+"""
+Bounded-memory streaming mode
+
+With MEMORY_LIMIT_MB set, the data that grows with the video length is
+never held in memory as a whole:
+
+- audio is read from the WAV in blocks (vad.PcmFile) instead of through a
+  memory map, whose touched pages stay resident, and backends that need a
+  region as one array (faster-whisper) get windows of at most
+  audio_window_seconds()
+- speech segments are consumed as they are recognized; only the transcript
+  text is kept (about 100 KB per hour)
+- danmaku are fetched per 6-minute segment into a spill file (LineSpill)
+  and processed in batches: desensitization, sentiment and keyword counts
+  cover every line, near-duplicate collapsing for the discussion summary
+  works on a uniform sample of at most max_text_lines() lines
+
+The limit is shared between audio buffers and text; model memory (Vosk,
+faster-whisper, jieba) comes on top of it.
+"""
+import os
+import random
+import tempfile
+from typing import Iterable, Iterator, List, Optional
+
+from bilivagent.config import Config
+
+# Shares of MEMORY_LIMIT_MB
+AUDIO_SHARE = 0.25
+TEXT_SHARE = 0.5
+# Peak bytes per second of audio in a decoded window (int16 read, float32 copy, model features)
+AUDIO_BYTES_PER_SECOND = 300_000
+# Bytes a sampled comment/danmaku line keeps alive (original, desensitized copy, dedup keys and shingles)
+TEXT_BYTES_PER_LINE = 1024
+# Lines desensitized and scored at a time
+BATCH_LINES = 5000
+
+
+def enabled() -> bool:
+    return Config.MEMORY_LIMIT_MB > 0
+
+
+def audio_window_seconds() -> float:
+    """Longest audio window decoded as one array (at least 30 s, one Whisper window)"""
+    return max(30.0, Config.MEMORY_LIMIT_MB * 2 ** 20 * AUDIO_SHARE / AUDIO_BYTES_PER_SECOND)
+
+
+def max_text_lines() -> int:
+    """Lines kept for near-duplicate collapsing"""
+    return max(BATCH_LINES, int(Config.MEMORY_LIMIT_MB * 2 ** 20 * TEXT_SHARE / TEXT_BYTES_PER_LINE))
+
+
+def batches(items: Iterable, size: int = BATCH_LINES) -> Iterator[List]:
+    """Consecutive lists of up to size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class LineSpill:
+    """
+    Text lines kept in a file instead of memory; supports len() and repeated
+    iteration like the list it replaces. Newlines inside a line become spaces.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+
+    @classmethod
+    def write(cls, batches: Iterable[List[str]], directory: str, prefix: str = "") -> "LineSpill":
+        """Spill the lines of all batches to a new file; it is removed if this fails or is cancelled"""
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=".lines.txt", prefix=prefix, dir=directory)
+        spill = cls(path)
+        try:
+            with open(fd, "w", encoding="utf-8") as f:
+                for batch in batches:
+                    f.writelines(line.replace("\n", " ").replace("\r", " ") + "\n" for line in batch)
+                    spill.count += len(batch)
+        except BaseException:
+            spill.remove()
+            raise
+        return spill
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[str]:
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                yield line[:-1]
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Reservoir:
+    """Uniform random sample of at most `size` items from a stream (seeded, so runs repeat)"""
+
+    def __init__(self, size: int, seed: Optional[int] = 0):
+        self.size = size
+        self.items: List = []
+        self.seen = 0
+        self._rng = random.Random(seed)
+
+    def extend(self, items: Iterable):
+        for item in items:
+            self.seen += 1
+            if len(self.items) < self.size:
+                self.items.append(item)
+            else:
+                j = self._rng.randrange(self.seen)
+                if j < self.size:
+                    self.items[j] = item
+
+    @property
+    def scale(self) -> float:
+        """Lines seen per sampled line"""
+        return self.seen / len(self.items) if self.items else 1.0
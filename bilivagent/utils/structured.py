@@ -0,0 +1,55 @@
+"""Parsing of structured (JSON) LLM output"""
+import re
+import json
+from typing import Dict, List, Optional
+
+_CODE_FENCE = re.compile(r'```(?:json)?\s*(.*?)```', re.S)
+_KEYWORD_SEPARATORS = re.compile(r'[,，、;；]+')
+# Leading list markers such as "1.", "2、", "(3)", "-", "•"
+_LIST_MARKER = re.compile(r'^\s*(?:[-*•]|\(?\d+[.)、）:：])\s*')
+
+
+def extract_json(text: str) -> Optional[Dict]:
+    """
+    Extract the first JSON object from model output.
+    Tolerates code fences and text before/after the object.
+    """
+    if not text:
+        return None
+
+    candidates = [m.group(1) for m in _CODE_FENCE.finditer(text)] + [text]
+    for candidate in candidates:
+        start = candidate.find('{')
+        end = candidate.rfind('}')
+        if start == -1 or end <= start:
+            continue
+        try:
+            # strict=False accepts raw newlines inside strings
+            data = json.loads(candidate[start:end + 1], strict=False)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def split_keywords(value, limit: int = 10) -> List[str]:
+    """
+    Normalize keywords given as a list or a delimited string
+    (full/half-width commas, 、, semicolons, newlines or numbered lists).
+    """
+    if isinstance(value, str):
+        lines = value.splitlines()
+    elif isinstance(value, (list, tuple)):
+        lines = [str(v) for v in value]
+    else:
+        return []
+
+    keywords = []
+    for line in lines:
+        # Strip the list marker before splitting, so "2、攻略" stays one item
+        for item in _KEYWORD_SEPARATORS.split(_LIST_MARKER.sub('', line)):
+            keyword = _LIST_MARKER.sub('', item).strip().strip('"\'“”「」')
+            if keyword and not keyword.isdigit() and keyword not in keywords:
+                keywords.append(keyword)
+    return keywords[:limit]
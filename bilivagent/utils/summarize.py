@@ -0,0 +1,130 @@
+"""Map-reduce summarization for long texts"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from bilivagent.config import Config
+from bilivagent.utils.routing import ModelRouter
+from bilivagent.utils.tokens import estimate_tokens
+from bilivagent.utils.tracing import tracer
+from bilivagent.utils.cancel import bound
+
+# Sentence-ending punctuation (kept with the sentence) and line breaks
+_SENTENCE_END = re.compile(r'(?<=[。！？!?；;…\n])')
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences. Vosk output has no punctuation, so pieces
+    without any are further split on the spaces between recognized words.
+    """
+    sentences = [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+    if len(sentences) <= 1 and ' ' in text:
+        sentences = text.split()
+    return sentences
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """Group sentences into chunks of at most max_tokens (estimated) tokens"""
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for sentence in split_sentences(text):
+        tokens = estimate_tokens(sentence)
+
+        # A single oversized sentence is hard-cut
+        while tokens > max_tokens:
+            head, sentence = sentence[:max_tokens], sentence[max_tokens:]
+            if current:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            chunks.append(head)
+            tokens = estimate_tokens(sentence)
+
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        if sentence:
+            current.append(sentence)
+            current_tokens += tokens
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class MapReduceSummarizer:
+    """
+    Condense long text into something that fits one prompt.
+
+    The text is split on sentence boundaries into token-budgeted chunks,
+    chunks are summarized concurrently (bounded by max_workers) and the
+    partial summaries are reduced level by level until they fit one chunk.
+    Wall-clock time grows with the number of levels, not the text length.
+    """
+
+    MAP_PROMPT = "以下是一段视频语音转写内容的第{index}/{total}部分，请提炼其中的主要信息和关键术语（200字以内）：\n\n{text}"
+    REDUCE_PROMPT = "以下是同一视频不同片段的内容摘要，请将其合并为一份连贯的摘要，保留主要信息和关键术语（300字以内）：\n\n{text}"
+
+    def __init__(self, router: Optional[ModelRouter] = None, chunk_tokens: Optional[int] = None,
+                 max_workers: Optional[int] = None):
+        self.router = router or ModelRouter()
+        self.chunk_tokens = chunk_tokens or Config.SUMMARY_CHUNK_TOKENS
+        self.max_workers = max_workers or Config.LLM_MAX_CONCURRENCY
+
+    def condense(self, text: str) -> str:
+        """Return text unchanged if it fits one chunk, otherwise its reduced summary"""
+        if estimate_tokens(text) <= self.chunk_tokens:
+            return text
+
+        with tracer.span("summarize.condense", tokens=estimate_tokens(text)) as span:
+            combined = self._condense(text)
+            span.set(output_tokens=estimate_tokens(combined))
+        return combined
+
+    def _condense(self, text: str) -> str:
+        chunks = split_into_chunks(text, self.chunk_tokens)
+        Config.debug_print(f"[DEBUG] Summarizing transcript in {len(chunks)} chunks")
+        partials = self._run_all([
+            self.MAP_PROMPT.format(index=i + 1, total=len(chunks), text=chunk)
+            for i, chunk in enumerate(chunks)
+        ])
+        if not partials:
+            # Every map call failed; fall back to the leading chunk
+            return chunks[0]
+
+        # Reduce hierarchically until the partial summaries fit one chunk
+        combined = "\n".join(partials)
+        while estimate_tokens(combined) > self.chunk_tokens and len(partials) > 1:
+            groups = split_into_chunks(combined, self.chunk_tokens)
+            if len(groups) >= len(partials):
+                # Summaries did not shrink; merge pairs to guarantee progress
+                groups = ["\n".join(partials[i:i + 2]) for i in range(0, len(partials), 2)]
+            Config.debug_print(f"[DEBUG] Reducing {len(partials)} partial summaries in {len(groups)} groups")
+            reduced = self._run_all([self.REDUCE_PROMPT.format(text=group) for group in groups])
+            if not reduced:
+                return split_into_chunks(combined, self.chunk_tokens)[0]
+            partials = reduced
+            combined = "\n".join(partials)
+
+        return combined
+
+    def _run_all(self, prompts: List[str]) -> List[str]:
+        """Run prompts concurrently, keeping their order and dropping empty results"""
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(prompts))) as executor:
+            # Workers run under this analysis' cancel token
+            results = list(executor.map(bound(self._summarize), prompts))
+        return [r for r in results if r]
+
+    def _summarize(self, prompt: str) -> str:
+        messages = [
+            {
+                "role": "system",
+                "content": "你是一个专业的内容分析助手。请根据提供的文本生成简洁准确的摘要。"
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        return self.router.complete("chunk_summary", messages, max_tokens=500)
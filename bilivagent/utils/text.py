@@ -1,43 +1,50 @@
 """Text processing and analysis utilities"""
-import re
 import jieba
 import jieba.analyse
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from collections import Counter
-from wordcloud import WordCloud
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+from bilivagent.config import Config
+from bilivagent.utils import jieba_cache
+from bilivagent.utils.desensitize import Desensitizer
+from bilivagent.utils.sentiment import SentimentScorer
 
 
 class TextProcessor:
     """Text processing and analysis"""
     
     def __init__(self):
-        # Initialize jieba
+        # jieba is loaded lazily from the precompiled cache on first use
         jieba.setLogLevel(jieba.logging.INFO)
+        self.desensitizer = Desensitizer(Config.DESENSITIZE_EXTRA_PATTERNS)
+        self._sentiment_scorer = None
+
+    @property
+    def sentiment_scorer(self) -> SentimentScorer:
+        """Sentiment scorer, built on first use (external lexicons can be large)"""
+        if self._sentiment_scorer is None:
+            self._sentiment_scorer = SentimentScorer.from_config()
+        return self._sentiment_scorer
     
     def desensitize_text(self, text: str) -> str:
-        """Desensitize sensitive information"""
-        # Remove phone numbers
-        text = re.sub(r'1[3-9]\d{9}', '***', text)
-        
-        # Remove email addresses
-        text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '***@***.***', text)
-        
-        # Remove ID card numbers
-        text = re.sub(r'\b\d{17}[\dXx]\b', '***', text)
-        
-        return text
+        """Desensitize sensitive information (phone numbers, emails, ID card numbers)"""
+        return self.desensitizer.desensitize(text)
+
+    def desensitize_batch(self, texts: List[str]) -> Tuple[List[str], Dict[str, int]]:
+        """Desensitize a batch of texts in one scan, returning redaction counts per rule"""
+        return self.desensitizer.desensitize_batch(texts)
     
     def extract_keywords(self, text: str, top_k: int = 10) -> List[tuple]:
         """Extract keywords from text"""
+        jieba_cache.ensure_loaded()
+
         # Use jieba to extract keywords with TF-IDF
         keywords = jieba.analyse.extract_tags(text, topK=top_k, withWeight=True)
         return keywords
     
     def generate_wordcloud(self, text: str, output_path: str) -> str:
         """Generate word cloud image"""
+        jieba_cache.ensure_loaded()
+
         # Segment text
         words = jieba.cut(text)
         
@@ -47,6 +54,12 @@ class TextProcessor:
         
         text_for_cloud = ' '.join(filtered_words)
         
+        # wordcloud and matplotlib are slow to import and only needed here
+        from wordcloud import WordCloud
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
         # Generate word cloud
         wordcloud = WordCloud(
             font_path='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',  # Fallback font
@@ -67,25 +80,39 @@ class TextProcessor:
     
     def analyze_sentiment_keywords(self, text: str) -> Dict[str, int]:
         """Analyze sentiment-related keywords"""
-        # Define sentiment word lists
-        positive_words = {'好', '棒', '赞', '优秀', '喜欢', '支持', '精彩', '厉害', '牛', '强', '给力', '有趣', '搞笑', '感动', '惊艳'}
-        negative_words = {'差', '烂', '垃圾', '无聊', '讨厌', '恶心', '失望', '糟糕', '难看', '不好', '不行', '烦', '吐槽'}
-        neutral_words = {'一般', '还行', '可以', '普通', '平常'}
-        
-        words = list(jieba.cut(text))
-        
-        sentiment_count = {
-            'positive': 0,
-            'negative': 0,
-            'neutral': 0
+        return self.sentiment_scorer.analyze([text])["counts"]
+
+    def analyze_sentiment(self, texts: List[str], likes: Optional[List[int]] = None) -> Dict:
+        """
+        Score sentiment per text and aggregate weighted by likes.
+        Returns hit counts, like-weighted counts and per-text polarity scores.
+        """
+        return self.sentiment_scorer.analyze(texts, likes)
+
+
+class KeywordCounter:
+    """
+    TF-IDF keywords over text fed in batches: the same ranking as
+    jieba.analyse.extract_tags on the joined text, keeping only term counts
+    (bounded by the vocabulary) instead of the text.
+    """
+
+    def __init__(self):
+        jieba_cache.ensure_loaded()
+        self.tfidf = jieba.analyse.default_tfidf
+        self.freq: Counter = Counter()
+
+    def add(self, text: str):
+        for word in self.tfidf.tokenizer.cut(text):
+            if len(word.strip()) < 2 or word.lower() in self.tfidf.stop_words:
+                continue
+            self.freq[word] += 1
+
+    def top(self, top_k: int = 10) -> List[tuple]:
+        """(keyword, weight) pairs like extract_tags(..., withWeight=True)"""
+        total = sum(self.freq.values())
+        weights = {
+            word: count * (self.tfidf.idf_freq.get(word, self.tfidf.median_idf) / total)
+            for word, count in self.freq.items()
         }
-        
-        for word in words:
-            if word in positive_words:
-                sentiment_count['positive'] += 1
-            elif word in negative_words:
-                sentiment_count['negative'] += 1
-            elif word in neutral_words:
-                sentiment_count['neutral'] += 1
-        
-        return sentiment_count
+        return sorted(weights.items(), key=lambda item: item[1], reverse=True)[:top_k]
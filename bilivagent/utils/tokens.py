@@ -0,0 +1,13 @@
+"""Token budget helpers"""
+import re
+
+_CJK = re.compile(r'[　-〿㐀-䶿一-鿿＀-￯]')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for Qwen-style tokenizers without loading one:
+    about one token per CJK character and four other characters per token.
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
@@ -0,0 +1,174 @@
+"""Lightweight span tracing with Chrome trace export"""
+import os
+import json
+import time
+import threading
+from typing import Dict, List
+
+
+class Span:
+    """A timed region; attributes (bytes, tokens, cache_hit, ...) can be added while it runs"""
+
+    __slots__ = ("name", "attrs", "start_ns", "end_ns", "tid")
+
+    def __init__(self, name: str, attrs: Dict):
+        self.name = name
+        self.attrs = attrs
+        self.start_ns = 0
+        self.end_ns = 0
+        self.tid = 0
+
+    def set(self, **attrs):
+        """Add or update attributes"""
+        self.attrs.update(attrs)
+
+    def add(self, key: str, value: float):
+        """Accumulate a numeric attribute"""
+        self.attrs[key] = self.attrs.get(key, 0) + value
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+class _NoopSpan:
+    """Returned when tracing is off: every operation is a no-op"""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, key: str, value: float):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _ActiveSpan:
+    __slots__ = ("tracer", "span")
+
+    def __init__(self, tracer: "Tracer", span: Span):
+        self.tracer = tracer
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.span.tid = threading.get_ident()
+        self.span.start_ns = time.perf_counter_ns()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.span.attrs["error"] = exc_type.__name__
+        self.tracer._finish(self.span)
+        return False
+
+
+class Tracer:
+    """
+    Collects spans around pipeline stages and external calls.
+
+    Disabled by default; while disabled `span()` returns a shared no-op
+    object, so instrumentation costs one attribute check per call.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._origin_ns = time.perf_counter_ns()
+
+    def enable(self):
+        """Start collecting spans (clears earlier ones)"""
+        with self._lock:
+            self.spans = []
+            self._origin_ns = time.perf_counter_ns()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, name: str, **attrs):
+        """Context manager timing a region: `with tracer.span("vosk.transcribe") as s: ...`"""
+        if not self.enabled:
+            return _NOOP
+        return _ActiveSpan(self, Span(name, attrs))
+
+    def event(self, name: str, **attrs):
+        """Record a zero-duration span, e.g. for cache hits that skip the real work"""
+        if self.enabled:
+            with _ActiveSpan(self, Span(name, attrs)):
+                pass
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_chrome_trace(self) -> Dict:
+        """Spans as Chrome trace-event JSON (load in chrome://tracing or Perfetto)"""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        events = [
+            {
+                "name": span.name,
+                "cat": span.name.split(".", 1)[0],
+                "ph": "X",
+                "ts": (span.start_ns - self._origin_ns) / 1000,
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": pid,
+                "tid": span.tid,
+                "args": span.attrs,
+            }
+            for span in spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str) -> str:
+        """Write the Chrome trace to a file"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False, default=str)
+        return path
+
+    def summary(self) -> List[Dict]:
+        """Aggregate spans by name: count, total/mean/max seconds and summed numeric attributes"""
+        rows: Dict[str, Dict] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            row = rows.setdefault(span.name, {"name": span.name, "count": 0, "total": 0.0, "max": 0.0, "attrs": {}})
+            row["count"] += 1
+            row["total"] += span.duration
+            row["max"] = max(row["max"], span.duration)
+            for key, value in span.attrs.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    row["attrs"][key] = row["attrs"].get(key, 0) + value
+        for row in rows.values():
+            row["mean"] = row["total"] / row["count"]
+        return sorted(rows.values(), key=lambda r: r["total"], reverse=True)
+
+    def summary_table(self) -> str:
+        """Flat summary as a printable table"""
+        lines = [f"{'span':<34}{'count':>6}{'total s':>10}{'mean s':>9}{'max s':>9}  attributes"]
+        for row in self.summary():
+            attrs = ", ".join(f"{k}={v:g}" for k, v in sorted(row["attrs"].items()))
+            lines.append(
+                f"{row['name'][:33]:<34}{row['count']:>6}{row['total']:>10.3f}{row['mean']:>9.3f}{row['max']:>9.3f}  {attrs}"
+            )
+        return "\n".join(lines)
+
+
+# Process-wide tracer used by all instrumentation
+tracer = Tracer()
+
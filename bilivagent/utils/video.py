@@ -2,10 +2,19 @@
 import os
 import random
 import glob
-from typing import List, Optional, Tuple
-from moviepy import VideoFileClip
-import cv2
+from typing import Dict, List, Optional, Tuple
 from bilivagent.config import Config
+from bilivagent.utils.tracing import tracer
+from bilivagent.utils.metrics import cache_lookup
+from bilivagent.utils.cassette import cassette
+from bilivagent.utils.cancel import Cancelled, check_cancelled
+from bilivagent.utils.ffmpeg import find_ffmpeg, extract_audio as ffmpeg_extract_audio
+from bilivagent.utils.visual import VisualFeatures
+
+# Gaps between wanted frames longer than this (seconds of video) are seeked
+# over instead of decoded: about one keyframe interval of typical uploads,
+# beyond which a seek decodes fewer frames than reading straight through
+SEEK_GAP_SECONDS = 4.0
 
 
 class VideoProcessor:
@@ -22,7 +31,58 @@ class VideoProcessor:
         # If output already exists, return it
         if os.path.exists(output_path):
             Config.debug_print(f"[DEBUG] Audio already exists: {output_path}")
+            tracer.event("audio.extract", cache_hit=True)
+            cache_lookup("audio", hit=True)
             return output_path
+        cache_lookup("audio", hit=False)
+
+        backend = self._audio_backend()
+        with tracer.span("audio.extract", backend=backend, cache_hit=False) as span:
+            output_path = self._extract_audio(video_path, output_path, backend)
+            # moviepy runs its own ffmpeg processes that cannot be interrupted
+            check_cancelled()
+            span.set(bytes=os.path.getsize(output_path))
+        return output_path
+
+    def _audio_backend(self) -> str:
+        """AUDIO_BACKEND, falling back to moviepy when ffmpeg cannot be found"""
+        backend = Config.AUDIO_BACKEND
+        if backend == "ffmpeg" and find_ffmpeg() is None:
+            Config.debug_print("[DEBUG] ffmpeg not found, extracting audio with moviepy")
+            return "moviepy"
+        return backend
+
+    def _extract_audio(self, video_path: str, output_path: str, backend: str = "ffmpeg") -> str:
+        """Extract audio from the video, falling back to a separate audio file"""
+        if backend == "ffmpeg":
+            extracted = self._extract_audio_ffmpeg(video_path, output_path)
+        else:
+            extracted = self._extract_audio_moviepy(video_path, output_path)
+        if extracted:
+            Config.debug_print(f"[DEBUG] Audio extracted to: {output_path}")
+            return output_path
+
+        # Try to find separate audio file (yt-dlp creates .m4a files)
+        audio_path = self._find_separate_audio(video_path)
+        if audio_path:
+            Config.debug_print(f"[DEBUG] Found separate audio file: {audio_path}")
+            return self._convert_audio_to_wav(audio_path, output_path, backend)
+
+        raise ValueError(f"Cannot extract audio: video has no audio track and no separate audio file found for {video_path}")
+
+    def _extract_audio_ffmpeg(self, video_path: str, output_path: str) -> bool:
+        """Demux and resample the audio stream with ffmpeg; False if there is none"""
+        try:
+            Config.debug_print("[DEBUG] Extracting audio from video with ffmpeg...")
+            ffmpeg_extract_audio(video_path, output_path)
+            return True
+        except RuntimeError as e:
+            Config.debug_print(f"[DEBUG] Error extracting audio from video: {e}")
+            return False
+
+    def _extract_audio_moviepy(self, video_path: str, output_path: str) -> bool:
+        """Extract audio with moviepy; False if the video has no audio track"""
+        from moviepy import VideoFileClip
 
         video = None
         try:
@@ -40,8 +100,7 @@ class VideoProcessor:
                     ffmpeg_params=["-ac", "1"]  # Force mono audio
                 )
                 video.close()
-                Config.debug_print(f"[DEBUG] Audio extracted to: {output_path}")
-                return output_path
+                return True
             else:
                 Config.debug_print("[DEBUG] Video has no audio track, looking for separate audio file...")
                 video.close()
@@ -50,15 +109,7 @@ class VideoProcessor:
             Config.debug_print(f"[DEBUG] Error extracting audio from video: {e}")
             if video:
                 video.close()
-
-        # Try to find separate audio file (yt-dlp creates .m4a files)
-        audio_path = self._find_separate_audio(video_path)
-        if audio_path:
-            Config.debug_print(f"[DEBUG] Found separate audio file: {audio_path}")
-            # Convert m4a to wav using moviepy
-            return self._convert_audio_to_wav(audio_path, output_path)
-
-        raise ValueError(f"Cannot extract audio: video has no audio track and no separate audio file found for {video_path}")
+        return False
 
     def _find_separate_audio(self, video_path: str) -> Optional[str]:
         """Find separate audio file that corresponds to the video"""
@@ -80,8 +131,11 @@ class VideoProcessor:
 
         return None
 
-    def _convert_audio_to_wav(self, audio_path: str, output_path: str) -> str:
+    def _convert_audio_to_wav(self, audio_path: str, output_path: str, backend: str = "ffmpeg") -> str:
         """Convert audio file to WAV format (mono, 16kHz, 16-bit PCM)"""
+        if backend == "ffmpeg":
+            return ffmpeg_extract_audio(audio_path, output_path)
+
         from moviepy import AudioFileClip
 
         audio = AudioFileClip(audio_path)
@@ -106,6 +160,14 @@ class VideoProcessor:
         
         os.makedirs(output_dir, exist_ok=True)
         
+        with tracer.span("cv2.extract_frames", requested=num_frames) as span:
+            frame_paths = self._extract_random_frames(video_path, num_frames, output_dir)
+            span.set(frames=len(frame_paths))
+        return frame_paths
+
+    def _extract_random_frames(self, video_path: str, num_frames: int, output_dir: str) -> List[str]:
+        import cv2
+
         # Open video
         cap = cv2.VideoCapture(video_path)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
@@ -114,13 +176,16 @@ class VideoProcessor:
             cap.release()
             raise ValueError("Cannot read video frames")
         
-        # Select random frame indices
-        frame_indices = sorted(random.sample(range(0, total_frames), min(num_frames, total_frames)))
+        # Select random frame indices (seeded per video when recording/replaying,
+        # so the frames sent to the vision model are the same on every run)
+        rng = random.Random(os.path.basename(video_path)) if cassette.active else random
+        frame_indices = sorted(rng.sample(range(0, total_frames), min(num_frames, total_frames)))
         
         frame_paths = []
         base_name = os.path.splitext(os.path.basename(video_path))[0]
         
         for i, frame_idx in enumerate(frame_indices):
+            check_cancelled()
             cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
             ret, frame = cap.read()
             
@@ -131,3 +196,91 @@ class VideoProcessor:
         
         cap.release()
         return frame_paths
+
+    def extract_frames_with_features(self, video_path: str, num_frames: int,
+                                     output_dir: Optional[str] = None) -> Tuple[List[str], Dict]:
+        """
+        Save num_frames frames spread over the video and compute local visual
+        features (see bilivagent.utils.visual) in the same pass, reading
+        through short gaps between the frames used and seeking over long ones.
+        """
+        if output_dir is None:
+            output_dir = os.path.dirname(video_path)
+
+        os.makedirs(output_dir, exist_ok=True)
+
+        with tracer.span("cv2.frames_and_features", requested=num_frames) as span:
+            frame_paths, features = self._scan_frames(video_path, num_frames, output_dir)
+            span.set(frames=len(frame_paths), samples=features.get("samples", 0))
+        return frame_paths, features
+
+    def _scan_frames(self, video_path: str, num_frames: int, output_dir: str) -> Tuple[List[str], Dict]:
+        import cv2
+
+        cap = cv2.VideoCapture(video_path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+
+        if total_frames <= 0:
+            cap.release()
+            raise ValueError("Cannot read video frames")
+
+        # One random frame per equal part of the video (seeded per video when
+        # recording/replaying, so the vision model sees the same frames)
+        rng = random.Random(os.path.basename(video_path)) if cassette.active else random
+        num_frames = min(num_frames, total_frames)
+        save = {
+            i * total_frames // num_frames + rng.randrange(max(1, total_frames // num_frames)): i
+            for i in range(num_frames)
+        }
+
+        # Feature samples every `step` frames, at most VISUAL_MAX_SAMPLES of them,
+        # each paired with the frame right after it to measure motion
+        step = max(1, round(fps / Config.VISUAL_SAMPLE_FPS), -(-total_frames // Config.VISUAL_MAX_SAMPLES))
+        features = VisualFeatures(total_frames // step, step / fps)
+        samples = range(0, total_frames, step)
+        wanted = sorted(set(samples) | {i + 1 for i in samples if i + 1 < total_frames} | set(save))
+        seek_gap = max(1, round(SEEK_GAP_SECONDS * fps))
+
+        frame_paths = []
+        base_name = os.path.splitext(os.path.basename(video_path))[0]
+        pending = None  # (index, frame) of the last sample, waiting for the next frame
+        position = 0  # index of the frame the next grab() returns
+        try:
+            for index in wanted:
+                if index % step == 0:
+                    check_cancelled()
+                if index - position > seek_gap:
+                    # Long gaps (long videos): seeking decodes from the previous keyframe only
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                else:
+                    # Short gaps: grab() decodes without converting the skipped frames
+                    while position < index and cap.grab():
+                        position += 1
+                    if position < index:
+                        break
+                if not cap.grab():
+                    break
+                position = index + 1
+                ok, frame = cap.retrieve()
+                if not ok:
+                    continue
+                if pending is not None:
+                    features.add(pending[1], frame if index == pending[0] + 1 else None)
+                    pending = None
+                if index % step == 0:
+                    pending = index, frame
+                if index in save:
+                    frame_path = os.path.join(output_dir, f"{base_name}_frame_{save[index] + 1}.jpg")
+                    cv2.imwrite(frame_path, frame)
+                    frame_paths.append(frame_path)
+        except Cancelled:
+            for frame_path in frame_paths:
+                os.remove(frame_path)
+            raise
+        finally:
+            cap.release()
+
+        if pending is not None:
+            features.add(pending[1])
+        return frame_paths, features.summary()
@@ -0,0 +1,214 @@
+"""
+Local visual features
+
+Cheap statistics of the frames sampled during one pass over a video, used to
+describe a video's look without (or before) asking the vision model:
+
+- brightness and contrast: mean and spread of luma
+- colorfulness: Hasler-Süsstrunk metric on the opponent color channels
+- sharpness: variance of the Laplacian at a fixed width
+- cuts: color histogram jumps between consecutive samples, per minute
+- motion: mean absolute difference between a sample and the next frame
+- faces (Haar cascade) and text (dense short horizontal edge runs) on a
+  subset of samples
+
+Each sample is reduced to a few numbers as it is decoded, so memory does
+not grow with video length.
+"""
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Width of the thumbnails used for color, cut and motion statistics
+THUMB_WIDTH = 160
+# Width of the grayscale frames used for sharpness, faces and text
+DETAIL_WIDTH = 480
+# Face and text detection runs on at most this many samples
+MAX_DETECTIONS = 40
+# Color histogram (8 bins per channel) L1 distance counted as a cut
+CUT_THRESHOLD = 0.5
+
+
+@lru_cache(maxsize=1)
+def _face_detector():
+    import cv2
+
+    try:
+        detector = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    except AttributeError:
+        return None
+    return None if detector.empty() else detector
+
+
+def has_text(gray: np.ndarray) -> bool:
+    """
+    Whether a grayscale frame likely contains text (subtitles, captions,
+    slides): several compact, wide, edge-dense blobs after closing the
+    gradient image horizontally.
+    """
+    import cv2
+
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, edges = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1)))
+    contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    lines = 0
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if 8 <= h <= 40 and w >= 2.5 * h and w >= 30:
+            if np.count_nonzero(edges[y:y + h, x:x + w]) / (w * h) > 0.35:
+                lines += 1
+    return lines >= 2
+
+
+class VisualFeatures:
+    """Per-sample statistics collected during a decode pass"""
+
+    def __init__(self, expected_samples: int, interval: float):
+        """
+        Args:
+            expected_samples: roughly how many samples will be added (spreads detections)
+            interval: seconds between consecutive samples
+        """
+        self.interval = interval
+        self.detect_every = max(1, expected_samples // MAX_DETECTIONS)
+        self.size = ""
+        self.brightness: List[float] = []
+        self.contrast: List[float] = []
+        self.colorfulness: List[float] = []
+        self.sharpness: List[float] = []
+        self.motion: List[float] = []
+        self.faces: List[bool] = []
+        self.text: List[bool] = []
+        self.cuts = 0
+        self._histogram: Optional[np.ndarray] = None
+
+    @property
+    def samples(self) -> int:
+        return len(self.brightness)
+
+    def add(self, frame: np.ndarray, next_frame: Optional[np.ndarray] = None):
+        """Add one BGR sample, with the frame decoded right after it for motion"""
+        import cv2
+
+        height, width = frame.shape[:2]
+        self.size = f"{width}x{height}"
+        # The full frame is resized once; the thumbnail is taken from the detail image
+        detail = cv2.resize(frame, (DETAIL_WIDTH, max(1, DETAIL_WIDTH * height // width)),
+                            interpolation=cv2.INTER_AREA)
+        thumb = cv2.resize(detail, (THUMB_WIDTH, max(1, THUMB_WIDTH * height // width)),
+                           interpolation=cv2.INTER_AREA)
+        b, g, r = (thumb[..., i].astype(np.float32) for i in range(3))
+        luma = 0.299 * r + 0.587 * g + 0.114 * b
+        self.brightness.append(float(luma.mean()))
+        self.contrast.append(float(luma.std()))
+
+        rg, yb = r - g, 0.5 * (r + g) - b
+        self.colorfulness.append(float(np.hypot(rg.std(), yb.std()) + 0.3 * np.hypot(rg.mean(), yb.mean())))
+
+        # Joint 8x8x8 color histogram; a large jump from the previous sample is a cut
+        bins = (thumb >> 5).astype(np.int32)
+        histogram = np.bincount((bins[..., 0] << 6 | bins[..., 1] << 3 | bins[..., 2]).ravel(), minlength=512)
+        histogram = histogram / histogram.sum()
+        if self._histogram is not None and np.abs(histogram - self._histogram).sum() / 2 > CUT_THRESHOLD:
+            self.cuts += 1
+        self._histogram = histogram
+
+        if next_frame is not None and next_frame.shape == frame.shape:
+            following = cv2.resize(next_frame, thumb.shape[1::-1], interpolation=cv2.INTER_AREA)
+            self.motion.append(float(cv2.absdiff(cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY),
+                                                 cv2.cvtColor(following, cv2.COLOR_BGR2GRAY)).mean()))
+
+        gray = cv2.cvtColor(detail, cv2.COLOR_BGR2GRAY)
+        self.sharpness.append(float(cv2.Laplacian(gray, cv2.CV_32F).var()))
+
+        if (self.samples - 1) % self.detect_every == 0:
+            detector = _face_detector()
+            if detector is not None:
+                faces = detector.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5, minSize=(30, 30))
+                self.faces.append(len(faces) > 0)
+            self.text.append(has_text(gray))
+
+    def summary(self) -> Dict:
+        """Aggregated features (empty if nothing was sampled)"""
+        if not self.samples:
+            return {}
+        minutes = max(self.samples - 1, 1) * self.interval / 60
+        return {
+            "size": self.size,
+            "samples": self.samples,
+            "brightness": round(float(np.mean(self.brightness)), 1),
+            "brightness_std": round(float(np.std(self.brightness)), 1),
+            "contrast": round(float(np.mean(self.contrast)), 1),
+            "colorfulness": round(float(np.mean(self.colorfulness)), 1),
+            "sharpness": round(float(np.median(self.sharpness)), 1),
+            "cuts_per_minute": round(self.cuts / minutes, 1),
+            "motion": round(float(np.median(self.motion)), 2) if self.motion else 0.0,
+            "face_ratio": round(float(np.mean(self.faces)), 2) if self.faces else None,
+            "text_ratio": round(float(np.mean(self.text)), 2) if self.text else 0.0,
+        }
+
+
+# (feature key, report field, note for the vision model prompt)
+FIELDS = [
+    ("size", "分辨率", ""),
+    ("samples", "采样帧数", ""),
+    ("brightness", "平均亮度", "0-255"),
+    ("brightness_std", "亮度变化", "各帧平均亮度的标准差"),
+    ("contrast", "对比度", "帧内亮度标准差"),
+    ("colorfulness", "色彩丰富度", "Hasler-Süsstrunk 指标，<15 素淡，>45 鲜艳"),
+    ("sharpness", "清晰度", "480 宽灰度图的拉普拉斯方差，<60 偏模糊，>200 清晰"),
+    ("cuts_per_minute", "每分钟镜头切换", ""),
+    ("motion", "运动强度", "相邻帧平均像素差，0-255，<2 基本静止，>8 运动剧烈"),
+    ("face_ratio", "人脸画面占比", ""),
+    ("text_ratio", "文字画面占比", "字幕、图文等"),
+]
+
+
+def report_fields(features: Dict) -> Dict:
+    """Features under the report's Chinese field names"""
+    return {name: features[key] for key, name, _ in FIELDS if features.get(key) is not None}
+
+
+def prompt_lines(features: Dict) -> str:
+    """Features as a bullet list for the vision model prompt"""
+    return "\n".join(
+        f"- {name}：{features[key]}" + (f"（{note}）" if note else "")
+        for key, name, note in FIELDS if features.get(key) is not None
+    )
+
+
+def describe(features: Dict) -> str:
+    """Short Chinese style description from the features alone"""
+    if not features:
+        return "无法分析"
+
+    sharpness = features["sharpness"]
+    quality = "清晰" if sharpness > 200 else "一般" if sharpness > 60 else "偏模糊"
+    colorfulness = features["colorfulness"]
+    color = ("色彩素淡" if colorfulness < 15 else "色彩自然" if colorfulness < 45
+             else "色彩鲜艳" if colorfulness < 80 else "色彩浓烈")
+    brightness = features["brightness"]
+    light = "画面偏暗" if brightness < 70 else "画面明亮" if brightness > 170 else "亮度适中"
+    motion = features["motion"]
+    camera = "镜头以静态为主" if motion < 2 else "画面有一定运动" if motion < 8 else "画面运动剧烈"
+    cuts = features["cuts_per_minute"]
+    editing = "长镜头为主" if cuts < 2 else "剪辑节奏适中" if cuts < 12 else "快节奏剪辑"
+
+    parts = [
+        f"画质{quality}（{features['size']}），{color}，{light}",
+        f"{camera}，{editing}（约每分钟 {cuts:g} 次切换）",
+    ]
+    presence = []
+    face_ratio = features.get("face_ratio")
+    if face_ratio is not None:
+        presence.append("多数画面有人物出镜" if face_ratio >= 0.5 else
+                      "部分画面有人物出镜" if face_ratio >= 0.15 else "少有人物出镜")
+    text_ratio = features.get("text_ratio") or 0
+    if text_ratio >= 0.15:
+        presence.append("画面文字较多（字幕/图文）" if text_ratio >= 0.5 else "部分画面带文字")
+    if presence:
+        parts.append("，".join(presence))
+    return "；".join(parts) + "。"
@@ -7,17 +7,54 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
 import threading
 import sys
-import io
+import collections
 import json
 import os
 
+from bilivagent.utils.cancel import CancelToken, Cancelled
+
+
+# Log delivery: the widget is refreshed at most this often, and keeps this many lines
+LOG_REFRESH_MS = 50
+LOG_MAX_LINES = 5000
+
 
 class TextRedirector:
-    """Redirect stdout to a tkinter Text widget"""
+    """
+    Redirect stdout to a tkinter Text widget.
+
+    Writes from any thread only append to a bounded buffer; the Tk thread
+    drains it every LOG_REFRESH_MS. Carriage-return progress updates
+    (yt-dlp) replace the current line instead of adding text, and the
+    widget keeps the last LOG_MAX_LINES lines.
+    """
     def __init__(self, text_widget):
         self.text_widget = text_widget
-        self.buffer = io.StringIO()
         self.encoding = 'utf-8'  # Add encoding attribute for yt-dlp compatibility
+        self._lock = threading.Lock()
+        self._lines = collections.deque(maxlen=LOG_MAX_LINES)  # Complete lines not shown yet
+        self._dropped = 0
+        self._partial = ""  # Current unfinished line (e.g. a progress line)
+        self._partial_changed = False
+        self._partial_shown = False
+        self._job = None
+
+        # The widget's unfinished last line starts at this mark
+        self.text_widget.mark_set("partial", tk.END)
+        self.text_widget.mark_gravity("partial", tk.LEFT)
+
+    def start(self):
+        """Start draining into the widget (call from the Tk thread)"""
+        if self._job is None:
+            self._job = self.text_widget.after(LOG_REFRESH_MS, self._drain_loop)
+        return self
+
+    def close(self):
+        """Stop the refresh loop and show what is left (call from the Tk thread)"""
+        if self._job is not None:
+            self.text_widget.after_cancel(self._job)
+            self._job = None
+        self._drain()
 
     def write(self, string):
         # Handle None input
@@ -35,20 +72,58 @@ class TextRedirector:
         if not isinstance(string, str):
             string = str(string)
 
-        try:
-            self.buffer.write(string)
-            # Use after() for thread-safe GUI updates
-            self.text_widget.after(0, self._update_text, string)
-        except Exception:
-            pass  # Silently ignore write errors
+        if not string:
+            return
+
+        pieces = string.replace('\r\n', '\n').split('\n')
+        with self._lock:
+            for i, piece in enumerate(pieces):
+                if '\r' in piece:
+                    # Progress redraw: only the text after the last carriage return counts
+                    self._partial = piece.rsplit('\r', 1)[1]
+                else:
+                    self._partial += piece
+                if i < len(pieces) - 1:
+                    if len(self._lines) == self._lines.maxlen:
+                        self._dropped += 1
+                    self._lines.append(self._partial)
+                    self._partial = ""
+            self._partial_changed = True
+
+    def _drain_loop(self):
+        self._drain()
+        self._job = self.text_widget.after(LOG_REFRESH_MS, self._drain_loop)
+
+    def _drain(self):
+        """Move the buffered text into the widget in one update"""
+        with self._lock:
+            if not self._partial_changed:
+                return
+            lines = list(self._lines)
+            self._lines.clear()
+            dropped, self._dropped = self._dropped, 0
+            partial = self._partial
+            self._partial_changed = False
 
-    def _update_text(self, string):
-        """Thread-safe text update"""
         try:
-            self.text_widget.configure(state='normal')
-            self.text_widget.insert(tk.END, string)
-            self.text_widget.see(tk.END)
-            self.text_widget.configure(state='disabled')
+            widget = self.text_widget
+            widget.configure(state='normal')
+            if self._partial_shown:
+                widget.delete("partial", "end-1c")
+            if dropped:
+                lines.insert(0, f"...（省略 {dropped} 行）")
+            if lines:
+                widget.insert("end-1c", "\n".join(lines) + "\n")
+            widget.mark_set("partial", "end-1c")
+            widget.insert("end-1c", partial)
+            self._partial_shown = bool(partial)
+
+            # Keep the last LOG_MAX_LINES lines
+            excess = int(widget.index("end-1c").split('.')[0]) - LOG_MAX_LINES
+            if excess > 0:
+                widget.delete("1.0", f"{excess + 1}.0")
+            widget.see(tk.END)
+            widget.configure(state='disabled')
         except Exception:
             pass  # Silently ignore GUI errors
 
@@ -80,6 +155,7 @@ class BiliVagentGUI:
         self.agent = None
         self.current_report = None
         self.is_analyzing = False
+        self.cancel_token = None
 
         self._create_widgets()
         self._setup_layout()
@@ -259,32 +335,45 @@ class BiliVagentGUI:
 
         # Redirect stdout to log
         self.old_stdout = sys.stdout
-        sys.stdout = TextRedirector(self.log_text)
+        self.log_redirector = TextRedirector(self.log_text).start()
+        sys.stdout = self.log_redirector
 
         # Run analysis in background thread
+        self.cancel_token = CancelToken()
         self.analysis_thread = threading.Thread(
             target=self._run_analysis,
-            args=(url,),
+            args=(url, self.cancel_token),
             daemon=True
         )
         self.analysis_thread.start()
 
-    def _run_analysis(self, url):
+    def _run_analysis(self, url, cancel):
         """Run the actual analysis (in background thread)"""
         try:
             # Import here to avoid circular imports and allow lazy loading
-            from bilivagent.agents.bilivagent import BiliVagent
-
-            if self.agent is None:
-                print("正在初始化分析引擎...")
-                self.agent = BiliVagent()
-
-            report = self.agent.analyze_video(url)
+            from bilivagent.service.daemon import DaemonClient
+
+            daemon = DaemonClient()
+            if daemon.is_running():
+                # The warm daemon already has the models loaded
+                print("使用常驻工作进程进行分析...")
+                with cancel.on_cancel(daemon.cancel):
+                    report = daemon.analyze(url)
+            else:
+                from bilivagent.agents.bilivagent import BiliVagent
+
+                if self.agent is None:
+                    print("正在初始化分析引擎...")
+                    self.agent = BiliVagent()
+
+                report = self.agent.analyze_video(url, cancel=cancel)
             self.current_report = report
 
             # Update UI from main thread
             self.root.after(0, lambda: self._analysis_complete(report))
 
+        except Cancelled:
+            self.root.after(0, self._analysis_stopped)
         except Exception as e:
             import traceback
             error_msg = f"分析错误: {str(e)}\n{traceback.format_exc()}"
@@ -302,6 +391,7 @@ class BiliVagentGUI:
 
         # Restore stdout
         sys.stdout = self.old_stdout
+        self.log_redirector.close()
 
         # Display report
         self._display_report(report)
@@ -321,20 +411,28 @@ class BiliVagentGUI:
 
         # Restore stdout
         sys.stdout = self.old_stdout
+        self.log_redirector.close()
 
         messagebox.showerror("错误", f"分析失败:\n{error}")
 
     def _stop_analysis(self):
-        """Stop the current analysis (not fully implemented - threads can't be killed easily)"""
-        if self.is_analyzing:
-            messagebox.showinfo("提示", "正在停止分析...请稍候")
-            # Note: Python threads can't be forcefully killed
-            # This just updates the UI state
-            self.is_analyzing = False
-            self.analyze_btn.configure(state="normal")
+        """Cancel the running analysis; its thread stops at the next check and cleans up"""
+        if self.is_analyzing and self.cancel_token is not None:
             self.stop_btn.configure(state="disabled")
-            self.progress_bar.stop()
-            self.status_label.configure(text="已停止")
+            self.status_label.configure(text="正在停止...")
+            self.cancel_token.cancel()
+
+    def _analysis_stopped(self):
+        """Called when the analysis thread has stopped after a cancel"""
+        self.is_analyzing = False
+        self.analyze_btn.configure(state="normal")
+        self.stop_btn.configure(state="disabled")
+        self.progress_bar.stop()
+        self.status_label.configure(text="已停止")
+
+        # Restore stdout
+        sys.stdout = self.old_stdout
+        self.log_redirector.close()
 
     def _display_report(self, report):
         """Display the analysis report in the report tab"""
@@ -358,7 +456,11 @@ class BiliVagentGUI:
             text += f"  {i}. {keyword}\n"
         text += "\n"
 
-        text += f"🎨 视频风格: {report.get('视频风格', 'N/A')}\n\n"
+        text += f"🎨 视频风格: {report.get('视频风格', 'N/A')}\n"
+        visual = report.get('视觉特征') or {}
+        if visual:
+            text += "   视觉特征: " + "，".join(f"{name} {value}" for name, value in visual.items()) + "\n"
+        text += "\n"
 
         text += f"💬 讨论情感: {report.get('讨论情感', 'N/A')}\n\n"
 
@@ -434,6 +536,8 @@ class BiliVagentGUI:
         if self.is_analyzing:
             if not messagebox.askyesno("确认", "分析正在进行中，确定要退出吗？"):
                 return
+            # Stop downloads and child processes instead of leaving them running
+            self.cancel_token.cancel()
         self.root.quit()
         self.root.destroy()
 
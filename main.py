@@ -5,7 +5,7 @@ Main entry point for the application
 """
 import argparse
 import sys
-from bilivagent.agents.bilivagent import BiliVagent
+from typing import Optional
 
 
 def main():
@@ -16,10 +16,11 @@ def main():
 示例:
   python main.py BV1xx411c7mD
   python main.py https://www.bilibili.com/video/BV1xx411c7mD
+  python main.py BV1xx411c7mD --deadline 60
   
 注意:
   1. 请先配置 .env 文件中的 SILICONFLOW_API_KEY
-  2. 如需语音识别功能，请下载 Vosk 模型并配置 VOSK_MODEL_PATH
+  2. 如需语音识别功能，请下载 Vosk 模型并配置 VOSK_MODEL_PATH（或设置 ASR_BACKEND=faster_whisper）
   3. 视频下载需要安装 yt-dlp
         """
     )
@@ -41,14 +42,84 @@ def main():
         action="store_true"
     )
 
+    parser.add_argument(
+        "--deadline",
+        help="时限（秒）：按视频时长与历史各阶段耗时规划，必要时仅下载音频、截取部分语音、"
+             "减少画面帧、改用小模型或跳过阶段，并在报告中记录所做的降级",
+        type=float,
+        default=None,
+        metavar="SECONDS"
+    )
+
+    parser.add_argument(
+        "--daemon",
+        help="提交到常驻工作进程（python -m bilivagent.service.daemon）执行，免去模型加载；未运行时在本进程执行",
+        action="store_true"
+    )
+
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument(
+        "--record",
+        help="录制所有外部请求的响应到 cassette 文件",
+        action="store_true"
+    )
+    cassette_group.add_argument(
+        "--replay",
+        help="从 cassette 文件回放外部请求的响应，不访问网络",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--cassette",
+        help="--record/--replay 使用的 cassette 文件（默认: CASSETTE_PATH）",
+        default=None,
+        metavar="PATH"
+    )
+
+    parser.add_argument(
+        "--profile",
+        help="记录各阶段耗时，打印汇总表并导出 Chrome trace JSON",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--profile-path",
+        help="Chrome trace JSON 的输出路径（默认: <输出目录>/profile_trace.json；指定时同时开启 --profile）",
+        default=None,
+        metavar="TRACE_PATH"
+    )
+
     args = parser.parse_args()
+    args.profile = args.profile or args.profile_path is not None
+
+    if args.profile:
+        from bilivagent.utils.tracing import tracer
+        tracer.enable()
+
+    if args.cassette is not None and not (args.record or args.replay):
+        parser.error("--cassette requires --record or --replay")
+
+    if args.record or args.replay:
+        from bilivagent.utils.cassette import cassette
+        cassette.configure("record" if args.record else "replay", args.cassette)
     
+    if args.daemon:
+        report = _run_on_daemon(args)
+        if report is not None:
+            from bilivagent.utils.report import print_report
+            print_report(report)
+            print("\n✓ 分析完成!")
+            return
+
     try:
+        # Imported here so --help and argument errors do not load the analysis stack
+        from bilivagent.agents.bilivagent import BiliVagent
+
         # Create agent
         agent = BiliVagent()
         
         # Analyze video
-        report = agent.analyze_video(args.video)
+        report = agent.analyze_video(args.video, download=not args.no_download, deadline=args.deadline)
         
         # Print report
         agent.print_report(report)
@@ -64,6 +135,40 @@ def main():
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        if args.profile:
+            _write_profile(args.profile_path)
+
+
+def _run_on_daemon(args):
+    """Run the analysis on the warm daemon; None if no daemon is running"""
+    from bilivagent.service.daemon import DaemonClient
+
+    if args.profile or args.record or args.replay:
+        print("Note: --profile/--record/--replay only apply to local runs", file=sys.stderr)
+    try:
+        return DaemonClient().analyze(args.video, download=not args.no_download, deadline=args.deadline)
+    except ConnectionError as e:
+        print(f"{e}; running locally", file=sys.stderr)
+        return None
+    except RuntimeError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def _write_profile(trace_path: Optional[str]):
+    """Print the span summary and export the Chrome trace"""
+    import os
+    from bilivagent.config import Config
+    from bilivagent.utils.tracing import tracer
+
+    trace_path = trace_path or os.path.join(Config.OUTPUT_DIR, "profile_trace.json")
+    print("\n" + "=" * 60)
+    print("性能分析 / Profile")
+    print("=" * 60)
+    print(tracer.summary_table())
+    tracer.export_chrome_trace(trace_path)
+    print(f"\nChrome trace saved to: {trace_path}")
 
 
 if __name__ == "__main__":
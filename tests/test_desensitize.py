@@ -0,0 +1,25 @@
+from bilivagent.utils.desensitize import Desensitizer
+
+
+def test_qq_rule_does_not_join_batch_lines():
+    """测试 QQ 规则不会跨行匹配而合并批量中的文本"""
+    texts = ['加我qq', '12345678 进群', 'hi']
+    result, counts = Desensitizer(['qq']).desensitize_batch(texts)
+    assert result == texts
+    assert counts['qq'] == 0
+
+
+def test_batch_falls_back_when_custom_rule_spans_lines():
+    """测试自定义规则跨行匹配时逐条处理，条数与输入一致"""
+    desensitizer = Desensitizer([('wechat', r'(?i:vx)\s*\w+', 'VX***')])
+    texts = ['加我vx', 'abc123', 'vx abc']
+    result, counts = desensitizer.desensitize_batch(texts)
+    assert result == [desensitizer.desensitize(t) for t in texts]
+    assert counts['wechat'] == 1
+
+
+def test_qq_rule_still_matches_within_a_line():
+    """测试 QQ 规则仍能匹配同一行内的号码"""
+    result, counts = Desensitizer(['qq']).desensitize_batch(['QQ：12345678 进群', 'qq 123456'])
+    assert result == ['QQ*** 进群', 'QQ***']
+    assert counts['qq'] == 2